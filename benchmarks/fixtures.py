@@ -0,0 +1,190 @@
+"""Deterministic fixture generators for the benchmark suite.
+
+Every fixture is derived from ``random.Random(size)``, so a given size always
+produces the same bytes and results stay comparable between runs. Files are
+cached under ``benchmarks/.fixtures`` and rebuilt only when missing.
+"""
+
+from __future__ import annotations
+
+import csv
+import html
+import random
+from pathlib import Path
+from typing import Callable, List
+
+from openpyxl import Workbook  # type: ignore[import-untyped]
+
+FIXTURE_DIR = Path(__file__).resolve().parent / ".fixtures"
+
+STATES = ["VIC", "NSW", "QLD", "SA", "WA", "TAS", "ACT", "NT"]
+OPCOS = ["FXAU", "FXNZ"]
+FAMILIES = [
+    "ApeosPort-VII C",
+    "DocuCentre-VI C",
+    "DocuPrint CM",
+    "ApeosPrint C",
+    "ApeosPort C",
+    "DocuCentre-V",
+    "Revoria Press",
+    "PrimeLink C",
+]
+REPORT_HEADERS = [
+    "Serial Number",
+    "Product Code",
+    "Product Name",
+    "Customer",
+    "Suburb",
+    "State",
+    "Product Family",
+    "Firmware Version",
+    "Last Contact",
+    "EP Status",
+    "OpCo",
+    "Notes",
+]
+
+
+def _device(rng: random.Random, index: int) -> List[str]:
+    family = rng.choice(FAMILIES)
+    return [
+        f"{100000 + index}",
+        f"TC{rng.randint(100000, 999999)}",
+        f"{family} {rng.randint(2200, 7580)}",
+        f"Customer {rng.randint(1, 400)} Pty Ltd",
+        f"Suburb {rng.randint(1, 900)}",
+        rng.choice(STATES),
+        family,
+        f"{rng.randint(1, 9)}.{rng.randint(0, 99)}.{rng.randint(0, 9)}",
+        f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00",
+        rng.choice(["Active", "Inactive", "Pending"]),
+        rng.choice(OPCOS),
+        rng.choice(["", "Replaced toner", "Site access via reception & dock"]),
+    ]
+
+
+def devices(size: int) -> List[List[str]]:
+    rng = random.Random(size)
+    return [_device(rng, i) for i in range(size)]
+
+
+def export_html(size: int) -> str:
+    """An EPGW "Export" body: HTML-in-.xls with Office XML fragments and one big grid."""
+    cells = "".join(f"<th>{html.escape(h)}</th>" for h in REPORT_HEADERS)
+    parts = [
+        '<html xmlns:o="urn:schemas-microsoft-com:office:office">',
+        "<head><xml><x:ExcelWorkbook><x:Name>DeviceList</x:Name></x:ExcelWorkbook></xml></head>",
+        '<body><table id="MainContent_gvDeviceList" border="1">',
+        f"<tr>{cells}</tr>",
+    ]
+    for row in devices(size):
+        parts.append(
+            "<tr>" + "".join(f"<td>{html.escape(v)}<br/></td>" for v in row) + "</tr>"
+        )
+    parts.append("</table></body></html>")
+    return "\n".join(parts)
+
+
+def _search_panel(size: int) -> str:
+    rows = "".join(
+        f"<tr><td>{row[0]}</td><td>{row[1]}</td><td>{row[9]}</td></tr>" for row in devices(size)
+    )
+    return (
+        '<div id="MainContent_searchForm"><table>' + rows + "</table>"
+        '<span id="MainContent_MessageLabel">Firmware update request has been scheduled.</span></div>'
+    )
+
+
+def status_page(size: int) -> str:
+    """A full SingleRequest.aspx page (non-delta response) with a ``size``-row grid."""
+    return "<html><body><form>" + _search_panel(size) + "</form></body></html>"
+
+
+def msajax_delta(size: int) -> str:
+    """An UpdatePanel async-postback response whose panel holds a ``size``-row grid."""
+    panel = _search_panel(size)
+    entries = [
+        ("updatePanel", "MainContent_searchForm", panel),
+        ("hiddenField", "__VIEWSTATE", "x" * (size * 8)),
+        ("hiddenField", "__EVENTVALIDATION", "y" * 512),
+        ("asyncPostBackControlIDs", "", ""),
+        ("pageTitle", "", "Single Request"),
+    ]
+    return "|" + "".join(f"{len(c)}|{t}|{i}|{c}|" for t, i, c in entries)
+
+
+def rdhc_html(size: int) -> str:
+    """RDHC form page with ``size`` product-family dropdown options."""
+    rng = random.Random(size)
+    options = ['<option value="">Select</option>']
+    for i in range(size):
+        label = f"{rng.choice(FAMILIES)} {i}"
+        options.append(f'<option value="{i + 1}">{html.escape(label)}</option>')
+    return (
+        "<html><body><form>"
+        '<select id="MainContent_ddlProductFamily" name="ctl00$MainContent$ddlProductFamily">'
+        + "".join(options)
+        + "</select></form></body></html>"
+    )
+
+
+def _write_firmware_csv(path: Path, size: int) -> None:
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["serial", "product_code", "state", "opco"])
+        for row in devices(size):
+            writer.writerow([row[0], row[1], row[5].lower(), row[10]])
+
+
+def _write_firmware_xlsx(path: Path, size: int) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append(["Serial", "Product_Code", "State", "OpCo"])
+    for row in devices(size):
+        ws.append([row[0], row[1], row[5], row[10]])
+    wb.save(path)
+
+
+def _write_report_xlsx(path: Path, size: int) -> None:
+    """Report layout the AST script reads by default (A serial, B code, G family)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DeviceList")
+    ws.append(REPORT_HEADERS)
+    for row in devices(size):
+        ws.append(row)
+    wb.save(path)
+
+
+def _cached(name: str, size: int, suffix: str, build: Callable[[Path, int], object]) -> Path:
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    path = FIXTURE_DIR / f"{name}_{size}{suffix}"
+    if not path.exists():
+        tmp = path.with_name(path.name + ".tmp" + suffix)
+        build(tmp, size)
+        tmp.replace(path)
+    return path
+
+
+def export_bytes(size: int) -> bytes:
+    path = _cached(
+        "export", size, ".xls", lambda p, n: p.write_text(export_html(n), encoding="utf-8")
+    )
+    return path.read_bytes()
+
+
+def firmware_csv(size: int) -> Path:
+    return _cached("firmware", size, ".csv", _write_firmware_csv)
+
+
+def firmware_xlsx(size: int) -> Path:
+    return _cached("firmware", size, ".xlsx", _write_firmware_xlsx)
+
+
+def report_xlsx(size: int) -> Path:
+    return _cached("report", size, ".xlsx", _write_report_xlsx)
+
+
+def rdhc_file(size: int) -> Path:
+    return _cached(
+        "rdhc", size, ".html", lambda p, n: p.write_text(rdhc_html(n), encoding="utf-8")
+    )
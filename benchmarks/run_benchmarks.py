@@ -0,0 +1,325 @@
+"""Microbenchmarks for the parsing and file I/O hot paths.
+
+    python benchmarks/run_benchmarks.py                  # run, save, compare
+    python benchmarks/run_benchmarks.py --save-baseline  # accept current numbers
+    python benchmarks/run_benchmarks.py --filter read_rows --sizes 1000,10000
+    python benchmarks/run_benchmarks.py --filter iter_rows  # xlsx_reader vs openpyxl, 100k rows
+
+Each case runs at several input sizes on generated fixtures (see
+``fixtures.py``). Results are written to ``benchmarks/results/`` as JSON and
+compared with ``benchmarks/baseline.json``; a case whose median is slower
+than the baseline by more than ``--tolerance`` is reported as a regression
+and the exit code is 1. Baselines are machine-specific: record one on the
+machine that runs the comparison.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook  # type: ignore[import-untyped]
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+for _path in (
+    ROOT_DIR,
+    BENCH_DIR,
+    ROOT_DIR / "scripts" / "ep_report",
+    ROOT_DIR / "scripts" / "ast_toner",
+    ROOT_DIR / "scripts" / "schedule_firmware",
+):
+    if str(_path) not in sys.path:
+        sys.path.append(str(_path))
+
+import fixtures  # noqa: E402
+import xlsx_reader  # noqa: E402
+import fetch_and_clean  # noqa: E402
+import fetch_ast_toner  # noqa: E402
+import family_index  # noqa: E402
+import firmware_preflight  # noqa: E402
+import firmware_webforms_replay_playwright as replay  # noqa: E402
+import schedule_firmware  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+DEFAULT_SIZES = (100, 1000, 10000)
+XLSX_SIZES = (1000, 100000)
+MIN_TIMED_SECONDS = 0.05
+
+
+@dataclass
+class Case:
+    """``setup(size)`` returns the callable to time; ``before`` runs untimed before each call.
+
+    ``sizes`` replaces the default sizes for the case unless ``--sizes`` is given.
+    """
+
+    name: str
+    setup: Callable[[int], Callable[[], object]]
+    before: Optional[Callable[[], None]] = None
+    sizes: Optional[Tuple[int, ...]] = None
+
+
+def _extract_table_case(size: int) -> Callable[[], object]:
+    text = fetch_and_clean._decode_export(fixtures.export_bytes(size))
+    return lambda: fetch_and_clean._extract_table(text)
+
+
+def _clean_xlsx_case(size: int) -> Callable[[], object]:
+    raw = fixtures.export_bytes(size)
+    return lambda: fetch_and_clean.clean_html_xls_to_xlsx_bytes(raw, sheet_name="DeviceList")
+
+
+def _delta_case(size: int) -> Callable[[], object]:
+    delta = fixtures.msajax_delta(size)
+    return lambda: schedule_firmware._extract_from_msajax_delta(delta)
+
+
+def _status_case(size: int) -> Callable[[], object]:
+    page = fixtures.status_page(size)
+    return lambda: schedule_firmware.parse_status_from_html(page)
+
+
+def _normalize_case(size: int) -> Callable[[], object]:
+    raws = [
+        {"Serial": r[0], "Product_Code": r[1], "State": r[5].lower(), "OpCo": r[10]}
+        for r in fixtures.devices(size)
+    ]
+    return lambda: [replay.normalize_row(raw) for raw in raws]
+
+
+def _read_csv_case(size: int) -> Callable[[], object]:
+    path = fixtures.firmware_csv(size)
+    return lambda: list(replay.read_rows(path))
+
+
+def _read_xlsx_case(size: int) -> Callable[[], object]:
+    path = fixtures.firmware_xlsx(size)
+    return lambda: list(replay.read_rows(path))
+
+
+def _xlsx_reader_case(size: int) -> Callable[[], object]:
+    path = fixtures.report_xlsx(size)
+
+    def run() -> int:
+        with xlsx_reader.XlsxSheet(path) as sheet:
+            return sum(1 for _ in sheet.iter_rows(min_row=2))
+
+    return run
+
+
+def _openpyxl_case(size: int) -> Callable[[], object]:
+    path = fixtures.report_xlsx(size)
+
+    def run() -> int:
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = wb.active
+            assert sheet is not None
+            return sum(1 for _ in sheet.iter_rows(min_row=2, values_only=True))
+        finally:
+            wb.close()
+
+    return run
+
+
+def _preflight_case(size: int) -> Callable[[], object]:
+    rows = list(replay.read_rows(fixtures.firmware_csv(size)))
+    rows += rows[: size // 20]  # 5% repeats
+    return lambda: firmware_preflight.check_rows(rows, replay.STATE_TZ)
+
+
+_WORK_DIR = Path(tempfile.mkdtemp(prefix="sra-bench-"))
+
+
+class _RemoveRow:
+    """Removes the middle row from a fresh copy of the work CSV on every call."""
+
+    def __init__(self) -> None:
+        self.source: Optional[Path] = None
+        self.work = _WORK_DIR / "remove_row.csv"
+        self.item: Dict[str, str] = {}
+
+    def setup(self, size: int) -> Callable[[], object]:
+        self.source = fixtures.firmware_csv(size)
+        rows = list(replay.read_rows(self.source))
+        self.item = rows[len(rows) // 2]
+        return lambda: replay._remove_row_from_csv_sync(self.work, self.item)
+
+    def before(self) -> None:
+        assert self.source is not None
+        shutil.copyfile(self.source, self.work)
+
+
+def _load_input_rows_case(size: int) -> Callable[[], object]:
+    path = fixtures.report_xlsx(size)
+    return lambda: fetch_ast_toner.load_input_rows(path)
+
+
+def _family_map_case(size: int) -> Callable[[], object]:
+    path = fixtures.rdhc_file(size)
+    return lambda: family_index.load_product_family_map(path)
+
+
+_remove_row = _RemoveRow()
+
+CASES: List[Case] = [
+    Case("fetch_and_clean._extract_table", _extract_table_case),
+    Case("fetch_and_clean.clean_html_xls_to_xlsx_bytes", _clean_xlsx_case),
+    Case("schedule_firmware._extract_from_msajax_delta", _delta_case),
+    Case("schedule_firmware.parse_status_from_html", _status_case),
+    Case("firmware.normalize_row", _normalize_case),
+    Case("firmware.read_rows[csv]", _read_csv_case),
+    Case("firmware.read_rows[xlsx]", _read_xlsx_case),
+    Case("firmware._remove_row_from_csv_sync", _remove_row.setup, _remove_row.before),
+    Case("firmware_preflight.check_rows", _preflight_case, sizes=(1000, 100000)),
+    Case("ast_toner.load_input_rows", _load_input_rows_case),
+    Case("ast_toner.load_product_family_map", _family_map_case),
+    Case("xlsx_reader.iter_rows", _xlsx_reader_case, sizes=XLSX_SIZES),
+    Case("openpyxl.iter_rows[read_only]", _openpyxl_case, sizes=XLSX_SIZES),
+]
+
+
+def time_case(case: Case, size: int, repeats: int) -> Dict[str, Any]:
+    fn = case.setup(size)
+    number = 1
+    if case.before is None:
+        # Calibrate: loop fast calls so one sample is long enough to measure.
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - started >= MIN_TIMED_SECONDS or number >= 1 << 16:
+                break
+            number *= 2
+    samples: List[float] = []
+    for _ in range(repeats):
+        if case.before is not None:
+            case.before()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    median = statistics.median(samples)
+    return {
+        "case": case.name,
+        "size": size,
+        "number": number,
+        "repeats": repeats,
+        "min_s": min(samples),
+        "median_s": median,
+        "mean_s": statistics.fmean(samples),
+        "rows_per_s": size / median if median else 0.0,
+    }
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['case']}[{result['size']}]"
+
+
+def compare(results: Sequence[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print current vs baseline medians; returns the keys that regressed."""
+    previous = {_key(r): r for r in baseline.get("results", [])}
+    regressions: List[str] = []
+    print(f"\n{'case':<58} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in results:
+        key = _key(result)
+        base = previous.get(key)
+        if base is None or not base.get("median_s"):
+            print(f"{key:<58} {'-':>10} {result['median_s'] * 1000:>8.2f}ms {'new':>7}")
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(
+            f"{key:<58} {base['median_s'] * 1000:>8.2f}ms {result['median_s'] * 1000:>8.2f}ms "
+            f"{ratio:>6.2f}x{flag}"
+        )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the parsing and I/O hot paths.")
+    parser.add_argument(
+        "--sizes",
+        default="",
+        help=(
+            "Comma-separated input sizes in rows "
+            f"(default: {','.join(map(str, DEFAULT_SIZES))}, or the case's own sizes)."
+        ),
+    )
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed samples per case and size (default: 5).")
+    parser.add_argument("--output", type=Path, help="Results JSON path (default: benchmarks/results/<time>.json).")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline JSON to compare with.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown before a case counts as a regression (default: 0.25 = 25%%).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = [c for c in CASES if args.filter in c.name]
+    if not cases:
+        print(f"No benchmark matches {args.filter!r}")
+        return 2
+
+    results: List[Dict[str, Any]] = []
+    print(f"{'case':<58} {'median':>10} {'rows/s':>12}")
+    for case in cases:
+        for size in sizes or case.sizes or DEFAULT_SIZES:
+            result = time_case(case, size, args.repeats)
+            results.append(result)
+            print(f"{_key(result):<58} {result['median_s'] * 1000:>8.2f}ms {result['rows_per_s']:>12,.0f}")
+    shutil.rmtree(_WORK_DIR, ignore_errors=True)
+
+    payload = {
+        "created_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print(f"\n[OK] Results written to {output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"[OK] Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"[INFO] No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    print(f"\n[OK] No case slower than baseline by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,250 @@
+"""Long-lived browser shared by the automation scripts.
+
+Start it once (``python browser_service.py``) and set ``BROWSER_SERVICE_URL``
+for the scripts. It keeps one Chromium/Edge running with a remote-debugging
+port and an authenticated context seeded from ``BROWSER_SERVICE_STORAGE_STATE``.
+Scripts attach over CDP (see ``playwright_launch.attach_browser_service``)
+instead of cold-starting their own browser.
+
+Endpoints on ``BROWSER_SERVICE_HOST:BROWSER_SERVICE_PORT``:
+  GET /health  -> {"ok", "cdp_url", "launch_seconds", "restarts", ...} (503 when down)
+  GET /state   -> current storage state of the authenticated context
+
+``/state`` hands out live session cookies. When ``BROWSER_SERVICE_TOKEN`` is set
+it requires ``Authorization: Bearer <token>``; without a token the service only
+binds a loopback host.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Error as PlaywrightError,
+    Page,
+    StorageState,
+    async_playwright,
+)
+
+load_dotenv()
+
+HOST = os.getenv("BROWSER_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("BROWSER_SERVICE_PORT", "9333"))
+CDP_PORT = int(os.getenv("BROWSER_SERVICE_CDP_PORT", "9222"))
+CHANNEL = os.getenv("BROWSER_SERVICE_CHANNEL", "msedge").strip() or None
+HEADLESS = os.getenv("BROWSER_SERVICE_HEADLESS", "true").lower() in {"1", "true", "yes"}
+STORAGE_STATE = Path(
+    os.getenv("BROWSER_SERVICE_STORAGE_STATE", "storage_state.json").replace("\\", "/")
+).expanduser()
+ALLOWLIST = os.getenv(
+    "BROWSER_SERVICE_AUTH_ALLOWLIST",
+    os.getenv("FIRMWARE_AUTH_ALLOWLIST", "*.fujixerox.net,*.xerox.com"),
+)
+WARMUP_URL = os.getenv("BROWSER_SERVICE_WARMUP_URL", "").strip()
+HEALTH_INTERVAL_S = float(os.getenv("BROWSER_SERVICE_HEALTH_INTERVAL", "30"))
+TOKEN = os.getenv("BROWSER_SERVICE_TOKEN", "").strip()
+
+
+def _now() -> str:
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+class BrowserService:
+    """Owns the browser process, its warm context and the health/restart loop."""
+
+    def __init__(self) -> None:
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.storage_state: Optional[StorageState] = None
+        self.lock = threading.Lock()
+        self.status: Dict[str, Any] = {
+            "ok": False,
+            "cdp_url": f"http://127.0.0.1:{CDP_PORT}",
+            "launch_seconds": 0.0,
+            "restarts": 0,
+            "started_at": "",
+            "last_check": "",
+            "error": "starting",
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.status)
+
+    def state(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.storage_state or {})
+
+    def _update(self, **changes: Any) -> None:
+        with self.lock:
+            self.status.update(changes)
+
+    async def start(self, playwright) -> None:
+        started = time.perf_counter()
+        launch_kwargs: Dict[str, Any] = {
+            "headless": HEADLESS,
+            "args": [
+                f"--remote-debugging-port={CDP_PORT}",
+                f"--auth-server-allowlist={ALLOWLIST}",
+                f"--auth-negotiate-delegate-allowlist={ALLOWLIST}",
+            ],
+        }
+        if CHANNEL:
+            launch_kwargs["channel"] = CHANNEL
+        self.browser = await playwright.chromium.launch(**launch_kwargs)
+        context_kwargs: Dict[str, Any] = {}
+        if STORAGE_STATE.exists():
+            context_kwargs["storage_state"] = str(STORAGE_STATE)
+        self.context = await self.browser.new_context(**context_kwargs)
+        self.page = await self.context.new_page()
+        if WARMUP_URL:
+            # One navigation completes the integrated-auth handshake up front.
+            await self.page.goto(WARMUP_URL, wait_until="domcontentloaded")
+        launch_seconds = time.perf_counter() - started
+        state = await self.context.storage_state()
+        with self.lock:
+            self.storage_state = state
+        self._update(
+            ok=True,
+            launch_seconds=round(launch_seconds, 3),
+            started_at=_now(),
+            last_check=_now(),
+            error="",
+        )
+        print(f"[OK] Browser ready in {launch_seconds:.2f}s; CDP at {self.status['cdp_url']}")
+
+    async def stop(self) -> None:
+        self._update(ok=False)
+        if self.browser is not None:
+            with contextlib.suppress(PlaywrightError):
+                await self.browser.close()
+        self.browser = self.context = self.page = None
+
+    async def check(self) -> None:
+        """Probe the browser, the warm page and the CDP port; refresh cookies."""
+        if (
+            self.browser is None
+            or not self.browser.is_connected()
+            or self.context is None
+            or self.page is None
+        ):
+            raise RuntimeError("browser disconnected")
+        if WARMUP_URL:
+            await self.page.reload(wait_until="domcontentloaded")
+        else:
+            await self.page.evaluate("1")
+        await asyncio.to_thread(_probe_cdp, self.status["cdp_url"])
+        state = await self.context.storage_state()
+        with self.lock:
+            self.storage_state = state
+        self._update(ok=True, last_check=_now(), error="")
+
+    async def run(self) -> None:
+        """Start the browser, then health-check it and restart it when a check fails."""
+        async with async_playwright() as playwright:
+            launched_once = False
+            try:
+                while True:
+                    try:
+                        if self.browser is None:
+                            await self.start(playwright)
+                            if launched_once:
+                                with self.lock:
+                                    self.status["restarts"] += 1
+                            launched_once = True
+                        else:
+                            await self.check()
+                    except Exception as exc:  # noqa: BLE001 - any failure triggers a restart
+                        error = str(exc) or exc.__class__.__name__
+                        print(f"[WARN] Browser unhealthy ({error}); restarting")
+                        await self.stop()
+                        self._update(error=error)
+                    await asyncio.sleep(HEALTH_INTERVAL_S if self.browser else 5)
+            finally:
+                await self.stop()
+
+
+def _probe_cdp(cdp_url: str) -> None:
+    with urllib.request.urlopen(f"{cdp_url}/json/version", timeout=5) as response:
+        json.loads(response.read().decode("utf-8"))
+
+
+def _authorized(header: str) -> bool:
+    if not TOKEN:
+        return True
+    return hmac.compare_digest(header.encode("utf-8"), f"Bearer {TOKEN}".encode("utf-8"))
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _make_handler(service: BrowserService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            if self.path == "/health":
+                status = service.snapshot()
+                self._send(200 if status["ok"] else 503, status)
+            elif self.path == "/state":
+                if not _authorized(self.headers.get("Authorization", "")):
+                    self._send(401, {"error": "unauthorized"})
+                else:
+                    self._send(200, service.state())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            return
+
+    return Handler
+
+
+def main() -> None:
+    if not TOKEN and not _is_loopback(HOST):
+        raise SystemExit(
+            f"[ERROR] BROWSER_SERVICE_HOST={HOST} is not a loopback address; /state serves "
+            "session cookies, so set BROWSER_SERVICE_TOKEN or bind 127.0.0.1"
+        )
+    service = BrowserService()
+    server = ThreadingHTTPServer((HOST, PORT), _make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[INFO] Browser service listening on http://{HOST}:{PORT}")
+    try:
+        asyncio.run(service.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Failure-only diagnostics for the Playwright workers.
+
+With ``DIAGNOSTICS=true`` each worker keeps a ring buffer of its last
+``DIAG_RING_SIZE`` steps (label, URL, elapsed time, DOM excerpt) and the
+context records a Playwright trace in chunks. Nothing is written for rows that
+succeed quickly: when a row fails, or takes longer than ``DIAG_SLOW_MS``, its
+steps and a screenshot go to ``DIAG_DIR/<service>/<row>_<time>/``, and the
+trace chunk containing it is saved as a zip. Disk writes run in a worker
+thread so the event loop keeps serving the other pages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, List, Optional
+
+from playwright.async_api import BrowserContext, Error as PlaywrightError, Page
+
+
+def _env_path(var_name: str, default: str) -> Path:
+    raw_value = os.getenv(var_name, default)
+    normalised = raw_value.replace("\\", "/")
+    return Path(normalised).expanduser()
+
+
+def _enabled() -> bool:
+    return os.getenv("DIAGNOSTICS", "false").lower() in {"1", "true", "yes"}
+
+
+_DOM_EXCERPT_JS = """
+([limit]) => {
+  const root = document.querySelector('form') || document.body;
+  const html = root ? root.outerHTML : '';
+  return html.length > limit ? html.slice(0, limit) + '...' : html;
+}
+"""
+
+
+def _safe_name(text: str) -> str:
+    return re.sub(r"[^0-9A-Za-z_.-]+", "_", text)[:60] or "row"
+
+
+@dataclass
+class StepSnapshot:
+    label: str
+    url: str
+    elapsed_ms: float
+    at: str
+    dom: str
+
+
+def _write_bundle(folder: Path, steps: List[dict], screenshot: Optional[bytes], meta: dict) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "steps.json").write_text(
+        json.dumps({**meta, "steps": steps}, indent=2), encoding="utf-8"
+    )
+    if screenshot:
+        (folder / "screenshot.png").write_bytes(screenshot)
+
+
+class StepRecorder:
+    """Recent steps of one worker page; flushed to disk only for bad rows."""
+
+    def __init__(self, diagnostics: "Diagnostics", page: Page, worker: str) -> None:
+        self.diagnostics = diagnostics
+        self.page = page
+        self.worker = worker
+        self.steps: Deque[StepSnapshot] = deque(maxlen=diagnostics.ring_size)
+        self.row = ""
+        self.started = time.perf_counter()
+
+    def begin(self, row: str) -> None:
+        self.row = row
+        self.started = time.perf_counter()
+        self.steps.clear()
+
+    async def step(self, label: str) -> None:
+        if not self.diagnostics.enabled:
+            return
+        try:
+            dom = await self.page.evaluate(_DOM_EXCERPT_JS, [self.diagnostics.dom_chars])
+        except PlaywrightError as exc:
+            dom = f"<unavailable: {exc}>"
+        self.steps.append(
+            StepSnapshot(
+                label=label,
+                url=self.page.url,
+                elapsed_ms=round((time.perf_counter() - self.started) * 1000, 1),
+                at=datetime.now().isoformat(timespec="milliseconds"),
+                dom=dom,
+            )
+        )
+
+    async def finish(self, error: Optional[BaseException] = None) -> Optional[Path]:
+        """Persist the row's steps and a screenshot if it failed or ran slow."""
+        if not self.diagnostics.enabled:
+            return None
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        if error is None and elapsed_ms < self.diagnostics.slow_ms:
+            return None
+        screenshot: Optional[bytes] = None
+        with contextlib.suppress(PlaywrightError):
+            screenshot = await self.page.screenshot(full_page=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        folder = self.diagnostics.out_dir / f"{_safe_name(self.row)}_{stamp}"
+        meta = {
+            "row": self.row,
+            "worker": self.worker,
+            "reason": "error" if error is not None else "slow",
+            "error": "" if error is None else str(error),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "url": self.page.url,
+        }
+        steps = [asdict(s) for s in self.steps]
+        await asyncio.to_thread(_write_bundle, folder, steps, screenshot, meta)
+        print(f"[DIAG] {self.row}: {meta['reason']} after {elapsed_ms:.0f} ms -> {folder}")
+        return folder
+
+
+class ContextTrace:
+    """Playwright tracing on one context, kept only for chunks with a bad row.
+
+    Every ``chunk_rows`` rows the current chunk is closed: it is saved as a zip
+    if any of its rows was flagged and discarded otherwise.
+    """
+
+    def __init__(self, diagnostics: "Diagnostics", context: BrowserContext, name: str, chunk_rows: int) -> None:
+        self.diagnostics = diagnostics
+        self.context = context
+        self.name = name
+        self.chunk_rows = max(1, chunk_rows)
+        self.rows = 0
+        self.chunk = 0
+        self.flagged: List[str] = []
+        self.active = False
+        self.lock = asyncio.Lock()
+
+    async def start(self) -> "ContextTrace":
+        if not self.diagnostics.enabled:
+            return self
+        try:
+            await self.context.tracing.start(screenshots=True, snapshots=True)
+            await self.context.tracing.start_chunk()
+            self.active = True
+        except PlaywrightError as exc:
+            print(f"[WARN] Playwright tracing unavailable for {self.name}: {exc}")
+        return self
+
+    async def _close_chunk(self, *, restart: bool) -> None:
+        path: Optional[Path] = None
+        if self.flagged:
+            self.diagnostics.out_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = self.diagnostics.out_dir / f"{_safe_name(self.name)}_trace_{stamp}_{self.chunk:04d}.zip"
+        with contextlib.suppress(PlaywrightError):
+            await self.context.tracing.stop_chunk(path=path)
+            if path is not None:
+                print(f"[DIAG] Saved trace for {', '.join(self.flagged[:5])} -> {path}")
+            if restart:
+                await self.context.tracing.start_chunk()
+        self.chunk += 1
+        self.rows = 0
+        self.flagged = []
+
+    async def row_done(self, row: str, flagged: bool) -> None:
+        if not self.active:
+            return
+        async with self.lock:
+            self.rows += 1
+            if flagged:
+                self.flagged.append(row)
+            if self.rows >= self.chunk_rows:
+                await self._close_chunk(restart=True)
+
+    async def stop(self) -> None:
+        if not self.active:
+            return
+        async with self.lock:
+            if self.rows:
+                await self._close_chunk(restart=False)
+            else:
+                with contextlib.suppress(PlaywrightError):
+                    await self.context.tracing.stop_chunk()
+            with contextlib.suppress(PlaywrightError):
+                await self.context.tracing.stop()
+            self.active = False
+
+
+class Diagnostics:
+    """Settings shared by one script's recorders and traces."""
+
+    def __init__(self, service: str) -> None:
+        self.service = service
+        self.enabled = _enabled()
+        self.out_dir = _env_path("DIAG_DIR", "downloads/diagnostics") / service
+        self.ring_size = max(1, int(os.getenv("DIAG_RING_SIZE", "20")))
+        self.slow_ms = float(os.getenv("DIAG_SLOW_MS", "30000"))
+        self.dom_chars = max(0, int(os.getenv("DIAG_DOM_CHARS", "4000")))
+        self.chunk_rows = max(1, int(os.getenv("DIAG_TRACE_CHUNK_ROWS", "25")))
+
+    def recorder(self, page: Page, worker: str) -> StepRecorder:
+        return StepRecorder(self, page, worker)
+
+    async def trace(self, context: BrowserContext, name: str, chunk_rows: Optional[int] = None) -> ContextTrace:
+        return await ContextTrace(self, context, name, chunk_rows or self.chunk_rows).start()
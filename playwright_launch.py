@@ -1,15 +1,105 @@
-"""Helper for launching Playwright Chromium instances with shared defaults."""
+"""Helper for launching Playwright Chromium instances with shared defaults.
+
+When ``BROWSER_SERVICE_URL`` points at a running ``browser_service.py``, the
+helpers attach to its warm browser over CDP instead of cold-starting one, and
+fall back to a local launch if the service is unreachable or unhealthy.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import json
+import os
+import time
+import urllib.request
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from playwright.async_api import Browser, BrowserContext, Playwright
 
 StorageState = Union[str, Path, None]
 
 
+def _service_url() -> str:
+    return os.getenv("BROWSER_SERVICE_URL", "").strip().rstrip("/")
+
+
+def _service_get(path: str, timeout: float = 3.0) -> Dict[str, Any]:
+    request = urllib.request.Request(f"{_service_url()}{path}")
+    token = os.getenv("BROWSER_SERVICE_TOKEN", "").strip()
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+async def attach_browser_service(
+    playwright: Playwright, *, label: str = "job"
+) -> Optional[Browser]:
+    """Connect to the browser service over CDP, or ``None`` if it is not usable.
+
+    ``Browser.close()`` on the result only disconnects; the service keeps running.
+    """
+    if not _service_url():
+        return None
+    started = time.perf_counter()
+    try:
+        health = await asyncio.to_thread(_service_get, "/health")
+        if not health.get("ok"):
+            raise RuntimeError(health.get("error") or "service reports unhealthy")
+        browser = await playwright.chromium.connect_over_cdp(health["cdp_url"])
+    except Exception as exc:  # noqa: BLE001 - any failure means launch locally
+        print(f"[WARN] Browser service {_service_url()} unavailable ({exc}); launching locally")
+        return None
+    attach_seconds = time.perf_counter() - started
+    launch_seconds = float(health.get("launch_seconds") or 0.0)
+    print(
+        f"[INFO] {label}: attached to browser service in {attach_seconds:.2f}s "
+        f"(cold start {launch_seconds:.2f}s, saved {launch_seconds - attach_seconds:.2f}s)"
+    )
+    return browser
+
+
+async def browser_service_storage_state() -> Optional[Dict[str, Any]]:
+    """Current cookies/origins of the service's authenticated context."""
+    if not _service_url():
+        return None
+    try:
+        return await asyncio.to_thread(_service_get, "/state")
+    except Exception:  # noqa: BLE001
+        return None
+
+
+async def connect_or_launch(
+    playwright: Playwright,
+    *,
+    headless: bool = True,
+    channel: str | None = None,
+    args: Optional[List[str]] = None,
+    label: str = "job",
+) -> Browser:
+    """Attach to the browser service when configured, otherwise launch Chromium."""
+    browser = await attach_browser_service(playwright, label=label)
+    if browser is not None:
+        return browser
+    return await _launch_local(playwright, headless=headless, channel=channel, args=args)
+
+
+async def _launch_local(
+    playwright: Playwright,
+    *,
+    headless: bool,
+    channel: str | None,
+    args: Optional[List[str]] = None,
+) -> Browser:
+    launch_kwargs: Dict[str, Any] = {"headless": headless}
+    if channel:
+        launch_kwargs["channel"] = channel
+    if args:
+        launch_kwargs["args"] = args
+    return await playwright.chromium.launch(**launch_kwargs)
+
+
 async def launch_browser(
     playwright: Playwright,
     *,
@@ -20,17 +110,20 @@ async def launch_browser(
 ) -> Tuple[Browser, BrowserContext]:
     """Launch Chromium and create a context, optionally reusing storage state."""
 
-    launch_kwargs: Dict[str, Any] = {"headless": headless}
-    if channel:
-        launch_kwargs["channel"] = channel
-
-    browser = await playwright.chromium.launch(**launch_kwargs)
+    browser = await attach_browser_service(playwright)
+    attached = browser is not None
+    if browser is None:
+        browser = await _launch_local(playwright, headless=headless, channel=channel)
 
     context_kwargs: Dict[str, Any] = dict(context_overrides or {})
     if storage_state_path:
         state_path = Path(storage_state_path)
         if state_path.exists():
             context_kwargs["storage_state"] = str(state_path)
+    if attached and "storage_state" not in context_kwargs:
+        service_state = await browser_service_storage_state()
+        if service_state:
+            context_kwargs["storage_state"] = service_state
 
     context = await browser.new_context(**context_kwargs)
     return browser, context
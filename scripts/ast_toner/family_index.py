@@ -0,0 +1,240 @@
+"""Compiled product-family lookup for the RDHC dropdown, cached by RDHC.html hash."""
+
+from __future__ import annotations
+
+import csv
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+from bs4 import BeautifulSoup  # type: ignore[import-untyped]
+
+FAMILY_SELECTOR = "#MainContent_ddlProductFamily"
+INDEX_VERSION = 1
+# The dropdown's "Select" prompt is not a family, so it never resolves or is suggested.
+PLACEHOLDER_KEYS = {"", "select", "pleaseselect"}
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip()).lower()
+
+
+def _compact(text: str) -> str:
+    """Key that ignores case, spacing and punctuation ("DocuCentre-V" == "docucentre v")."""
+    return re.sub(r"[^0-9a-z]+", "", text.lower())
+
+
+def _digit_runs(text: str) -> list[str]:
+    return re.findall(r"\d+", text)
+
+
+def load_product_family_map(html_path: Path) -> dict[str, str]:
+    if not html_path.exists():
+        raise FileNotFoundError(
+            f"RDHC HTML reference not found at {html_path}. Provide RDHC_HTML_PATH in your environment."
+        )
+    soup = BeautifulSoup(
+        html_path.read_text(encoding="utf-8", errors="ignore"), "html.parser"
+    )
+    select = soup.select_one(FAMILY_SELECTOR)
+    if select is None:
+        raise ValueError("Could not locate the product family dropdown in RDHC.html")
+
+    mapping: dict[str, str] = {}
+    for option in select.find_all("option"):
+        value = (option.get("value") or "").strip()
+        label = option.get_text(strip=True)
+        if not value and not label:
+            continue
+        key_candidates = {value.lower(), label.lower()}
+        for candidate in key_candidates:
+            if candidate:
+                mapping[candidate] = value or label
+    return mapping
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_alias_rules(path: Optional[Path]) -> dict[str, str]:
+    """Alias file: JSON object of ``{"input family": "dropdown value or label"}``.
+
+    Keys starting with ``re:`` are regular expressions matched against the
+    whole normalised family name.
+    """
+    if path is None or not path.exists():
+        return {}
+    try:
+        rules = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as exc:
+        raise ValueError(f"Invalid family alias file {path}: {exc}") from exc
+    if not isinstance(rules, dict):
+        raise ValueError(f"Family alias file {path} must contain a JSON object")
+    return {str(k): str(v) for k, v in rules.items()}
+
+
+class FamilyIndex:
+    """Resolves report family names to dropdown values.
+
+    Order: normalised exact key, compact key (no punctuation/spacing), then
+    alias rules. Every answer is memoised, and names that still do not resolve
+    are counted for ``write_unresolved_report``, which lists difflib near-misses
+    (above ``fuzzy_cutoff``, same digit runs) as suggestions to pin with an
+    alias. Near-misses are never applied: "Gyokusan4" is a different
+    generation from "Gyokusan3", not a typo.
+    """
+
+    def __init__(
+        self,
+        exact: dict[str, str],
+        *,
+        aliases: Optional[dict[str, str]] = None,
+        fuzzy_cutoff: float = 0.85,
+        source_sha256: str = "",
+    ) -> None:
+        self.exact = {
+            key: value
+            for key, value in exact.items()
+            if _compact(key) not in PLACEHOLDER_KEYS and _compact(value) not in PLACEHOLDER_KEYS
+        }
+        self.source_sha256 = source_sha256
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.compact: dict[str, str] = {}
+        for key, value in self.exact.items():
+            self.compact.setdefault(_compact(key), value)
+        self.alias_exact: dict[str, str] = {}
+        self.alias_patterns: list[tuple[re.Pattern[str], str]] = []
+        for alias, target in (aliases or {}).items():
+            option = self._direct(target)
+            if option is None:
+                logging.warning("Family alias %r points at unknown family %r", alias, target)
+                continue
+            if alias.startswith("re:"):
+                self.alias_patterns.append((re.compile(alias[3:], re.I), option))
+            else:
+                self.alias_exact[_compact(alias)] = option
+        self._memo: dict[str, Optional[str]] = {}
+        self.unresolved: Counter[str] = Counter()
+        self.unresolved_serials: dict[str, list[str]] = defaultdict(list)
+
+    def _direct(self, family: str) -> Optional[str]:
+        key = _normalise(family)
+        if key in self.exact:
+            return self.exact[key]
+        return self.compact.get(_compact(family))
+
+    def _resolve_uncached(self, family: str) -> Optional[str]:
+        value = self._direct(family)
+        if value is not None:
+            return value
+        compact = _compact(family)
+        if compact in self.alias_exact:
+            return self.alias_exact[compact]
+        normalised = _normalise(family)
+        for pattern, target in self.alias_patterns:
+            if pattern.fullmatch(normalised):
+                return target
+        return None
+
+    def resolve(self, family: str) -> Optional[str]:
+        if not family:
+            return None
+        if family not in self._memo:
+            self._memo[family] = self._resolve_uncached(family)
+        return self._memo[family]
+
+    def note_unresolved(self, family: str, serial: str) -> None:
+        self.unresolved[family] += 1
+        if len(self.unresolved_serials[family]) < 5:
+            self.unresolved_serials[family].append(serial)
+
+    def suggestions(self, family: str, n: int = 3) -> list[str]:
+        """Near-miss dropdown values for an unknown family; digit runs must match."""
+        compact = _compact(family)
+        digits = _digit_runs(compact)
+        candidates = [key for key in self.compact if _digit_runs(key) == digits]
+        close = difflib.get_close_matches(compact, candidates, n=n, cutoff=self.fuzzy_cutoff)
+        return sorted({self.compact[key] for key in close})
+
+    def write_unresolved_report(self, path: Path) -> None:
+        """One row per unknown family with its row count, example serials and suggestions."""
+        if not self.unresolved:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["ProductFamily", "Rows", "ExampleSerials", "Suggestions"])
+            for family, count in self.unresolved.most_common():
+                writer.writerow(
+                    [
+                        family or "<blank>",
+                        count,
+                        " ".join(self.unresolved_serials[family]),
+                        "; ".join(self.suggestions(family)),
+                    ]
+                )
+        logging.warning(
+            "%d row(s) across %d unknown product famil(ies) were skipped; see %s",
+            sum(self.unresolved.values()),
+            len(self.unresolved),
+            path,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "rdhc_sha256": self.source_sha256,
+            "exact": self.exact,
+        }
+
+
+def load_family_index(
+    html_path: Path,
+    cache_path: Path,
+    *,
+    aliases: Optional[dict[str, str]] = None,
+    fuzzy_cutoff: float = 0.85,
+) -> FamilyIndex:
+    """Load the compiled index for ``html_path``, rebuilding it when the file changed."""
+    if not html_path.exists():
+        raise FileNotFoundError(
+            f"RDHC HTML reference not found at {html_path}. Provide RDHC_HTML_PATH in your environment."
+        )
+    digest = _sha256(html_path)
+    if cache_path.exists():
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cached = {}
+        if cached.get("version") == INDEX_VERSION and cached.get("rdhc_sha256") == digest:
+            logging.info("Using compiled family index %s", cache_path)
+            return FamilyIndex(
+                cached["exact"],
+                aliases=aliases,
+                fuzzy_cutoff=fuzzy_cutoff,
+                source_sha256=digest,
+            )
+
+    logging.info("Compiling family index from %s", html_path)
+    index = FamilyIndex(
+        load_product_family_map(html_path),
+        aliases=aliases,
+        fuzzy_cutoff=fuzzy_cutoff,
+        source_sha256=digest,
+    )
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    tmp.write_text(json.dumps(index.to_json()), encoding="utf-8")
+    os.replace(tmp, cache_path)
+    return index
@@ -2,21 +2,26 @@
 
 from __future__ import annotations
 
+import argparse
 import asyncio
+import contextlib
 import csv
+import fnmatch
+import json
 import logging
 import os
 import re
 import sys
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Optional, Sequence
 
-from bs4 import BeautifulSoup  # type: ignore[import-untyped]
+import httpx  # type: ignore[import-untyped]
 from dotenv import load_dotenv  # type: ignore[import-untyped]
-from openpyxl import load_workbook  # type: ignore[import-untyped]
-from openpyxl.utils import column_index_from_string  # type: ignore[import-untyped]
 from playwright.async_api import (  # type: ignore[import-untyped]
+    BrowserContext,
     Error as PlaywrightError,
     Page,
     TimeoutError as PlaywrightTimeoutError,
@@ -28,6 +33,11 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
 from playwright_launch import launch_browser  # noqa: E402
+from family_index import FamilyIndex, load_alias_rules, load_family_index  # noqa: E402
+from rdhc_http import RdhcFormSession, RdhcHttpError, build_client  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+from diagnostics import Diagnostics, StepRecorder  # noqa: E402
+from xlsx_reader import XlsxSheet, resolve_columns  # noqa: E402
 
 load_dotenv()
 
@@ -51,6 +61,53 @@ PRODUCT_FAMILY_COLUMN = os.getenv(
 )
 PRODUCT_CODE_COLUMN = os.getenv("PRODUCT_CODE_COLUMN", os.getenv("PRODUCT_CODE", "B"))
 SERIAL_COLUMN = os.getenv("SERIAL_COLUMN", os.getenv("SERIAL", "A"))
+STATE_COLUMN = os.getenv("STATE_COLUMN", "").strip()
+CUSTOMER_COLUMN = os.getenv("CUSTOMER_COLUMN", "").strip()
+AST_CONCURRENCY = max(1, int(os.getenv("AST_CONCURRENCY", "4")))
+AST_FLUSH_EVERY = max(1, int(os.getenv("AST_FLUSH_EVERY", "25")))
+AST_RESUME = os.getenv("AST_RESUME", "false").lower() in {"1", "true", "yes"}
+AST_CACHE_PATH = _env_path("AST_CACHE_PATH", "data/ast_toner/toner_cache.json")
+AST_CACHE_MAX_AGE_HOURS = float(os.getenv("AST_CACHE_MAX_AGE_HOURS", "168"))
+AST_CACHE_LOW_MAX_AGE_HOURS = float(os.getenv("AST_CACHE_LOW_MAX_AGE_HOURS", "24"))
+AST_CACHE_LOW_THRESHOLD_PCT = float(os.getenv("AST_CACHE_LOW_THRESHOLD_PCT", "20"))
+AST_LOOKUP_TIMEOUT_MS = int(os.getenv("AST_LOOKUP_TIMEOUT_MS", "30000"))
+AST_FAMILY_INDEX_PATH = _env_path(
+    "AST_FAMILY_INDEX_PATH", "data/ast_toner/family_index.json"
+)
+AST_FAMILY_ALIASES = _env_path("AST_FAMILY_ALIASES", "data/ast_toner/family_aliases.json")
+AST_FAMILY_FUZZY_CUTOFF = float(os.getenv("AST_FAMILY_FUZZY_CUTOFF", "0.85"))
+AST_UNRESOLVED_REPORT = _env_path(
+    "AST_UNRESOLVED_REPORT", "data/ast_toner/unresolved_families.csv"
+)
+AST_BUDGET_MINUTES = float(os.getenv("AST_BUDGET_MINUTES", "0"))
+AST_PRIORITY_WEIGHTS = _env_path(
+    "AST_PRIORITY_WEIGHTS", "data/ast_toner/customer_weights.json"
+)
+AST_PRIORITY_WINDOW = max(1, int(os.getenv("AST_PRIORITY_WINDOW", "50")))
+AST_DEFERRED_PATH = _env_path("AST_DEFERRED_PATH", "data/ast_toner/deferred.json")
+AST_ENGINE = os.getenv("AST_ENGINE", "browser").strip().lower() or "browser"
+TRACER = get_tracer("ast_toner")
+DIAGNOSTICS = Diagnostics("ast_toner")
+
+RESULT_FIELDS = [
+    "SerialNumber",
+    "ProductCode",
+    "ProductFamily",
+    "TonerBlackPct",
+    "TonerCyanPct",
+    "TonerMagentaPct",
+    "TonerYellowPct",
+    "LowToner",
+    "NoData",
+    "HasError",
+    "StatusMessage",
+    "ReadingTimestamp",
+    "PanelText",
+    "Source",
+    "FetchedAt",
+    "ReadingAgeHours",
+    "LookupMs",
+]
 
 SELECTORS = {
     "product_family": "#MainContent_ddlProductFamily",
@@ -58,7 +115,131 @@ SELECTORS = {
     "serial_number": "#MainContent_txtSerialNumber",
     "submit": "#MainContent_btnSubmit",
     "result_panel": "#MainContent_UpdatePanelResult",
+    "message_panel": "#MainContent_UpdatePnlMsg",
+}
+
+TONER_COLOURS = ("Black", "Cyan", "Magenta", "Yellow")
+
+# Arms one-shot PageRequestManager handlers before a submit. The form has
+# several UpdatePanels (message, search form, result, grid) and a postback may
+# refresh any subset of them, e.g. only the message panel for "not found", so
+# completion is the end of the postback rather than a change to one panel.
+# pageLoaded records which panels were refreshed; endRequest marks the lookup
+# done and keeps any server error message.
+_ARM_POSTBACK_JS = """
+() => {
+  window.__sraLookup = { state: 'pending', panels: [], error: '' };
+  const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+  if (!prm) return false;
+  const loaded = (sender, args) => {
+    window.__sraLookup.panels = args.get_panelsUpdated().map((p) => p.id);
+    prm.remove_pageLoaded(loaded);
+  };
+  const ended = (sender, args) => {
+    const error = args.get_error();
+    if (error) window.__sraLookup.error = error.message || String(error);
+    window.__sraLookup.state = 'done';
+    prm.remove_endRequest(ended);
+  };
+  prm.add_pageLoaded(loaded);
+  prm.add_endRequest(ended);
+  return true;
+}
+"""
+
+# Done once the armed postback has ended, or a full postback loaded a new
+# document (no lookup state; every panel counts as refreshed).
+_POSTBACK_DONE_JS = """
+() => {
+  const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+  if (prm && prm.get_isInAsyncPostBack()) return false;
+  const lookup = window.__sraLookup;
+  if (!lookup) return document.readyState === 'complete' ? { panels: null, error: '' } : false;
+  return lookup.state === 'done' ? { panels: lookup.panels, error: lookup.error } : false;
+}
+"""
+
+_POSTBACK_IDLE_JS = """
+() => {
+  const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+  return !prm || !prm.get_isInAsyncPostBack();
+}
+"""
+
+# Runs in the page after each submit and returns only the fields we keep, so the
+# panel HTML never crosses CDP. Grid tables are read header -> value; two-column
+# label/value tables row by row. Labels decide what each value is: a toner level
+# needs "toner" plus a full colour name, so drum and waste-toner rows are not
+# read as toner. rdhc_http.extract_panel is the Python twin and must stay in
+# step (same rows, cells and text). The result markup is not in RDHC.html (the
+# panel is empty until a postback fills it), so these rules are inferred from
+# the form rather than taken from a captured response.
+_PANEL_EXTRACT_JS = r"""
+([panelSel, messageSel]) => {
+  const clean = (s) => (s || '').replace(/\s+/g, ' ').trim();
+  // Like BeautifulSoup's get_text(' ', strip=True): trimmed text nodes joined by
+  // spaces, script/style excluded, regardless of CSS (unlike innerText).
+  const text = (node) => {
+    if (!node) return '';
+    const parts = [];
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    for (let n = walker.nextNode(); n; n = walker.nextNode()) {
+      const parent = n.parentNode ? n.parentNode.nodeName : '';
+      if (parent === 'SCRIPT' || parent === 'STYLE') continue;
+      const t = n.data.trim();
+      if (t) parts.push(t);
+    }
+    return clean(parts.join(' '));
+  };
+  const panel = panelSel ? document.querySelector(panelSel) : null;
+  const message = messageSel ? document.querySelector(messageSel) : null;
+  const out = {
+    text: text(panel),
+    status: text(message),
+    toner: {},
+    timestamp: '',
+  };
+  if (!panel) return out;
+
+  const pairs = [];
+  for (const table of panel.querySelectorAll('table')) {
+    // table.rows / tr.cells hold only this table's own rows and cells.
+    const trs = Array.from(table.rows);
+    const rows = trs.map((tr) => Array.from(tr.cells).map(text));
+    if (!rows.length) continue;
+    const headed = Array.from(trs[0].cells).some((c) => c.tagName === 'TH');
+    if (headed && rows.length > 1) {
+      rows[0].forEach((label, i) => pairs.push([label, rows[1][i] || '']));
+    } else {
+      for (const cells of rows) {
+        if (cells.length >= 2) pairs.push([cells[0], cells.slice(1).join(' ')]);
+      }
+    }
+  }
+
+  const toner = /\btoner\b/i;
+  const notToner = /\b(waste|drum)\b/i;
+  const colour = /\b(black|cyan|magenta|yellow)\b/i;
+  const pct = /(\d{1,3}(?:\.\d+)?)\s*%/;
+  for (const [label, value] of pairs) {
+    const isToner = toner.test(label) && !notToner.test(label);
+    const p = value.match(pct) || (isToner ? label.match(pct) : null);
+    if (p) {
+      const hit = isToner ? label.match(colour) : null;
+      const key = hit ? hit[1].toLowerCase() : '';
+      if (key && out.toner[key] === undefined) out.toner[key] = parseFloat(p[1]);
+    } else if (!out.timestamp && /date|time|updated|received|last/i.test(label) && /\d/.test(value)) {
+      out.timestamp = value;
+    } else if (/status/i.test(label) && value && !out.status) {
+      out.status = value;
+    }
+  }
+  return out;
 }
+"""
 
 
 @dataclass
@@ -66,44 +247,70 @@ class InputRow:
     serial_number: str
     product_code: str
     product_family: str
+    state: str = ""
+    customer: str = ""
 
 
-def _normalise(text: str) -> str:
-    return re.sub(r"\s+", " ", text.strip()).lower()
+@dataclass
+class LookupStats:
+    lookups: int = 0
+    family_switches: int = 0
+    completed: int = 0
+    lookup_ms_total: float = 0.0
 
 
-def load_product_family_map(html_path: Path) -> dict[str, str]:
-    if not html_path.exists():
-        raise FileNotFoundError(
-            f"RDHC HTML reference not found at {html_path}. Provide RDHC_HTML_PATH in your environment."
-        )
-    soup = BeautifulSoup(
-        html_path.read_text(encoding="utf-8", errors="ignore"), "html.parser"
-    )
-    select = soup.select_one(SELECTORS["product_family"])
-    if select is None:
-        raise ValueError("Could not locate the product family dropdown in RDHC.html")
-
-    mapping: dict[str, str] = {}
-    for option in select.find_all("option"):
-        value = (option.get("value") or "").strip()
-        label = option.get_text(strip=True)
-        if not value and not label:
+def _input_columns() -> dict[str, Optional[str]]:
+    """Workbook column for each ``InputRow`` field: a letter or a header name (None when unused)."""
+    return {
+        "serial": SERIAL_COLUMN.strip(),
+        "product": PRODUCT_CODE_COLUMN.strip(),
+        "family": PRODUCT_FAMILY_COLUMN.strip(),
+        "state": STATE_COLUMN or None,
+        "customer": CUSTOMER_COLUMN or None,
+    }
+
+
+def _build_input_rows(
+    values: Iterable[Sequence[object]], positions: dict[str, Optional[int]]
+) -> list[InputRow]:
+    def cell(row_values: Sequence[object], key: str) -> str:
+        idx = positions[key]
+        if idx is None:
+            return ""
+        value = row_values[idx] if 0 <= idx < len(row_values) else None
+        return "" if value is None else str(value).strip()
+
+    rows: list[InputRow] = []
+    for row_values in values:
+        serial_text = cell(row_values, "serial")
+        product_text = cell(row_values, "product")
+        family_text = cell(row_values, "family")
+        if not serial_text and not product_text and not family_text:
             continue
-        key_candidates = {value.lower(), label.lower()}
-        for candidate in key_candidates:
-            if candidate:
-                mapping[candidate] = value or label
-    return mapping
+        rows.append(
+            InputRow(
+                serial_number=serial_text,
+                product_code=product_text,
+                product_family=family_text,
+                state=cell(row_values, "state"),
+                customer=cell(row_values, "customer"),
+            )
+        )
+    return rows
 
 
-def _column_index(column_ref: str, *, label: str) -> int:
-    try:
-        return column_index_from_string(column_ref.strip())
-    except ValueError as exc:  # noqa: B904
-        raise ValueError(
-            f"Invalid column reference '{column_ref}' for {label} column"
-        ) from exc
+def input_rows_from_values(
+    values: Iterable[Sequence[object]], headers: Sequence[str] = ()
+) -> list[InputRow]:
+    """Build ``InputRow``s from full data rows (column A first) handed over in memory.
+
+    ``headers`` lets the column settings name header cells instead of letters.
+    """
+    refs = _input_columns()
+    used = {key: ref for key, ref in refs.items() if ref}
+    positions: dict[str, Optional[int]] = dict.fromkeys(refs)
+    positions.update(zip(used, resolve_columns(headers, list(used.values()))))
+    return _build_input_rows(values, positions)
 
 
 def load_input_rows(path: Path) -> list[InputRow]:
@@ -112,62 +319,100 @@ def load_input_rows(path: Path) -> list[InputRow]:
 
     logging.info("Reading AST input workbook from %s", path)
 
-    family_col = _column_index(PRODUCT_FAMILY_COLUMN, label="Product Family")
-    product_col = _column_index(PRODUCT_CODE_COLUMN, label="Product Code")
-    serial_col = _column_index(SERIAL_COLUMN, label="Serial Number")
+    refs = _input_columns()
+    used = {key: ref for key, ref in refs.items() if ref}
+    positions: dict[str, Optional[int]] = dict.fromkeys(refs)
+    positions.update((key, idx) for idx, key in enumerate(used))
+    with XlsxSheet(path) as sheet:
+        return _build_input_rows(
+            sheet.iter_rows(columns=list(used.values()), min_row=2), positions
+        )
 
-    workbook = load_workbook(path, read_only=True, data_only=True)
-    try:
-        sheet = workbook.active
-        if sheet is None:
-            raise ValueError("AST input workbook does not contain an active worksheet")
-
-        start_col = min(serial_col, product_col, family_col)
-        end_col = max(serial_col, product_col, family_col)
-        serial_idx = serial_col - start_col
-        product_idx = product_col - start_col
-        family_idx = family_col - start_col
-
-        rows: list[InputRow] = []
-        empty_streak = 0
-        for row_values in sheet.iter_rows(
-            min_row=2,
-            min_col=start_col,
-            max_col=end_col,
-            values_only=True,
-        ):
-            serial = (
-                row_values[serial_idx] if len(row_values) > serial_idx else None
-            )
-            product = (
-                row_values[product_idx] if len(row_values) > product_idx else None
-            )
-            family = (
-                row_values[family_idx] if len(row_values) > family_idx else None
-            )
 
-            serial_text = "" if serial is None else str(serial).strip()
-            product_text = "" if product is None else str(product).strip()
-            family_text = "" if family is None else str(family).strip()
+@dataclass
+class RunPlan:
+    """What a run will do, decided before any browser or HTTP session starts.
 
-            if not serial_text and not product_text and not family_text:
-                empty_streak += 1
-                if rows and empty_streak >= 50:
-                    break
-                continue
+    ``rows`` are the kept rows in input order; ``cached`` and ``live`` index
+    into it.
+    """
 
-            empty_streak = 0
+    total: int = 0
+    duplicates: int = 0
+    unresolved: int = 0
+    filtered: int = 0
+    resumed: int = 0
+    rows: list[InputRow] = field(default_factory=list)
+    cached: dict[int, dict[str, str]] = field(default_factory=dict)
+    live: list[int] = field(default_factory=list)
 
-            rows.append(
-                InputRow(
-                    serial_number=serial_text,
-                    product_code=product_text,
-                    product_family=family_text,
-                )
+    def summary(self) -> str:
+        return (
+            f"total={self.total} unique={self.total - self.duplicates} "
+            f"duplicates={self.duplicates} unknown_family={self.unresolved} "
+            f"filtered={self.filtered} resumed={self.resumed} "
+            f"cached={len(self.cached)} to_fetch={len(self.live)}"
+        )
+
+
+def plan_rows(
+    rows: list[InputRow],
+    families: FamilyIndex,
+    *,
+    family_filter: Optional[list[str]] = None,
+    code_filter: Optional[list[str]] = None,
+    state_filter: Optional[list[str]] = None,
+    done: Optional[set[str]] = None,
+    cache: Optional[TonerCache] = None,
+    now: Optional[datetime] = None,
+) -> RunPlan:
+    """De-duplicate by serial, drop unknown families, filter, then split cached/live.
+
+    Family filters match by resolved dropdown value, product-code filters are
+    case-insensitive shell patterns (``DC*``), and state filters are exact.
+    """
+    plan = RunPlan(total=len(rows))
+    wanted_families = (
+        {families.resolve(name) or name for name in family_filter} if family_filter else None
+    )
+    code_patterns = [pattern.upper() for pattern in code_filter or []]
+    wanted_states = {state.upper() for state in state_filter} if state_filter else None
+    seen: set[str] = set()
+    now = now or datetime.now().astimezone()
+
+    for row in rows:
+        key = row.serial_number.upper()
+        if key and key in seen:
+            plan.duplicates += 1
+            continue
+        seen.add(key)
+        value = families.resolve(row.product_family)
+        if value is None:
+            plan.unresolved += 1
+            families.note_unresolved(row.product_family, row.serial_number)
+            continue
+        if (
+            (wanted_families is not None and value not in wanted_families)
+            or (
+                code_patterns
+                and not any(fnmatch.fnmatchcase(row.product_code.upper(), p) for p in code_patterns)
             )
-        return rows
-    finally:
-        workbook.close()
+            or (wanted_states is not None and row.state.upper() not in wanted_states)
+        ):
+            plan.filtered += 1
+            continue
+        if done and row.serial_number in done:
+            plan.resumed += 1
+            continue
+
+        index = len(plan.rows)
+        plan.rows.append(row)
+        hit = cache.lookup(row, now) if cache is not None else None
+        if hit is not None:
+            plan.cached[index] = hit
+        else:
+            plan.live.append(index)
+    return plan
 
 
 async def _fill(page: Page, selector: str, value: str) -> None:
@@ -181,29 +426,100 @@ async def _fill(page: Page, selector: str, value: str) -> None:
         await locator.type(value)
 
 
-def _resolve_family_value(family: str, mapping: dict[str, str]) -> Optional[str]:
-    if not family:
-        return None
-    key = _normalise(family)
-    if key in mapping:
-        return mapping[key]
-    # Try exact match without case folding
-    for candidate, value in mapping.items():
-        if candidate == family.lower() or value.lower() == key:
-            return value
-    return None
+def order_by_family(rows: list[InputRow], families: FamilyIndex) -> list[int]:
+    """Indices of ``rows`` grouped by resolved dropdown value (stable within a group).
 
+    Unresolvable families sort last; ``main`` normally filters them out first.
+    """
+    first_seen: dict[str, int] = {}
+    keys: list[tuple[int, int]] = []
+    for index, row in enumerate(rows):
+        value = families.resolve(row.product_family)
+        group = first_seen.setdefault(value or "", len(first_seen))
+        keys.append((1 if value is None else 0, group))
+    return sorted(range(len(rows)), key=lambda i: keys[i])
 
-def _extract_panel_text(html: str) -> str:
-    if not html:
-        return ""
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(separator=" ", strip=True)
-    return re.sub(r"\s+", " ", text)
+
+def load_customer_weights(path: Path) -> dict[str, float]:
+    """``{"Customer name": weight}``; customers not listed weigh 1.0."""
+    if not path.exists():
+        return {}
+    try:
+        weights = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as exc:
+        raise ValueError(f"Invalid customer weights file {path}: {exc}") from exc
+    return {str(name).strip().lower(): float(weight) for name, weight in weights.items()}
+
+
+def load_deferred_serials(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    try:
+        return set(json.loads(path.read_text(encoding="utf-8")).get("serials", []))
+    except (OSError, ValueError):
+        logging.warning("Ignoring unreadable deferred list %s", path)
+        return set()
+
+
+def save_deferred_serials(path: Path, serials: list[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    payload = {
+        "saved_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "serials": serials,
+    }
+    tmp.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def priority_score(
+    row: InputRow,
+    cache: Optional[TonerCache],
+    weights: dict[str, float],
+    deferred: set[str],
+    now: datetime,
+) -> float:
+    """Higher runs first.
+
+    Staleness contributes up to 2 (age / AST_CACHE_MAX_AGE_HOURS, never-read
+    serials count as 2), the lowest last-known toner up to 1 ((100 - pct) / 100,
+    0.5 when unknown). The sum is scaled by the customer weight, and serials
+    deferred by the previous run jump the queue.
+    """
+    age = cache.age_hours(row.serial_number, now) if cache is not None else None
+    staleness = 2.0 if age is None else min(age / max(AST_CACHE_MAX_AGE_HOURS, 1e-9), 2.0)
+    entry = cache.entries.get(row.serial_number) if cache is not None else None
+    lowest = entry.get("lowest_pct") if entry else None
+    low_toner = 0.5 if lowest is None else max(0.0, 100.0 - lowest) / 100.0
+    score = (staleness + low_toner) * weights.get(row.customer.lower(), 1.0)
+    return score + (100.0 if row.serial_number in deferred else 0.0)
+
+
+def order_by_priority(
+    rows: list[InputRow],
+    families: FamilyIndex,
+    scores: list[float],
+    window: int = AST_PRIORITY_WINDOW,
+) -> list[int]:
+    """Indices by descending score, grouped by family inside each ``window``.
+
+    A budget cut still lands after the most important rows, and most of the
+    dropdown-switch savings are kept.
+    """
+    ranked = sorted(range(len(rows)), key=lambda i: -scores[i])
+    ordered: list[int] = []
+    for start in range(0, len(ranked), window):
+        chunk = ranked[start : start + window]
+        ordered.extend(chunk[i] for i in order_by_family([rows[j] for j in chunk], families))
+    return ordered
 
 
 async def process_row(
-    page: Page, row: InputRow, mapping: dict[str, str]
+    page: Page,
+    row: InputRow,
+    families: FamilyIndex,
+    stats: Optional[LookupStats] = None,
+    recorder: Optional[StepRecorder] = None,
 ) -> dict[str, str]:
     logging.info(
         "Processing serial=%s product_code=%s product_family=%s",
@@ -212,63 +528,630 @@ async def process_row(
         row.product_family or "-",
     )
 
-    option_value = _resolve_family_value(row.product_family, mapping)
+    option_value = families.resolve(row.product_family)
     if option_value is None:
         raise ValueError(
             f"Unknown product family '{row.product_family}' — update RDHC.html or input data"
         )
 
-    await page.select_option(SELECTORS["product_family"], option_value)
+    # Changing the family can trigger its own postback; skip it when unchanged.
+    if await page.input_value(SELECTORS["product_family"]) != option_value:
+        with TRACER.span("family_switch", row=row.serial_number, family=option_value):
+            await page.select_option(SELECTORS["product_family"], option_value)
+            await page.wait_for_function(
+                _POSTBACK_IDLE_JS, timeout=AST_LOOKUP_TIMEOUT_MS, polling=50
+            )
+        if stats is not None:
+            stats.family_switches += 1
+        if recorder is not None:
+            await recorder.step("family-selected")
+    if stats is not None:
+        stats.lookups += 1
     await _fill(page, SELECTORS["product_code"], row.product_code)
     await _fill(page, SELECTORS["serial_number"], row.serial_number)
-    await page.click(SELECTORS["submit"])
+    if recorder is not None:
+        await recorder.step("fields-filled")
 
-    try:
-        await page.wait_for_timeout(750)
-        await page.wait_for_load_state("networkidle")
-    except PlaywrightTimeoutError:
-        pass
+    await page.evaluate(_ARM_POSTBACK_JS)
+    started = time.perf_counter()
+    with TRACER.span("submit", row=row.serial_number):
+        await page.click(SELECTORS["submit"])
+        try:
+            handle = await page.wait_for_function(
+                _POSTBACK_DONE_JS, timeout=AST_LOOKUP_TIMEOUT_MS, polling=50
+            )
+        except PlaywrightTimeoutError as exc:
+            raise TimeoutError(
+                f"No RDHC response within {AST_LOOKUP_TIMEOUT_MS} ms"
+            ) from exc
+        postback = await handle.json_value()
+    lookup_ms = (time.perf_counter() - started) * 1000
+    if stats is not None:
+        stats.completed += 1
+        stats.lookup_ms_total += lookup_ms
+    if recorder is not None:
+        await recorder.step("panel-ready")
 
+    if postback["error"]:
+        raise RuntimeError(f"RDHC postback error: {postback['error']}")
+    # A panel the postback did not refresh still shows the previous device, so
+    # only the panels that changed are read (all of them after a full postback).
+    refreshed = postback["panels"]
+    selectors = [
+        sel if refreshed is None or sel.lstrip("#") in refreshed else None
+        for sel in (SELECTORS["result_panel"], SELECTORS["message_panel"])
+    ]
     try:
-        panel_html = await page.inner_html(SELECTORS["result_panel"])
-    except PlaywrightTimeoutError:
-        panel_html = ""
+        panel = await page.evaluate(_PANEL_EXTRACT_JS, selectors)
+    except PlaywrightError as exc:
+        logging.warning("Could not read result panel for %s: %s", row.serial_number, exc)
+        panel = {}
 
-    panel_text = _extract_panel_text(panel_html)
-    logging.info("Result for %s: %s", row.serial_number, panel_text or "<no data>")
+    return _lookup_result(row, panel, lookup_ms)
 
+
+def _lookup_result(row: InputRow, panel: dict, lookup_ms: float) -> dict[str, str]:
+    fields = panel_fields(panel)
+    logging.info(
+        "Result for %s in %.0f ms: %s",
+        row.serial_number,
+        lookup_ms,
+        fields["PanelText"] or "<no data>",
+    )
     return {
         "SerialNumber": row.serial_number,
         "ProductCode": row.product_code,
         "ProductFamily": row.product_family,
-        "PanelText": panel_text,
+        **fields,
+        **_fresh_stamp(),
+        "LookupMs": f"{lookup_ms:.0f}",
     }
 
 
-def write_results(path: Path, rows: Iterable[dict[str, str]]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    fieldnames = ["SerialNumber", "ProductCode", "ProductFamily", "PanelText"]
-    with path.open("w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+def panel_fields(panel: dict) -> dict[str, str]:
+    """Turn the extractor's JSON into typed ``RESULT_FIELDS`` columns."""
+    text = panel.get("text") or ""
+    status = panel.get("status") or ""
+    toner = panel.get("toner") or {}
+    levels: dict[str, float] = {}
+    for colour in TONER_COLOURS:
+        value = toner.get(colour.lower())
+        if isinstance(value, (int, float)):
+            levels[colour] = float(value)
+    no_data = not levels and (
+        not text or bool(re.search(r"no (record|data)|not found", text, re.I))
+    )
+    has_error = bool(re.search(r"error|invalid|fail", status, re.I))
+    return {
+        **{
+            f"Toner{colour}Pct": f"{levels[colour]:g}" if colour in levels else ""
+            for colour in TONER_COLOURS
+        },
+        "LowToner": _flag(
+            any(v <= AST_CACHE_LOW_THRESHOLD_PCT for v in levels.values())
+        ),
+        "NoData": _flag(no_data),
+        "HasError": _flag(has_error),
+        "StatusMessage": status,
+        "ReadingTimestamp": panel.get("timestamp") or "",
+        "PanelText": text,
+    }
 
 
-async def main() -> None:
-    logging.basicConfig(
-        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+def _flag(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def _fresh_stamp() -> dict[str, str]:
+    return {
+        "Source": "fresh",
+        "FetchedAt": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "ReadingAgeHours": "0.0",
+    }
+
+
+def _error_result(row: InputRow, exc: BaseException) -> dict[str, str]:
+    return {
+        "SerialNumber": row.serial_number,
+        "ProductCode": row.product_code,
+        "ProductFamily": row.product_family,
+        "HasError": "true",
+        "PanelText": f"ERROR: {exc}",
+        **_fresh_stamp(),
+    }
+
+
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+
+
+def lowest_toner_pct(result: dict[str, str]) -> Optional[float]:
+    """Lowest toner level in a lookup result, if any.
+
+    Uses the typed Toner*Pct columns, falling back to scanning PanelText for
+    results written before those columns existed.
+    """
+    values = [
+        float(result[key])
+        for key in (f"Toner{colour}Pct" for colour in TONER_COLOURS)
+        if result.get(key)
+    ]
+    if not values:
+        values = [float(m) for m in _PERCENT_RE.findall(result.get("PanelText", ""))]
+    return min(values) if values else None
+
+
+class TonerCache:
+    """Per-serial store of the last toner reading, with its timestamp.
+
+    Only results with at least one toner level are kept; errors and "no data"
+    panels are retried on the next run. An entry is fresh for AST_CACHE_MAX_AGE_HOURS, or only
+    AST_CACHE_LOW_MAX_AGE_HOURS when its lowest toner reading was at or below
+    AST_CACHE_LOW_THRESHOLD_PCT, so nearly-empty devices are re-read sooner.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_age_hours: float = AST_CACHE_MAX_AGE_HOURS,
+        low_max_age_hours: float = AST_CACHE_LOW_MAX_AGE_HOURS,
+        low_threshold_pct: float = AST_CACHE_LOW_THRESHOLD_PCT,
+    ) -> None:
+        self.path = path
+        self.max_age_hours = max_age_hours
+        self.low_max_age_hours = low_max_age_hours
+        self.low_threshold_pct = low_threshold_pct
+        self.entries: dict[str, dict] = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                logging.warning("Ignoring unreadable toner cache %s", path)
+
+    def _max_age(self, entry: dict) -> float:
+        lowest = entry.get("lowest_pct")
+        if lowest is not None and lowest <= self.low_threshold_pct:
+            return min(self.max_age_hours, self.low_max_age_hours)
+        return self.max_age_hours
+
+    def age_hours(self, serial: str, now: datetime) -> Optional[float]:
+        entry = self.entries.get(serial)
+        if not entry:
+            return None
+        try:
+            fetched_at = datetime.fromisoformat(entry["fetched_at"])
+        except (KeyError, ValueError):
+            return None
+        return (now - fetched_at) / timedelta(hours=1)
+
+    def lookup(self, row: InputRow, now: datetime) -> Optional[dict[str, str]]:
+        """Return a cached result for ``row`` if its entry is still fresh."""
+        age = self.age_hours(row.serial_number, now)
+        if age is None:
+            return None
+        entry = self.entries[row.serial_number]
+        # Entries without a level predate the readings-only rule; retry them.
+        if entry.get("lowest_pct") is None or age > self._max_age(entry):
+            return None
+        return {
+            **entry["result"],
+            "SerialNumber": row.serial_number,
+            "ProductCode": row.product_code,
+            "ProductFamily": row.product_family,
+            "Source": "cached",
+            "FetchedAt": entry["fetched_at"],
+            "ReadingAgeHours": f"{age:.1f}",
+            "LookupMs": "",
+        }
+
+    def store(self, result: dict[str, str]) -> None:
+        serial = result.get("SerialNumber", "")
+        lowest = lowest_toner_pct(result)
+        if not serial or lowest is None or result.get("HasError") == "true":
+            return
+        stored = {
+            k: v
+            for k, v in result.items()
+            if k not in {"Source", "FetchedAt", "ReadingAgeHours", "LookupMs"}
+        }
+        self.entries[serial] = {
+            "fetched_at": result.get("FetchedAt")
+            or datetime.now().astimezone().isoformat(timespec="seconds"),
+            "lowest_pct": lowest,
+            "result": stored,
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+ResultSink = Callable[[int, Optional[dict[str, str]]], None]
+
+
+def _past(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+async def run_lookups(
+    context: BrowserContext,
+    rows: list[InputRow],
+    families: FamilyIndex,
+    sink: ResultSink,
+    *,
+    concurrency: int = AST_CONCURRENCY,
+    stats: Optional[LookupStats] = None,
+    deadline: Optional[float] = None,
+) -> int:
+    """Look up every row with a pool of pages sharing one work queue.
+
+    Each worker opens the RDHC form once and keeps its page there between
+    lookups; after a failure it reloads the form before taking the next row.
+    Every result is handed to ``sink(index, result)`` as soon as it completes;
+    ``index`` is the row's position in ``rows``. Workers stop taking rows once
+    ``time.monotonic()`` passes ``deadline``. Returns the number of lookups.
+    """
+    queue: asyncio.Queue[tuple[int, InputRow]] = asyncio.Queue()
+    for item in enumerate(rows):
+        queue.put_nowait(item)
+
+    trace = await DIAGNOSTICS.trace(context, "ast")
+
+    async def worker(worker_id: int) -> None:
+        page = await context.new_page()
+        recorder = DIAGNOSTICS.recorder(page, f"worker{worker_id}")
+        try:
+            await page.goto(AST_PAGE_URL, wait_until="domcontentloaded")
+            while not _past(deadline):
+                try:
+                    index, row = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                recorder.begin(row.serial_number)
+                failure: Optional[Exception] = None
+                with TRACER.span(
+                    "row", row=row.serial_number, worker=worker_id, engine="browser"
+                ) as span:
+                    try:
+                        result = await process_row(page, row, families, stats, recorder)
+                    except Exception as exc:  # noqa: BLE001
+                        failure = exc
+                        logging.error(
+                            "[worker %d] Failed to process serial=%s product=%s: %s",
+                            worker_id,
+                            row.serial_number,
+                            row.product_code,
+                            exc,
+                        )
+                        result = _error_result(row, exc)
+                        span.outcome = "error"
+                        span.error = str(exc)
+                    # Capture before the reload below wipes the failing page.
+                    saved = await recorder.finish(failure)
+                    await trace.row_done(row.serial_number, saved is not None)
+                    if failure is not None:
+                        with contextlib.suppress(PlaywrightError):
+                            await page.goto(AST_PAGE_URL, wait_until="domcontentloaded")
+                sink(index, result)
+        finally:
+            with contextlib.suppress(PlaywrightError):
+                await page.close()
+
+    workers = max(1, min(concurrency, len(rows)))
+    logging.info("Starting %d AST worker page(s)", workers)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(i + 1) for i in range(workers)))
+    finally:
+        await trace.stop()
+    elapsed = time.perf_counter() - started
+    done = len(rows) - queue.qsize()
+    logging.info(
+        "Completed %d lookups in %.1fs (%.1f lookups/min)",
+        done,
+        elapsed,
+        done / elapsed * 60 if elapsed else 0.0,
     )
+    return done
 
-    family_mapping = load_product_family_map(RDHC_HTML_PATH)
-    rows = load_input_rows(AST_INPUT_XLSX)
-    logging.info("Loaded %d AST input rows from %s", len(rows), AST_INPUT_XLSX)
-    if not rows:
-        logging.warning("No AST rows found in %s", AST_INPUT_XLSX)
-        return
 
-    results: list[dict[str, str]] = []
+async def run_http_lookups(
+    rows: list[InputRow],
+    families: FamilyIndex,
+    sink: ResultSink,
+    *,
+    concurrency: int = AST_CONCURRENCY,
+    stats: Optional[LookupStats] = None,
+    deadline: Optional[float] = None,
+) -> int:
+    """Look up every row by replaying the form's async postback over HTTP.
+
+    Each worker owns an ``RdhcFormSession`` (its own view state) on one pooled
+    client. Raises ``RdhcHttpError``/``httpx.HTTPError`` if the form cannot be
+    loaded at all, so the caller can fall back to the browser.
+    """
+    if not AST_PAGE_URL.startswith(("http://", "https://")):
+        raise RdhcHttpError(f"HTTP engine needs an http(s) AST_TONER_PAGE_URL, got {AST_PAGE_URL}")
+
+    queue: asyncio.Queue[tuple[int, InputRow]] = asyncio.Queue()
+    for item in enumerate(rows):
+        queue.put_nowait(item)
+    workers = max(1, min(concurrency, len(rows)))
+
+    async with build_client(
+        AST_STORAGE_STATE, workers, AST_LOOKUP_TIMEOUT_MS / 1000
+    ) as client:
+        sessions = [RdhcFormSession(client, AST_PAGE_URL) for _ in range(workers)]
+        await sessions[0].load()
+
+        async def worker(worker_id: int, session: RdhcFormSession) -> None:
+            while not _past(deadline):
+                try:
+                    index, row = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                with TRACER.span(
+                    "row", row=row.serial_number, worker=worker_id, engine="http"
+                ) as span:
+                    try:
+                        option_value = families.resolve(row.product_family)
+                        if option_value is None:
+                            raise ValueError(
+                                f"Unknown product family '{row.product_family}' — update RDHC.html or input data"
+                            )
+                        if stats is not None:
+                            stats.lookups += 1
+                        started = time.perf_counter()
+                        with TRACER.span("submit", row=row.serial_number):
+                            panel = await session.submit(
+                                option_value, row.product_code, row.serial_number
+                            )
+                        lookup_ms = (time.perf_counter() - started) * 1000
+                        if stats is not None:
+                            stats.completed += 1
+                            stats.lookup_ms_total += lookup_ms
+                        result = _lookup_result(row, panel, lookup_ms)
+                    except Exception as exc:  # noqa: BLE001
+                        logging.error(
+                            "[http %d] Failed to process serial=%s product=%s: %s",
+                            worker_id,
+                            row.serial_number,
+                            row.product_code,
+                            exc,
+                        )
+                        result = _error_result(row, exc)
+                        span.outcome = "error"
+                        span.error = str(exc)
+                        session.fields = {}  # reload a clean form before the next row
+                sink(index, result)
+
+        logging.info("Starting %d HTTP AST worker(s)", workers)
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(i + 1, session) for i, session in enumerate(sessions))
+        )
+        elapsed = time.perf_counter() - started
+    done = len(rows) - queue.qsize()
+    logging.info(
+        "Completed %d lookups in %.1fs (%.1f lookups/min)",
+        done,
+        elapsed,
+        done / elapsed * 60 if elapsed else 0.0,
+    )
+    return done
+
+
+class OrderedResultWriter:
+    """Stream results to CSV as lookups complete, then restore input order on close.
+
+    Each result is appended as soon as it arrives (fsynced every
+    ``flush_every`` rows), so nothing waits in memory for slower rows and a
+    crash loses at most the unflushed tail. ``index`` is the row's input
+    position; ``close`` rewrites the file sorted by it (rows kept from a
+    resumed run stay first). ``None`` marks a row that will not produce output.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fieldnames: list[str],
+        *,
+        append: bool = False,
+        flush_every: int = AST_FLUSH_EVERY,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not append or not path.exists() or path.stat().st_size == 0
+        self.path = path
+        self._fieldnames = fieldnames
+        self._handle = path.open("w" if fresh else "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(
+            self._handle, fieldnames=fieldnames, extrasaction="ignore"
+        )
+        if fresh:
+            self._writer.writeheader()
+        self._indices: list[int] = []
+        self._flush_every = max(1, flush_every)
+        self._unflushed = 0
+        self.written = 0
+
+    def submit(self, index: int, row: Optional[dict[str, str]]) -> None:
+        if row is None:
+            return
+        self._writer.writerow(row)
+        self._indices.append(index)
+        self.written += 1
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._unflushed = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._handle.close()
+        indices = self._indices
+        if all(a <= b for a, b in zip(indices, indices[1:])):
+            return
+        with self.path.open(newline="", encoding="utf-8") as handle:
+            rows = list(csv.DictReader(handle))
+        kept = len(rows) - len(indices)
+        order = sorted(range(len(indices)), key=indices.__getitem__)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=self._fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows[:kept])
+            writer.writerows(rows[kept + i] for i in order)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, self.path)
+
+
+def _run_marker_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".run.json")
+
+
+def _input_fingerprint(input_path: Path) -> dict[str, object]:
+    stat = input_path.stat()
+    return {
+        "input": str(input_path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _write_run_marker(output_path: Path, marker: dict[str, object]) -> None:
+    path = _run_marker_path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(marker, indent=2), encoding="utf-8")
+
+
+def _truncate_partial_line(path: Path) -> None:
+    """Drop a half-written trailing CSV line left behind by a crash."""
+    with path.open("rb+") as handle:
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        if size == 0:
+            return
+        handle.seek(size - 1)
+        if handle.read(1) == b"\n":
+            return
+        block = min(size, 1024 * 1024)
+        handle.seek(size - block)
+        tail = handle.read(block)
+        cut = tail.rfind(b"\n")
+        handle.truncate(size - block + cut + 1 if cut >= 0 else 0)
+
 
+def load_resume_serials(output_path: Path, input_path: Path) -> set[str]:
+    """Serials already written by an unfinished run over the same input file."""
+    marker_path = _run_marker_path(output_path)
+    if not output_path.exists() or not marker_path.exists():
+        logging.info("No partial AST output to resume; starting a fresh run")
+        return set()
+    try:
+        marker = json.loads(marker_path.read_text(encoding="utf-8"))
+    except ValueError:
+        marker = {}
+    if marker.get("completed_at"):
+        logging.info("Previous AST run already completed; starting a fresh run")
+        return set()
+    if marker.get("fingerprint") != _input_fingerprint(input_path):
+        logging.warning(
+            "Partial output %s belongs to a different input; starting a fresh run",
+            output_path,
+        )
+        return set()
+
+    _truncate_partial_line(output_path)
+    with output_path.open(newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        if reader.fieldnames != RESULT_FIELDS:
+            logging.warning(
+                "Partial output %s has different columns; starting a fresh run",
+                output_path,
+            )
+            return set()
+        return {row["SerialNumber"] for row in reader if row.get("SerialNumber")}
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Look up RDHC AST toner levels for every device in the report."
+    )
+    parser.add_argument(
+        "--resume",
+        action=argparse.BooleanOptionalAction,
+        default=AST_RESUME,
+        help=(
+            "Skip serials already written to AST_OUTPUT_CSV by an unfinished run "
+            "over the same input (default: AST_RESUME)."
+        ),
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=f"Reuse fresh readings from {AST_CACHE_PATH} (default: on).",
+    )
+    parser.add_argument(
+        "--family",
+        action="append",
+        help="Only look up this product family (repeatable).",
+    )
+    parser.add_argument(
+        "--product-code",
+        action="append",
+        help="Only look up product codes matching this pattern, e.g. 'DC*' (repeatable).",
+    )
+    parser.add_argument(
+        "--state",
+        action="append",
+        help="Only look up devices in this state (repeatable; needs STATE_COLUMN).",
+    )
+    parser.add_argument(
+        "--budget-minutes",
+        type=float,
+        default=AST_BUDGET_MINUTES,
+        help=(
+            "Stop taking new lookups after this many minutes, highest priority first, "
+            "and defer the rest to the next run (default: AST_BUDGET_MINUTES, 0 = no limit)."
+        ),
+    )
+    parser.add_argument(
+        "--plan-only",
+        action="store_true",
+        help="Print the plan summary and exit without looking anything up.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("browser", "http"),
+        default=AST_ENGINE if AST_ENGINE in {"browser", "http"} else "browser",
+        help=(
+            "How to submit lookups: 'http' replays the form postback with httpx and "
+            "falls back to the browser if the form cannot be loaded (default: AST_ENGINE)."
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.state and not STATE_COLUMN:
+        # Every row's state would be blank, so the filter would drop the whole input.
+        parser.error("--state needs STATE_COLUMN (the input column holding each device's state)")
+    return args
+
+
+async def _run_browser_lookups(
+    rows: list[InputRow],
+    families: FamilyIndex,
+    sink: ResultSink,
+    stats: Optional[LookupStats] = None,
+    deadline: Optional[float] = None,
+) -> bool:
+    """Launch the browser and look up ``rows``. Returns False if launch failed."""
     async with async_playwright() as playwright:
         channel: str | None = AST_BROWSER_CHANNEL.strip() or None
         storage_state_path: Path | None
@@ -297,40 +1180,168 @@ async def main() -> None:
                 ),
             )
             logging.debug("Playwright launch error: %s", exc)
-            return
+            return False
 
         try:
-            page = await context.new_page()
-            await page.goto(AST_PAGE_URL, wait_until="domcontentloaded")
+            await run_lookups(
+                context,
+                rows,
+                families,
+                sink,
+                concurrency=AST_CONCURRENCY,
+                stats=stats,
+                deadline=deadline,
+            )
+        finally:
+            await context.close()
+            await browser.close()
+    return True
+
 
-            for row in rows:
+async def run_ast(
+    rows: list[InputRow], args: argparse.Namespace, *, input_path: Path = AST_INPUT_XLSX
+) -> int:
+    """Plan, look up and write results for ``rows``; returns rows written.
+
+    ``input_path`` identifies the source for ``--resume`` (the pipeline passes
+    its report checkpoint).
+    """
+    families = load_family_index(
+        RDHC_HTML_PATH,
+        AST_FAMILY_INDEX_PATH,
+        aliases=load_alias_rules(AST_FAMILY_ALIASES),
+        fuzzy_cutoff=AST_FAMILY_FUZZY_CUTOFF,
+    )
+    done = load_resume_serials(AST_OUTPUT_CSV, input_path) if args.resume else set()
+    marker: dict[str, object] = {
+        "fingerprint": _input_fingerprint(input_path),
+        "started_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+    }
+
+    cache = TonerCache(AST_CACHE_PATH) if args.cache else None
+    plan = plan_rows(
+        rows,
+        families,
+        family_filter=args.family,
+        code_filter=args.product_code,
+        state_filter=args.state,
+        done=done,
+        cache=cache,
+    )
+    logging.info("AST plan: %s", plan.summary())
+    if args.plan_only:
+        families.write_unresolved_report(AST_UNRESOLVED_REPORT)
+        return 0
+    rows = plan.rows
+    cached_results = plan.cached
+    live = [(index, rows[index]) for index in plan.live]
+
+    # Work through live rows family by family (by priority under a budget);
+    # the writer restores input order.
+    deadline: Optional[float] = None
+    if args.budget_minutes > 0:
+        deadline = time.monotonic() + args.budget_minutes * 60
+        previously_deferred = load_deferred_serials(AST_DEFERRED_PATH)
+        weights = load_customer_weights(AST_PRIORITY_WEIGHTS)
+        now = datetime.now().astimezone()
+        live_rows = [row for _, row in live]
+        scores = [
+            priority_score(row, cache, weights, previously_deferred, now) for row in live_rows
+        ]
+        live = [live[i] for i in order_by_priority(live_rows, families, scores)]
+        logging.info(
+            "Budget of %.0f minute(s); %d row(s) deferred by the last run go first",
+            args.budget_minutes,
+            sum(1 for row in live_rows if row.serial_number in previously_deferred),
+        )
+    else:
+        live = [live[i] for i in order_by_family([row for _, row in live], families)]
+    stats = LookupStats()
+    finished: set[int] = set()
+
+    _write_run_marker(AST_OUTPUT_CSV, marker)
+    writer = OrderedResultWriter(AST_OUTPUT_CSV, RESULT_FIELDS, append=bool(done))
+
+    def record(live_index: int, result: Optional[dict[str, str]]) -> None:
+        finished.add(live_index)
+        writer.submit(live[live_index][0], result)
+        if cache is not None and result is not None:
+            cache.store(result)
+
+    try:
+        for index, result in cached_results.items():
+            writer.submit(index, result)
+        if live:
+            live_rows = [row for _, row in live]
+            launched = False
+            if args.engine == "http":
                 try:
-                    result = await process_row(page, row, family_mapping)
-                except Exception as exc:  # noqa: BLE001
-                    logging.error(
-                        "Failed to process serial=%s product=%s: %s",
-                        row.serial_number,
-                        row.product_code,
-                        exc,
+                    await run_http_lookups(
+                        live_rows,
+                        families,
+                        record,
+                        concurrency=AST_CONCURRENCY,
+                        stats=stats,
+                        deadline=deadline,
                     )
-                    results.append(
-                        {
-                            "SerialNumber": row.serial_number,
-                            "ProductCode": row.product_code,
-                            "ProductFamily": row.product_family,
-                            "PanelText": f"ERROR: {exc}",
-                        }
+                    launched = True
+                except (RdhcHttpError, httpx.HTTPError) as exc:
+                    logging.warning(
+                        "HTTP engine unavailable (%s); falling back to the browser", exc
                     )
-                    continue
+            if not launched:
+                launched = await _run_browser_lookups(
+                    live_rows, families, record, stats, deadline
+                )
+            if not launched:
+                return writer.written
+            deferred = [i for i in range(len(live)) if i not in finished]
+            for live_index in deferred:
+                writer.submit(live[live_index][0], None)
+            save_deferred_serials(
+                AST_DEFERRED_PATH, [live[i][1].serial_number for i in deferred]
+            )
+            if deferred:
+                logging.warning(
+                    "Time budget reached: %d row(s) deferred to %s for the next run",
+                    len(deferred),
+                    AST_DEFERRED_PATH,
+                )
+            logging.info(
+                "Product family changed %d time(s) over %d lookup(s); %d switch(es) avoided",
+                stats.family_switches,
+                stats.lookups,
+                stats.lookups - stats.family_switches,
+            )
+            if stats.completed:
+                logging.info(
+                    "Average submit-to-result latency: %.0f ms",
+                    stats.lookup_ms_total / stats.completed,
+                )
+    finally:
+        writer.close()
+        if cache is not None:
+            cache.save()
+        families.write_unresolved_report(AST_UNRESOLVED_REPORT)
 
-                results.append(result)
+    marker["completed_at"] = datetime.now().astimezone().isoformat(timespec="seconds")
+    _write_run_marker(AST_OUTPUT_CSV, marker)
+    logging.info("Wrote %d AST toner results to %s", writer.written, AST_OUTPUT_CSV)
+    return writer.written
 
-        finally:
-            await context.close()
-            await browser.close()
 
-    write_results(AST_OUTPUT_CSV, results)
-    logging.info("Wrote AST toner results to %s", AST_OUTPUT_CSV)
+async def main() -> None:
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+
+    rows = load_input_rows(AST_INPUT_XLSX)
+    logging.info("Loaded %d AST input rows from %s", len(rows), AST_INPUT_XLSX)
+    if not rows:
+        logging.warning("No AST rows found in %s", AST_INPUT_XLSX)
+        return
+    await run_ast(rows, args, input_path=AST_INPUT_XLSX)
 
 
 if __name__ == "__main__":
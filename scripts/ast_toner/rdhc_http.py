@@ -0,0 +1,272 @@
+"""HTTP-only client for the RDHC toner form (ASP.NET UpdatePanel async postbacks)."""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from urllib.parse import urljoin
+
+import httpx  # type: ignore[import-untyped]
+from bs4 import BeautifulSoup  # type: ignore[import-untyped]
+from bs4.element import Tag  # type: ignore[import-untyped]
+
+FORM_IDS = {
+    "product_family": "MainContent_ddlProductFamily",
+    "product_code": "MainContent_txtProductCode",
+    "serial_number": "MainContent_txtSerialNumber",
+    "submit": "MainContent_btnSubmit",
+    "result_panel": "MainContent_UpdatePanelResult",
+    "message_panel": "MainContent_UpdatePnlMsg",
+}
+
+_PRM_INIT_RE = re.compile(r"PageRequestManager\._initialize\('([^']+)',\s*'[^']*',\s*\[([^\]]*)\]")
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+_TONER_RE = re.compile(r"\btoner\b", re.I)
+_NOT_TONER_RE = re.compile(r"\b(waste|drum)\b", re.I)
+_COLOUR_RE = re.compile(r"\b(black|cyan|magenta|yellow)\b", re.I)
+
+
+class RdhcHttpError(RuntimeError):
+    """The server answered in a way the HTTP engine cannot continue from."""
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def load_storage_state_cookies(path: Path) -> httpx.Cookies:
+    """Cookies from a Playwright ``storage_state`` JSON file."""
+    cookies = httpx.Cookies()
+    if not path.exists():
+        return cookies
+    state = json.loads(path.read_text(encoding="utf-8"))
+    for cookie in state.get("cookies", []):
+        cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
+    return cookies
+
+
+def parse_delta(body: str) -> list[tuple[str, str, str]]:
+    """Split an MS AJAX delta response into ``(type, id, content)`` entries.
+
+    The format is ``length|type|id|content|`` repeated, where ``length`` counts
+    the characters of ``content`` so it may itself contain ``|``.
+    """
+    entries: list[tuple[str, str, str]] = []
+    pos = 0
+    while pos < len(body):
+        try:
+            length_end = body.index("|", pos)
+            length = int(body[pos:length_end])
+            type_end = body.index("|", length_end + 1)
+            id_end = body.index("|", type_end + 1)
+        except ValueError as exc:
+            raise RdhcHttpError(f"Malformed delta response at offset {pos}") from exc
+        content_start = id_end + 1
+        content_end = content_start + length
+        if body[content_end : content_end + 1] != "|":
+            raise RdhcHttpError(f"Delta entry length mismatch at offset {pos}")
+        entries.append(
+            (body[length_end + 1 : type_end], body[type_end + 1 : id_end], body[content_start:content_end])
+        )
+        pos = content_end + 1
+    return entries
+
+
+def _attr(node: Tag, name: str) -> str:
+    """A single-valued attribute as text ("" when absent)."""
+    value = node.get(name)
+    if isinstance(value, list):
+        return " ".join(value)
+    return value or ""
+
+
+def _form_fields(root) -> dict[str, str]:
+    """Successful-control values under ``root``, excluding submit buttons."""
+    fields: dict[str, str] = {}
+    for node in root.find_all(["input", "select", "textarea"]):
+        name = node.get("name")
+        if not name:
+            continue
+        if node.name == "select":
+            chosen = node.find("option", selected=True) or node.find("option")
+            fields[name] = (chosen.get("value") or chosen.get_text(strip=True)) if chosen else ""
+            continue
+        if node.name == "textarea":
+            fields[name] = node.get_text()
+            continue
+        kind = (node.get("type") or "text").lower()
+        if kind in {"submit", "button", "image", "reset", "file"}:
+            continue
+        if kind in {"checkbox", "radio"} and not node.has_attr("checked"):
+            continue
+        fields[name] = node.get("value", "")
+    return fields
+
+
+def _text(node: Tag) -> str:
+    return _clean(node.get_text(" ", strip=True))
+
+
+def extract_panel(panel_html: str, message_html: str = "") -> dict:
+    """Python twin of the in-page extractor: same keys and the same label rules."""
+    panel = BeautifulSoup(panel_html or "", "html.parser")
+    out: dict = {
+        "text": _text(panel),
+        "status": _text(BeautifulSoup(message_html or "", "html.parser")),
+        "toner": {},
+        "timestamp": "",
+    }
+
+    pairs: list[tuple[str, str]] = []
+    for table in panel.find_all("table"):
+        # Only this table's own rows and cells, like table.rows / tr.cells in the page.
+        trs = [tr for tr in table.find_all("tr") if tr.find_parent("table") is table]
+        cells_by_row = [tr.find_all(["td", "th"], recursive=False) for tr in trs]
+        rows = [[_text(cell) for cell in cells] for cells in cells_by_row]
+        if not rows:
+            continue
+        if any(cell.name == "th" for cell in cells_by_row[0]) and len(rows) > 1:
+            pairs.extend(
+                (label, rows[1][i] if i < len(rows[1]) else "") for i, label in enumerate(rows[0])
+            )
+        else:
+            pairs.extend((cells[0], " ".join(cells[1:])) for cells in rows if len(cells) >= 2)
+
+    for label, value in pairs:
+        is_toner = bool(_TONER_RE.search(label)) and not _NOT_TONER_RE.search(label)
+        match = _PERCENT_RE.search(value) or (_PERCENT_RE.search(label) if is_toner else None)
+        if match:
+            colour = _COLOUR_RE.search(label) if is_toner else None
+            if colour:
+                out["toner"].setdefault(colour.group(1).lower(), float(match.group(1)))
+        elif (
+            not out["timestamp"]
+            and re.search(r"date|time|updated|received|last", label, re.I)
+            and re.search(r"\d", value)
+        ):
+            out["timestamp"] = value
+        elif re.search("status", label, re.I) and value and not out["status"]:
+            out["status"] = value
+    return out
+
+
+class RdhcFormSession:
+    """One logical RDHC form: its own view state, replayed as async postbacks.
+
+    Workers each own a session (like a browser tab) and share the pooled
+    ``httpx.AsyncClient``.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, page_url: str) -> None:
+        self.client = client
+        self.page_url = page_url
+        self.post_url = page_url
+        self.fields: dict[str, str] = {}
+        self.names: dict[str, str] = {}
+        self.submit_value = ""
+        self.script_manager = "ctl00$smSite"
+        self.submit_panel = ""
+
+    async def load(self) -> None:
+        response = await self.client.get(self.page_url)
+        if response.status_code == 401:
+            raise RdhcHttpError("RDHC requires authentication the stored cookies do not cover")
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "html.parser")
+        form = soup.find("form")
+        if not isinstance(form, Tag):
+            raise RdhcHttpError("No form on the RDHC page (login page or redirect?)")
+        self.post_url = urljoin(str(response.url), _attr(form, "action"))
+        self.fields = _form_fields(form)
+        missing_state = {"__VIEWSTATE", "__EVENTVALIDATION"} - set(self.fields)
+        if missing_state:
+            raise RdhcHttpError(
+                f"RDHC form has no {', '.join(sorted(missing_state))} hidden field(s)"
+            )
+
+        for key, element_id in FORM_IDS.items():
+            node = soup.find(id=element_id)
+            if isinstance(node, Tag) and _attr(node, "name"):
+                self.names[key] = _attr(node, "name")
+        missing = {"product_family", "product_code", "serial_number", "submit"} - set(self.names)
+        if missing:
+            raise RdhcHttpError(f"RDHC form is missing {', '.join(sorted(missing))}")
+        submit = soup.find(id=FORM_IDS["submit"])
+        if not isinstance(submit, Tag):
+            raise RdhcHttpError("RDHC form has no submit button")
+        self.submit_value = _attr(submit, "value")
+
+        match = _PRM_INIT_RE.search(response.text)
+        panels: dict[str, str] = {}
+        if match:
+            self.script_manager = match.group(1)
+            ids = re.findall(r"'([^']*)'", match.group(2))
+            # Pairs of ('t' + UniqueID, ClientID); the 't' flags a child-triggerable panel.
+            panels = {client: unique[1:] for unique, client in zip(ids[::2], ids[1::2])}
+        for parent in submit.parents:
+            parent_id = _attr(parent, "id")
+            if parent_id in panels:
+                self.submit_panel = panels[parent_id]
+                break
+
+    async def submit(self, family_value: str, product_code: str, serial_number: str) -> dict:
+        """Post one lookup and return the extracted result panel."""
+        if not self.fields:
+            await self.load()
+        submit_name = self.names["submit"]
+        data = {
+            **self.fields,
+            self.names["product_family"]: family_value,
+            self.names["product_code"]: product_code,
+            self.names["serial_number"]: serial_number,
+            "__EVENTTARGET": "",
+            "__EVENTARGUMENT": "",
+            "__ASYNCPOST": "true",
+            self.script_manager: f"{self.submit_panel or self.script_manager}|{submit_name}",
+            submit_name: self.submit_value,
+        }
+        response = await self.client.post(
+            self.post_url,
+            data=data,
+            headers={
+                "X-MicrosoftAjax": "Delta=true",
+                "X-Requested-With": "XMLHttpRequest",
+                "Referer": self.page_url,
+            },
+        )
+        response.raise_for_status()
+
+        panels: dict[str, str] = {}
+        for kind, target, content in parse_delta(response.text):
+            if kind == "hiddenField":
+                self.fields[target] = content
+            elif kind == "updatePanel":
+                panels[target] = content
+                self.fields.update(_form_fields(BeautifulSoup(content, "html.parser")))
+            elif kind == "error":
+                raise RdhcHttpError(f"RDHC postback error {target}: {content}")
+            elif kind == "pageRedirect":
+                self.fields = {}
+                raise RdhcHttpError(f"RDHC redirected to {content}; session may have expired")
+        return extract_panel(
+            panels.get(FORM_IDS["result_panel"], ""),
+            panels.get(FORM_IDS["message_panel"], ""),
+        )
+
+
+def build_client(storage_state: Path, concurrency: int, timeout_s: float) -> httpx.AsyncClient:
+    """Pooled client carrying the login cookies captured by the browser."""
+    return httpx.AsyncClient(
+        cookies=load_storage_state_cookies(storage_state),
+        follow_redirects=True,
+        timeout=timeout_s,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) SiteReportAutomate"},
+    )
+
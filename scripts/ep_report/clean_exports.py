@@ -0,0 +1,238 @@
+# clean_exports.py
+# Re-cleans raw Device List exports (HTML-in-.xls, optionally .gz archived) in bulk,
+# without a browser. Useful after a cleaner fix to rebuild historical outputs.
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.append(str(SCRIPT_DIR))
+
+from fetch_and_clean import (  # noqa: E402
+    CLEANER_VERSION,
+    DOWNLOAD_DIR,
+    RAW_ARCHIVE_DIR,
+    _write_atomic,
+    extract_table_stream,
+    iter_raw_text,
+    write_table_xlsx_atomic,
+)
+
+RAW_SUFFIXES = (".xls", ".xls.gz", ".htm", ".html")
+FORMATS = ("xlsx", "csv", "jsonl")
+MANIFEST_NAME = ".clean_manifest.json"
+
+
+def _is_raw_export(path: Path) -> bool:
+    return path.is_file() and path.name.lower().endswith(RAW_SUFFIXES)
+
+
+def collect_inputs(patterns: Sequence[str]) -> List[Path]:
+    """Expand directories (non-recursive) and glob patterns into raw export files."""
+    found: Dict[str, Path] = {}
+    for pattern in patterns:
+        target = Path(pattern.replace("\\", "/")).expanduser()
+        if target.is_dir():
+            candidates = list(target.iterdir())
+        elif target.is_file():
+            candidates = [target]
+        else:
+            candidates = [Path(p) for p in glob.glob(str(target), recursive=True)]
+        for path in candidates:
+            if _is_raw_export(path):
+                found.setdefault(str(path.resolve()), path)
+    return sorted(found.values())
+
+
+def _output_name(src: Path, fmt: str) -> str:
+    name = src.name
+    for suffix in sorted(RAW_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return f"{name}.{fmt}"
+
+
+def _source_stamp(src: Path) -> Dict[str, object]:
+    stat = src.stat()
+    return {
+        "source": str(src.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "cleaner_version": CLEANER_VERSION,
+    }
+
+
+def _load_manifest(out_dir: Path) -> Dict[str, Dict[str, object]]:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_table(
+    dest: Path, fmt: str, headers: List[str], rows: List[List[str]], sheet_name: str
+) -> None:
+    if fmt == "xlsx":
+        write_table_xlsx_atomic(dest, headers, rows, sheet_name)
+        return
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("w", newline="", encoding="utf-8") as handle:
+            if fmt == "csv":
+                writer = csv.writer(handle)
+                writer.writerow(headers)
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    handle.write(json.dumps(dict(zip(headers, row))) + "\n")
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _uncompressed_size(path: Path) -> int:
+    """Size of the export as parsed: gzip's ISIZE trailer for ``.gz``, else the file size."""
+    if path.suffix.lower() != ".gz":
+        return path.stat().st_size
+    with path.open("rb") as handle:
+        handle.seek(-4, os.SEEK_END)
+        # ISIZE is the uncompressed length modulo 2**32; exports are far smaller.
+        return int.from_bytes(handle.read(4), "little")
+
+
+def convert_one(
+    src: str, dest: str, fmt: str, sheet_name: str
+) -> Tuple[str, int, int, float, str]:
+    """Process-pool entry point. Returns (src, uncompressed_bytes, rows, seconds, error)."""
+    started = time.perf_counter()
+    try:
+        size = _uncompressed_size(Path(src))
+        headers, rows = extract_table_stream(iter_raw_text(Path(src)))
+        _write_table(Path(dest), fmt, headers, rows, sheet_name)
+    except Exception as exc:  # noqa: BLE001 - report per file, keep the batch going
+        return src, 0, 0, time.perf_counter() - started, str(exc) or exc.__class__.__name__
+    return src, size, len(rows), time.perf_counter() - started, ""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Convert raw Device List exports (HTML-in-.xls or archived .xls.gz) "
+            "to clean files in parallel."
+        )
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[str(DOWNLOAD_DIR), str(RAW_ARCHIVE_DIR)],
+        help=(
+            "Files, directories or glob patterns to convert "
+            f"(default: {DOWNLOAD_DIR} and {RAW_ARCHIVE_DIR})."
+        ),
+    )
+    parser.add_argument(
+        "--out-dir",
+        default=str(DOWNLOAD_DIR / "cleaned"),
+        help=f"Where to write cleaned files (default: {DOWNLOAD_DIR / 'cleaned'}).",
+    )
+    parser.add_argument(
+        "--format", choices=FORMATS, default="xlsx", help="Output format (default: xlsx)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--sheet-name", default="DeviceList", help="Sheet name for XLSX output."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-convert even when the output is current for this cleaner version.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    out_dir = Path(args.out_dir.replace("\\", "/")).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = collect_inputs(args.inputs)
+    if not sources:
+        print(f"No raw exports found in: {', '.join(args.inputs)}")
+        return 1
+
+    manifest = _load_manifest(out_dir)
+    jobs: List[Tuple[Path, Path, Dict[str, object]]] = []
+    skipped = 0
+    for src in sources:
+        dest = out_dir / _output_name(src, args.format)
+        stamp = _source_stamp(src)
+        if not args.force and dest.exists() and manifest.get(dest.name) == stamp:
+            skipped += 1
+            continue
+        jobs.append((src, dest, stamp))
+
+    print(
+        f"[INFO] {len(sources)} export(s) found, {skipped} already current, "
+        f"{len(jobs)} to convert with {args.workers} worker(s)"
+    )
+
+    started = time.perf_counter()
+    total_bytes = 0
+    converted = 0
+    failed = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {
+                pool.submit(convert_one, str(src), str(dest), args.format, args.sheet_name): (
+                    dest,
+                    stamp,
+                )
+                for src, dest, stamp in jobs
+            }
+            for future in as_completed(futures):
+                dest, stamp = futures[future]
+                source, size, rows, seconds, error = future.result()
+                if error:
+                    failed += 1
+                    print(f"[ERROR] {source}: {error}")
+                    continue
+                converted += 1
+                total_bytes += size
+                manifest[dest.name] = stamp
+                print(f"[OK] {Path(source).name} -> {dest.name} ({rows} rows, {seconds:.2f}s)")
+
+        manifest_path = out_dir / MANIFEST_NAME
+        _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(
+        f"[OK] Converted {converted} file(s), {megabytes:.1f} MB in {elapsed:.2f}s "
+        f"({converted / elapsed:.2f} files/sec, {megabytes / elapsed:.2f} MB/sec); "
+        f"skipped {skipped}, failed {failed}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
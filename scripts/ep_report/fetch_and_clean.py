@@ -2,25 +2,62 @@
 # Downloads the EPGW Device List report, then converts the HTML-in-.xls to a clean .xlsx.
 # Patched to satisfy mypy/pylance: avoid Optional operands and cast OpenPyXL Worksheet.
 
+import argparse
 import asyncio
+import codecs
+import gzip
+import hashlib
+import json
 import os
 import re
 import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from io import BytesIO
 from datetime import datetime
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import List, Optional, Tuple, cast
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 from bs4 import BeautifulSoup  # type: ignore[import-untyped]
 from bs4.element import Tag  # type: ignore[import-untyped]
 from openpyxl import Workbook  # type: ignore[import-untyped]
 from openpyxl.worksheet.worksheet import Worksheet  # typed Worksheet for casts
 from playwright.async_api import (
+    BrowserContext,
+    Page,
+    Playwright,
     async_playwright,
     TimeoutError as PlaywrightTimeoutError,
 )
 from dotenv import load_dotenv  # type: ignore[import-untyped]
 
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from playwright_launch import (  # noqa: E402
+    attach_browser_service,
+    browser_service_storage_state,
+)
+from tracing import get_tracer  # noqa: E402
+
 load_dotenv()
 
 
@@ -47,12 +84,30 @@ REPORT_OUTPUT_XLSX = _env_path("REPORT_OUTPUT_XLSX", "data/EPFirmwareReport.xlsx
 DDL_OPCO = os.getenv("FETCH_SELECTOR_DDL_OPCO", "#MainContent_ddlOpCoCode")
 BTN_SEARCH = os.getenv("FETCH_SELECTOR_BTN_SEARCH", "#MainContent_btnSearch")
 BTN_EXPORT = os.getenv("FETCH_SELECTOR_BTN_EXPORT", "#MainContent_btnExport")
+GRID = os.getenv("FETCH_SELECTOR_GRID", "#MainContent_gvDeviceList")
 
 # --- Options ---
 HEADLESS = os.getenv("FETCH_HEADLESS", "false").lower() in {"1", "true", "yes"}
 ALLOWLIST = os.getenv("FETCH_AUTH_ALLOWLIST", "*.fujixerox.net")
 NAV_TIMEOUT_MS = int(os.getenv("FETCH_NAV_TIMEOUT_MS", "45000"))
 AFTER_SEARCH_WAIT_MS = int(os.getenv("FETCH_AFTER_SEARCH_WAIT_MS", "3000"))
+READY_TIMEOUT_MS = int(os.getenv("FETCH_READY_TIMEOUT_MS", str(NAV_TIMEOUT_MS)))
+RUN_LOG = _env_path("FETCH_RUN_LOG", str(DOWNLOAD_DIR / "fetch_runs.jsonl"))
+# Comma-separated OpCo values from the dropdown, or "all" to export every option.
+OPCOS = os.getenv("FETCH_OPCOS", "FXAU")
+PARALLELISM = max(1, int(os.getenv("FETCH_PARALLELISM", "3")))
+TRACER = get_tracer("report")
+
+# --- Content-addressed cache ---
+# Raw exports are stored gzip-compressed under their SHA-256; cleaned outputs are
+# keyed by that hash plus CLEANER_VERSION. Bump CLEANER_VERSION whenever the
+# cleaning logic or output layout changes so stale outputs are rebuilt.
+CLEANER_VERSION = "3"
+CACHE_DIR = _env_path("FETCH_CACHE_DIR", str(DOWNLOAD_DIR / "cache"))
+RAW_ARCHIVE_DIR = CACHE_DIR / "raw"
+CLEAN_CACHE_DIR = CACHE_DIR / "clean"
+RAW_RETENTION_COUNT = int(os.getenv("FETCH_RAW_RETENTION_COUNT", "30"))
+RAW_RETENTION_DAYS = int(os.getenv("FETCH_RAW_RETENTION_DAYS", "90"))
 
 # =========================
 # HTML .xls -> clean .xlsx
@@ -159,20 +214,148 @@ def _extract_table(html: str) -> Tuple[List[str], List[List[str]]]:
     return headers, data_rows
 
 
+class _TableStreamParser(HTMLParser):
+    """Incremental counterpart of ``_extract_table``.
+
+    Collects the rows of every table as the HTML is fed in chunks, so the export
+    never has to exist as one decoded string or a full BeautifulSoup tree. Cell
+    text mirrors ``get_text(separator=" ", strip=True)``: each text node is
+    stripped and non-empty nodes are joined with single spaces.
+    """
+
+    _SKIP_TAGS = {"xml", "script", "style"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        # Each table: {"id": str, "rows": [[(tag, [text nodes]), ...], ...]}
+        self.tables: List[Dict[str, object]] = []
+        self._open: List[Dict[str, object]] = []
+        self._row: Optional[List[Tuple[str, List[str]]]] = None
+        self._cell: Optional[List[str]] = None
+        self._text: List[str] = []
+        self._skip_depth = 0
+
+    def _flush_text(self) -> None:
+        if not self._text:
+            return
+        node = "".join(self._text).strip()
+        self._text = []
+        if node and self._cell is not None:
+            self._cell.append(node)
+
+    def _close_cell(self) -> None:
+        self._flush_text()
+        self._cell = None
+
+    def _close_row(self) -> None:
+        self._close_cell()
+        self._row = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush_text()
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == "table":
+            self._close_row()
+            table: Dict[str, object] = {"id": dict(attrs).get("id") or "", "rows": []}
+            self.tables.append(table)
+            self._open.append(table)
+        elif tag == "tr" and self._open:
+            self._close_row()
+            self._row = []
+            cast(List[object], self._open[-1]["rows"]).append(self._row)
+        elif tag in ("td", "th") and self._row is not None:
+            self._close_cell()
+            self._cell = []
+            self._row.append((tag, self._cell))
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_text()
+        if tag in self._SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in ("td", "th"):
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+        elif tag == "table" and self._open:
+            self._close_row()
+            self._open.pop()
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth and self._cell is not None:
+            self._text.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self._flush_text()
+
+    def result(self) -> Tuple[List[str], List[List[str]]]:
+        self.close()
+        self._close_row()
+        if not self.tables:
+            raise ValueError("No <table> elements found in the uploaded file.")
+
+        def first_row_width(t: Dict[str, object]) -> int:
+            rows = cast(List[List[object]], t["rows"])
+            return len(rows[0]) if rows else 0
+
+        preferred = [t for t in self.tables if t["id"] == "MainContent_gvDeviceList"]
+        table = preferred[0] if preferred else max(self.tables, key=first_row_width)
+        trs = cast(List[List[Tuple[str, List[str]]]], table["rows"])
+        if not trs:
+            raise ValueError("The table contains no rows.")
+
+        def text(cell: Tuple[str, List[str]]) -> str:
+            return _clean_cell_text(" ".join(cell[1]))
+
+        header_index = 0
+        header_cells = trs[0]
+        for idx, tr in enumerate(trs):
+            ths = [c for c in tr if c[0] == "th"]
+            if ths:
+                header_index, header_cells = idx, ths
+                break
+
+        headers = [text(c) for c in header_cells]
+        if not headers:
+            raise ValueError("Could not determine table headers.")
+
+        data_rows: List[List[str]] = []
+        for tr in trs[header_index + 1 :]:
+            values = [text(c) for c in tr if c[0] == "td"]
+            if not values:
+                continue
+            if len(values) < len(headers):
+                values += [""] * (len(headers) - len(values))
+            elif len(values) > len(headers):
+                values = values[: len(headers)]
+            data_rows.append(values)
+        return headers, data_rows
+
+
+def extract_table_stream(chunks: Iterable[str]) -> Tuple[List[str], List[List[str]]]:
+    """Same contract as ``_extract_table`` but consumes decoded text incrementally."""
+    parser = _TableStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.result()
+
+
 def _active_sheet(wb: Workbook) -> Worksheet:
     """Return a typed Worksheet for mypy/pylance."""
     return cast(Worksheet, wb.active)
 
 
-def clean_html_xls_to_xlsx_bytes(raw_bytes: bytes, sheet_name: str = "Data") -> bytes:
-    """Input: raw bytes from an HTML-in-.xls file. Output: XLSX bytes."""
+def _decode_export(raw_bytes: bytes) -> str:
     try:
-        html = raw_bytes.decode("utf-8", errors="replace")
+        return raw_bytes.decode("utf-8", errors="replace")
     except Exception:
-        html = raw_bytes.decode("latin-1", errors="replace")
+        return raw_bytes.decode("latin-1", errors="replace")
 
-    headers, rows = _extract_table(html)
 
+def _table_to_xlsx_bytes(
+    headers: List[str], rows: List[List[str]], sheet_name: str = "Data"
+) -> bytes:
     wb = Workbook()
     ws = _active_sheet(wb)
     # Guard: sheet_name may be >31; slice and ensure string
@@ -192,80 +375,595 @@ def clean_html_xls_to_xlsx_bytes(raw_bytes: bytes, sheet_name: str = "Data") ->
     return out.getvalue()
 
 
+def clean_html_xls_to_xlsx_bytes(raw_bytes: bytes, sheet_name: str = "Data") -> bytes:
+    """Input: raw bytes from an HTML-in-.xls file. Output: XLSX bytes."""
+    headers, rows = _extract_table(_decode_export(raw_bytes))
+    return _table_to_xlsx_bytes(headers, rows, sheet_name)
+
+
+def merge_opco_tables(
+    tables: Sequence[Tuple[str, List[str], List[List[str]]]],
+) -> Tuple[List[str], List[List[str]]]:
+    """Union the per-OpCo tables into one, prefixed with an ``OpCo`` column.
+
+    Columns are matched by header text (and occurrence, for repeated headers) so
+    OpCos whose exports differ slightly still line up; missing cells stay blank.
+    """
+    merged_keys: List[Tuple[str, int]] = []
+    positions: Dict[Tuple[str, int], int] = {}
+    table_keys: List[List[Tuple[str, int]]] = []
+    for _, headers, _ in tables:
+        seen: Dict[str, int] = {}
+        keys: List[Tuple[str, int]] = []
+        for header in headers:
+            occurrence = seen.get(header, 0)
+            seen[header] = occurrence + 1
+            key = (header, occurrence)
+            if key not in positions:
+                positions[key] = len(merged_keys)
+                merged_keys.append(key)
+            keys.append(key)
+        table_keys.append(keys)
+
+    merged_rows: List[List[str]] = []
+    for (opco, _, rows), keys in zip(tables, table_keys):
+        indexes = [positions[key] for key in keys]
+        for row in rows:
+            merged = [""] * len(merged_keys)
+            for idx, value in zip(indexes, row):
+                merged[idx] = value
+            merged_rows.append([opco] + merged)
+
+    return ["OpCo"] + [header for header, _ in merged_keys], merged_rows
+
+
+# ======================
+# Raw archive + clean cache
+# ======================
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def ingest_raw_export(src: Path) -> Tuple[str, Path]:
+    """Hash and gzip-archive a raw export in a single streaming pass.
+
+    ``src`` is read incrementally (e.g. Playwright's own download temp file) and
+    is left in place. Returns ``(sha256, archived_path)``; re-downloading identical
+    bytes only refreshes the archived file's mtime so retention treats it as recent.
+    """
+    RAW_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp = RAW_ARCHIVE_DIR / f".ingest.{os.getpid()}.{id(src)}.tmp"
+    try:
+        with src.open("rb") as handle, gzip.open(tmp, "wb", compresslevel=6) as gz:
+            for chunk in iter(lambda: handle.read(STREAM_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                gz.write(chunk)
+        archived = RAW_ARCHIVE_DIR / f"{digest.hexdigest()}.xls.gz"
+        if archived.exists():
+            os.utime(archived)
+        else:
+            os.replace(tmp, archived)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return digest.hexdigest(), archived
+
+
+def archive_raw_export(raw_path: Path) -> Tuple[str, Path]:
+    """Move a saved export into the gzip archive, keyed by content hash."""
+    result = ingest_raw_export(raw_path)
+    raw_path.unlink()
+    return result
+
+
+def _open_raw_export(path: Path) -> Union[gzip.GzipFile, IO[bytes]]:
+    if path.suffix.lower() == ".gz":
+        return gzip.open(path, "rb")
+    return path.open("rb")
+
+
+def read_raw_export(path: Path) -> bytes:
+    """Read a raw export, transparently decompressing archived ``.gz`` files."""
+    with _open_raw_export(path) as handle:
+        return handle.read()
+
+
+def iter_raw_text(path: Path, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Yield decoded text from a raw (optionally gzipped) export, chunk by chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with _open_raw_export(path) as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def write_table_xlsx_atomic(
+    dest: Path, headers: List[str], rows: Iterable[List[str]], sheet_name: str = "Data"
+) -> None:
+    """Stream a table into ``dest`` via a temp file + rename in the same directory.
+
+    Readers see either the previous file or the complete new one, never a gap.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=str(sheet_name)[:31])
+    ws.append([str(h) if h is not None else "" for h in headers])
+    for row in rows:
+        ws.append([str(v) if v is not None else "" for v in row])
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        wb.save(str(tmp))
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _cache_path(key: str, suffix: str) -> Path:
+    return CLEAN_CACHE_DIR / f"{key}-v{CLEANER_VERSION}{suffix}"
+
+
+# Names written by ``_cache_path``; prune_cache never touches anything else.
+_CACHE_ENTRY_RE = re.compile(r"^((?:merged_)?[0-9a-f]{64})-v(\d+)(?:\.xlsx|\.json\.gz)$")
+
+
+def cached_clean_xlsx(digest: str, raw_path: Path, sheet_name: str) -> Tuple[Path, bool]:
+    """Return the cleaned XLSX for ``digest``, converting only on a cache miss."""
+    cached = _cache_path(digest, ".xlsx")
+    if cached.exists():
+        return cached, True
+    headers, rows = extract_table_stream(iter_raw_text(raw_path))
+    write_table_xlsx_atomic(cached, headers, rows, sheet_name)
+    return cached, False
+
+
+def _clean_export_worker(
+    raw_path: str, digest: str
+) -> Tuple[List[str], List[List[str]], float, bool]:
+    """Process-pool entry point: parse one raw export into (headers, rows, seconds, cached)."""
+    started = time.perf_counter()
+    cached = _cache_path(digest, ".json.gz")
+    if cached.exists():
+        with gzip.open(cached, "rt", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        return payload["headers"], payload["rows"], time.perf_counter() - started, True
+    headers, rows = extract_table_stream(iter_raw_text(Path(raw_path)))
+    payload_bytes = json.dumps({"headers": headers, "rows": rows}).encode("utf-8")
+    _write_atomic(cached, gzip.compress(payload_bytes, compresslevel=6))
+    return headers, rows, time.perf_counter() - started, False
+
+
+def prune_cache(
+    keep: int = RAW_RETENTION_COUNT, max_age_days: int = RAW_RETENTION_DAYS
+) -> int:
+    """Apply retention to the raw archive and drop clean outputs that no longer apply.
+
+    Keeps the ``keep`` most recently seen raw exports (0 = unlimited) and removes
+    anything older than ``max_age_days`` (0 = no age limit). Cleaned outputs from
+    other cleaner versions, or whose raw export was pruned, are removed too. Only
+    recognised cache entries are deleted, so another run's in-flight ``*.tmp``
+    files survive.
+    Returns the number of files deleted.
+    """
+    removed = 0
+    cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+    raws = sorted(
+        RAW_ARCHIVE_DIR.glob("*.xls.gz"), key=lambda p: p.stat().st_mtime, reverse=True
+    )
+    kept: Set[str] = set()
+    for idx, path in enumerate(raws):
+        too_many = keep > 0 and idx >= keep
+        too_old = cutoff is not None and path.stat().st_mtime < cutoff
+        if too_many or too_old:
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            kept.add(path.name.split(".", 1)[0])
+
+    for path in CLEAN_CACHE_DIR.glob("*"):
+        match = _CACHE_ENTRY_RE.match(path.name)
+        if match is None:
+            continue
+        key, version = match.groups()
+        stale_version = version != CLEANER_VERSION
+        if key.startswith("merged_"):
+            orphan = cutoff is not None and path.stat().st_mtime < cutoff
+        else:
+            orphan = key not in kept
+        if stale_version or orphan:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
 # ======================
 # Download + Convert Run
 # ======================
 
 
-async def download_device_list_once() -> Path:
-    async with async_playwright() as p:
-        context = await p.chromium.launch_persistent_context(
-            user_data_dir=str(USER_DATA_DIR),
-            headless=HEADLESS,
-            channel="msedge",  # comment this line if Edge channel isn't available
-            args=[
-                f"--auth-server-allowlist={ALLOWLIST}",
-                f"--auth-negotiate-delegate-allowlist={ALLOWLIST}",
-                "--start-minimized",
-            ],
-            accept_downloads=True,
+@dataclass
+class OpcoExport:
+    opco: str
+    raw_path: Optional[Path] = None
+    download_seconds: float = 0.0
+    search_ready_ms: float = 0.0
+    clean_seconds: float = 0.0
+    rows: int = 0
+    digest: str = ""
+    cached: bool = False
+    error: str = ""
+
+
+async def _launch_report_context(p: Playwright) -> BrowserContext:
+    # With BROWSER_SERVICE_URL set, reuse the warm service browser; closing the
+    # returned context leaves the service running.
+    browser = await attach_browser_service(p, label="fetch_and_clean")
+    if browser is not None:
+        context_kwargs: Dict[str, Any] = {"accept_downloads": True}
+        state = await browser_service_storage_state()
+        if state:
+            context_kwargs["storage_state"] = state
+        return await browser.new_context(**context_kwargs)
+    return await p.chromium.launch_persistent_context(
+        user_data_dir=str(USER_DATA_DIR),
+        headless=HEADLESS,
+        channel="msedge",  # comment this line if Edge channel isn't available
+        args=[
+            f"--auth-server-allowlist={ALLOWLIST}",
+            f"--auth-negotiate-delegate-allowlist={ALLOWLIST}",
+            "--start-minimized",
+        ],
+        accept_downloads=True,
+    )
+
+
+# Tag the current grid (if any) so a re-rendered grid can be told apart from it,
+# and mark the search pending until the async postback's endRequest fires.
+_MARK_GRID_STALE_JS = """
+(sel) => {
+  const grid = document.querySelector(sel);
+  if (grid) grid.setAttribute('data-sra-stale', '1');
+  window.__sraSearch = 'pending';
+  const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+  if (prm) {
+    const done = () => { window.__sraSearch = 'done'; prm.remove_endRequest(done); };
+    prm.add_endRequest(done);
+  }
+  return !!grid;
+}
+"""
+
+# Ready once the search postback has finished: the async endRequest fired, or a
+# full postback loaded a new document (which has no pending mark). The grid may
+# then hold any number of rows or be absent altogether (no records), so the
+# result is an object and never falsy.
+_GRID_READY_JS = """
+(sel) => {
+  const prm = (window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager)
+    ? Sys.WebForms.PageRequestManager.getInstance() : null;
+  if (prm && prm.get_isInAsyncPostBack()) return false;
+  if (window.__sraSearch === 'pending' || document.readyState !== 'complete') return false;
+  const grid = document.querySelector(sel);
+  if (grid && grid.hasAttribute('data-sra-stale')) return false;
+  return { rows: grid ? grid.querySelectorAll('tr').length : 0 };
+}
+"""
+
+
+def _append_run_log(record: Dict[str, object]) -> None:
+    RUN_LOG.parent.mkdir(parents=True, exist_ok=True)
+    record = {"timestamp": datetime.now().isoformat(timespec="milliseconds"), **record}
+    with RUN_LOG.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record) + "\n")
+
+
+async def _search_and_wait_ready(page: Page, opco: str) -> float:
+    """Click Search and wait until the device grid has actually been re-rendered.
+
+    An empty result set counts as ready as soon as the postback ends. Falls back
+    to the old networkidle + FETCH_AFTER_SEARCH_WAIT_MS settle only when the
+    postback does not finish within FETCH_READY_TIMEOUT_MS. Returns the
+    search-to-ready latency in milliseconds.
+    """
+    await page.evaluate(_MARK_GRID_STALE_JS, GRID)
+    started = time.perf_counter()
+    await page.click(BTN_SEARCH)
+
+    grid_rows = 0
+    ready_via = "grid"
+    try:
+        handle = await page.wait_for_function(
+            _GRID_READY_JS, arg=GRID, timeout=READY_TIMEOUT_MS, polling=100
         )
-
+        grid_rows = int((await handle.json_value())["rows"])
+    except PlaywrightTimeoutError:
+        ready_via = "fallback"
         try:
-            page = await context.new_page()
-            page.set_default_navigation_timeout(NAV_TIMEOUT_MS)
-            page.set_default_timeout(NAV_TIMEOUT_MS)
+            await page.wait_for_load_state("networkidle")
+        except PlaywrightTimeoutError:
+            pass
+        await page.wait_for_timeout(AFTER_SEARCH_WAIT_MS)
+    ready_ms = (time.perf_counter() - started) * 1000
+
+    print(f"[OK] {opco} results ready via {ready_via} in {ready_ms:.0f} ms")
+    _append_run_log(
+        {
+            "event": "search-ready",
+            "opco": opco,
+            "ready_via": ready_via,
+            "search_to_ready_ms": round(ready_ms, 1),
+            "grid_rows": grid_rows,
+        }
+    )
+    return ready_ms
+
+
+async def _export_device_list(
+    context: BrowserContext, opco: str
+) -> Tuple[str, Path, float]:
+    """Run Search + Export for one OpCo on its own page and archive the raw file.
+
+    The download is streamed from Playwright's temp file straight into the
+    content-addressed archive (no ``save_as`` copy). Returns the export's SHA-256,
+    its archived path and the measured search-to-ready latency (ms).
+    """
+    page = await context.new_page()
+    try:
+        page.set_default_navigation_timeout(NAV_TIMEOUT_MS)
+        page.set_default_timeout(NAV_TIMEOUT_MS)
 
-            # 1) Go to report page (IWA should auto-auth if your Windows session has access)
-            await page.goto(REPORT_URL, wait_until="networkidle")
+        # 1) Go to report page (IWA should auto-auth if your Windows session has access)
+        with TRACER.span("open", row=opco):
+            await page.goto(REPORT_URL, wait_until="domcontentloaded")
+            await page.wait_for_selector(DDL_OPCO, state="attached")
 
-            # 2) Set dropdown to FBAU (value="FXAU")
-            await page.select_option(DDL_OPCO, "FXAU")
+            # 2) Set the OpCo dropdown (e.g. FBAU is value="FXAU")
+            await page.select_option(DDL_OPCO, opco)
 
-            # 3) Click Search and wait for results to load/settle
-            await page.click(BTN_SEARCH)
-            try:
-                await page.wait_for_load_state("networkidle")
-            except PlaywrightTimeoutError:
-                pass
-            await page.wait_for_timeout(AFTER_SEARCH_WAIT_MS)
+        # 3) Click Search and wait for the grid to re-render
+        with TRACER.span("search", row=opco):
+            ready_ms = await _search_and_wait_ready(page, opco)
 
-            # 4) Click Export and capture the download
+        # 4) Click Export and capture the download
+        with TRACER.span("export", row=opco):
             async with page.expect_download() as download_info:
                 await page.click(BTN_EXPORT)
             download = await download_info.value
 
-            # 5) Save with a timestamped filename into downloads/ (always safe)
-            suggested = download.suggested_filename or "report.xls"
-            safe_name = Path(suggested).name  # strip any path shenanigans
-            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            out_path = DOWNLOAD_DIR / f"{stamp}-{safe_name}"
-            await download.save_as(out_path)
-            print(f"[OK] Saved raw report: {out_path.resolve()}")
-            return out_path
+        # 5) Hash + archive straight from Playwright's temp file while the context
+        #    is still open (it is deleted on close). Remote browsers have no local
+        #    path, so fall back to save_as into downloads/ first.
+        try:
+            temp_path = await download.path()
+        except Exception:  # noqa: BLE001 - e.g. connected over CDP
+            temp_path = None
+        with TRACER.span("archive", row=opco):
+            if temp_path is not None:
+                digest, archived = await asyncio.to_thread(ingest_raw_export, Path(temp_path))
+            else:
+                suggested = download.suggested_filename or "report.xls"
+                safe_name = Path(suggested).name  # strip any path shenanigans
+                stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+                out_path = DOWNLOAD_DIR / f"{stamp}-{opco}-{safe_name}"
+                await download.save_as(out_path)
+                digest, archived = await asyncio.to_thread(archive_raw_export, out_path)
+        print(f"[OK] Archived raw report ({opco}): {archived.resolve()}")
+        return digest, archived, ready_ms
+    finally:
+        await page.close()
+
+
+async def _list_opcos(context: BrowserContext) -> List[str]:
+    """Read every non-empty option value from the OpCo dropdown."""
+    page = await context.new_page()
+    try:
+        page.set_default_navigation_timeout(NAV_TIMEOUT_MS)
+        page.set_default_timeout(NAV_TIMEOUT_MS)
+        await page.goto(REPORT_URL, wait_until="domcontentloaded")
+        values = await page.eval_on_selector_all(
+            f"{DDL_OPCO} option", "opts => opts.map(o => o.value)"
+        )
+    finally:
+        await page.close()
+    return [str(v).strip() for v in values if v and str(v).strip()]
 
+
+async def download_device_list_once(opco: str = "FXAU") -> Tuple[str, Path]:
+    """Export one OpCo; returns ``(sha256, archived_path)`` of the raw report."""
+    async with async_playwright() as p:
+        context = await _launch_report_context(p)
+        try:
+            digest, archived, _ = await _export_device_list(context, opco)
+            return digest, archived
         finally:
             await context.close()
 
 
-async def main() -> None:
-    # Step 1: download the HTML-in-.xls
-    raw_path = await download_device_list_once()
-
-    # Step 2: convert to clean .xlsx
-    raw_bytes = raw_path.read_bytes()
-    xlsx_bytes = clean_html_xls_to_xlsx_bytes(raw_bytes, sheet_name="DeviceList")
-
-    xlsx_path = raw_path.with_suffix(".xlsx")  # keep same timestamped prefix
-    xlsx_path.write_bytes(xlsx_bytes)
-    print(f"[OK] Wrote clean XLSX: {xlsx_path.resolve()}")
+TableCallback = Callable[[str, List[str], List[List[str]]], None]
+
+
+async def download_and_clean_opcos(
+    opcos: Sequence[str],
+    parallelism: int = PARALLELISM,
+    on_table: Optional[TableCallback] = None,
+) -> Tuple[List[OpcoExport], List[str], List[List[str]]]:
+    """Export several OpCos concurrently, clean them in a process pool and merge.
+
+    ``opcos`` may be ``["all"]`` to expand to every dropdown option. Downloads run
+    on separate pages of one persistent context (bounded by ``parallelism``); each
+    finished download is handed to the pool straight away so cleaning overlaps
+    with the remaining exports. ``on_table(opco, headers, rows)`` is called as
+    soon as each OpCo's table is cleaned, before the merge. The per-OpCo summary
+    is printed before the merge, so failure reasons show even when none succeeded.
+    """
+    run_started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(max(1, parallelism))
+    tables: Dict[str, Tuple[List[str], List[List[str]]]] = {}
+
+    with ProcessPoolExecutor(max_workers=max(1, min(parallelism, os.cpu_count() or 1))) as pool:
+        async with async_playwright() as p:
+            context = await _launch_report_context(p)
+            try:
+                selected = list(opcos)
+                if [o.lower() for o in selected] == ["all"]:
+                    selected = await _list_opcos(context)
+                    print(f"[INFO] OpCos from dropdown: {', '.join(selected)}")
+
+                async def run_one(opco: str) -> OpcoExport:
+                    export = OpcoExport(opco=opco)
+                    try:
+                        async with sem:
+                            started = time.perf_counter()
+                            with TRACER.span("row", row=opco):
+                                (
+                                    export.digest,
+                                    export.raw_path,
+                                    export.search_ready_ms,
+                                ) = await _export_device_list(context, opco)
+                            export.download_seconds = time.perf_counter() - started
+                        with TRACER.span("clean", row=opco) as span:
+                            (
+                                headers,
+                                rows,
+                                export.clean_seconds,
+                                export.cached,
+                            ) = await loop.run_in_executor(
+                                pool, _clean_export_worker, str(export.raw_path), export.digest
+                            )
+                            span.set(rows=len(rows), cached=export.cached)
+                    except Exception as exc:  # noqa: BLE001 - keep the other OpCos going
+                        export.error = str(exc) or exc.__class__.__name__
+                        print(f"[ERROR] {opco}: {export.error}")
+                        return export
+                    export.rows = len(rows)
+                    tables[opco] = (headers, rows)
+                    if on_table is not None:
+                        on_table(opco, headers, rows)
+                    return export
+
+                exports = await asyncio.gather(*(run_one(o) for o in selected))
+            finally:
+                await context.close()
 
-    REPORT_OUTPUT_XLSX.parent.mkdir(parents=True, exist_ok=True)
+    _print_opco_summary(exports, time.perf_counter() - run_started)
+    ordered = [(e.opco, *tables[e.opco]) for e in exports if e.opco in tables]
+    if not ordered:
+        raise RuntimeError("No OpCo exports succeeded; nothing to merge.")
+    headers, rows = merge_opco_tables(ordered)
+    return list(exports), headers, rows
+
+
+def _merged_cache_key(exports: Sequence[OpcoExport]) -> str:
+    parts = ";".join(f"{e.opco}:{e.digest}" for e in exports if not e.error)
+    return "merged_" + hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+
+def _print_opco_summary(exports: Sequence[OpcoExport], elapsed: float) -> None:
+    print(
+        f"{'OpCo':<8} {'download':>9} {'ready':>7} {'clean':>7} {'rows':>7}  status"
+    )
+    for e in exports:
+        status = f"ERROR: {e.error}" if e.error else ("cached" if e.cached else "ok")
+        print(
+            f"{e.opco:<8} {e.download_seconds:>8.1f}s {e.search_ready_ms / 1000:>6.1f}s "
+            f"{e.clean_seconds:>6.1f}s {e.rows:>7}  {status}"
+        )
+    total_rows = sum(e.rows for e in exports)
+    print(f"[OK] {len(exports)} OpCo(s), {total_rows} rows in {elapsed:.1f}s")
+
+
+def _publish_report(xlsx_path: Path) -> None:
+    """Copy a cleaned XLSX over REPORT_OUTPUT_XLSX atomically (temp + rename)."""
     destination = REPORT_OUTPUT_XLSX
-    if destination.exists():
-        destination.unlink()
-    moved_to = Path(shutil.move(str(xlsx_path), str(destination)))
-    print(f"[OK] Moved cleaned XLSX to: {moved_to.resolve()}")
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(xlsx_path, tmp)
+        os.replace(tmp, destination)
+    finally:
+        tmp.unlink(missing_ok=True)
+    print(f"[OK] Published cleaned XLSX to: {destination.resolve()}")
+
+
+def _parse_opcos(values: Sequence[str]) -> List[str]:
+    opcos: List[str] = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if part.lower() == "all":
+                return ["all"]
+            if part and part not in opcos:
+                opcos.append(part)
+    return opcos or ["FXAU"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Download the EPGW Device List report and convert it to XLSX."
+    )
+    parser.add_argument(
+        "--opco",
+        action="append",
+        help=(
+            "OpCo value to export (repeat or comma-separate for several, or 'all' "
+            f"for every dropdown option). Default: FETCH_OPCOS ({OPCOS})."
+        ),
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=PARALLELISM,
+        help=f"Concurrent OpCo exports when fetching several (default: {PARALLELISM}).",
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    opcos = _parse_opcos(args.opco or [OPCOS])
+
+    if opcos != ["all"] and len(opcos) == 1:
+        # Step 1: download the HTML-in-.xls, archived by content hash
+        digest, archived = await download_device_list_once(opcos[0])
+
+        # Step 2: convert to clean .xlsx (skipped when this export was cleaned before)
+        cached, hit = cached_clean_xlsx(digest, archived, sheet_name="DeviceList")
+        print(f"[{'CACHE' if hit else 'OK'}] Clean XLSX: {cached.resolve()}")
+        _publish_report(cached)
+    else:
+        exports, headers, rows = await download_and_clean_opcos(opcos, args.parallel)
+        cached = _cache_path(_merged_cache_key(exports), ".xlsx")
+        if cached.exists():
+            print(f"[CACHE] Merged XLSX unchanged: {cached.resolve()}")
+        else:
+            write_table_xlsx_atomic(cached, headers, rows, sheet_name="DeviceList")
+            print(f"[OK] Wrote merged XLSX: {cached.resolve()}")
+        _publish_report(cached)
+
+    removed = prune_cache()
+    if removed:
+        print(f"[OK] Pruned {removed} cached file(s) from {CACHE_DIR}")
 
 
 if __name__ == "__main__":
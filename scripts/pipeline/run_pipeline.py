@@ -0,0 +1,366 @@
+"""Run report fetch -> clean -> AST lookups + firmware scheduling as one DAG.
+
+The report stage exports and cleans every OpCo; each cleaned table is handed
+to the firmware stage in memory as soon as it is ready, so scheduling starts
+while other OpCos are still downloading. The AST stage needs the whole report
+(de-duplication and priority ordering look at every row), so it starts when
+the report stage finishes and then runs alongside firmware scheduling.
+
+Every run gets ``PIPELINE_DIR/<run token>/`` with ``manifest.json`` (stage
+status, timings, artifact paths) and the checkpointed report/work files, so
+``--resume`` can skip the stages that already finished.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import shlex
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+for _path in (
+    ROOT_DIR,
+    ROOT_DIR / "scripts" / "ep_report",
+    ROOT_DIR / "scripts" / "ast_toner",
+    ROOT_DIR / "scripts" / "schedule_firmware",
+):
+    if str(_path) not in sys.path:
+        sys.path.append(str(_path))
+
+import fetch_and_clean as report  # noqa: E402
+import fetch_ast_toner as ast  # noqa: E402
+import firmware_eligibility as eligibility  # noqa: E402
+import firmware_webforms_replay_playwright as firmware  # noqa: E402
+from schedule_index import load_index  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+from xlsx_reader import XlsxSheet  # noqa: E402
+
+load_dotenv()
+
+
+def _env_path(var_name: str, default: str) -> Path:
+    raw_value = os.getenv(var_name, default)
+    normalised = raw_value.replace("\\", "/")
+    return Path(normalised).expanduser()
+
+
+PIPELINE_DIR = _env_path("PIPELINE_DIR", "data/pipeline")
+STAGES = ("report", "ast", "firmware")
+REPORT_CHECKPOINT = "EPFirmwareReport.xlsx"
+FIRMWARE_CHECKPOINT = "firmware_schedule.csv"
+FIRMWARE_FIELDS = ["serial", "product_code", "state", "opco"]
+TRACER = get_tracer("pipeline")
+
+Table = Tuple[List[str], List[List[str]]]
+
+
+def _now() -> str:
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+class Manifest:
+    """``manifest.json`` for one run; rewritten atomically on every change."""
+
+    def __init__(self, run_dir: Path, data: Optional[Dict[str, Any]] = None) -> None:
+        self.run_dir = run_dir
+        self.path = run_dir / "manifest.json"
+        self.data: Dict[str, Any] = data or {"created_at": _now(), "stages": {}}
+
+    @classmethod
+    def load(cls, run_dir: Path) -> "Manifest":
+        path = run_dir / "manifest.json"
+        if not path.exists():
+            raise FileNotFoundError(f"No pipeline manifest in {run_dir}")
+        return cls(run_dir, json.loads(path.read_text(encoding="utf-8")))
+
+    def stage(self, name: str) -> Dict[str, Any]:
+        return self.data["stages"].setdefault(name, {"status": "pending"})
+
+    def done(self, name: str) -> bool:
+        return self.stage(name).get("status") == "done"
+
+    def save(self) -> None:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def _latest_run_dir() -> Path:
+    runs = sorted(p for p in PIPELINE_DIR.glob("*") if (p / "manifest.json").exists())
+    if not runs:
+        raise FileNotFoundError(f"No pipeline runs to resume under {PIPELINE_DIR}")
+    return runs[-1]
+
+
+def _load_report_table(path: Path) -> Table:
+    """Headers and string rows from a cleaned report workbook."""
+    with XlsxSheet(path) as sheet:
+        headers = sheet.headers
+        rows = [
+            ["" if v is None else str(v).strip() for v in cells]
+            for cells in sheet.iter_rows(min_row=2)
+        ]
+    return headers, rows
+
+
+def firmware_rows(headers: Sequence[str], rows: Sequence[Sequence[str]], opco: str = "") -> List[dict]:
+    """Map report rows to the firmware work-row shape (serial/product_code/state/opco).
+
+    Header spacing is dropped so "Serial Number" lines up with ``normalize_row``'s
+    ``serialnumber`` alias; ``opco`` fills in when the table has no OpCo column.
+    """
+    keys = ["".join(h.split()) for h in headers]
+    mapped: List[dict] = []
+    for row in rows:
+        raw: Dict[str, str] = {"opco": opco} if opco else {}
+        raw.update((key, value) for key, value in zip(keys, row) if key)
+        item = firmware.normalize_row(raw)
+        if item["serial"] or item["product_code"]:
+            mapped.append(item)
+    return mapped
+
+
+class Pipeline:
+    def __init__(self, args: argparse.Namespace, manifest: Manifest) -> None:
+        self.args = args
+        self.manifest = manifest
+        self.run_dir = manifest.run_dir
+        self.started = time.perf_counter()
+        self.report_table: "asyncio.Future[Table]" = asyncio.get_running_loop().create_future()
+        # (opco, headers, rows) per cleaned OpCo, then None once the report stage ends.
+        self.batches: "asyncio.Queue[Optional[Tuple[str, List[str], List[List[str]]]]]" = asyncio.Queue()
+
+    def _offset(self) -> float:
+        return round(time.perf_counter() - self.started, 3)
+
+    async def _stage(self, name: str, body: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        stage = self.manifest.stage(name)
+        stage.update(status="running", started_at=_now(), start_s=self._offset(), error="")
+        self.manifest.save()
+        try:
+            with TRACER.span("stage", row=name):
+                await body(stage)
+        except Exception as exc:  # noqa: BLE001 - one failed stage must not cancel the others
+            stage.update(status="failed", error=str(exc) or exc.__class__.__name__)
+            logging.exception("Pipeline stage %s failed", name)
+        else:
+            stage["status"] = "done"
+        stage.update(finished_at=_now(), end_s=self._offset())
+        stage["seconds"] = round(stage["end_s"] - stage["start_s"], 3)
+        self.manifest.save()
+
+    # ---- report ----
+    async def run_report(self, stage: Dict[str, Any]) -> None:
+        opcos = report._parse_opcos(self.args.opco or [report.OPCOS])
+        tables: Dict[str, Table] = {}
+
+        def on_table(opco: str, headers: List[str], rows: List[List[str]]) -> None:
+            tables[opco] = (headers, rows)
+            self.batches.put_nowait((opco, headers, rows))
+
+        try:
+            exports, headers, rows = await report.download_and_clean_opcos(
+                opcos, self.args.parallel, on_table=on_table
+            )
+        finally:
+            self.batches.put_nowait(None)
+        if opcos != ["all"] and len(opcos) == 1:
+            # Same shape as the standalone single-OpCo report (no OpCo column).
+            headers, rows = tables[opcos[0]]
+
+        checkpoint = self.run_dir / REPORT_CHECKPOINT
+        await asyncio.to_thread(
+            report.write_table_xlsx_atomic, checkpoint, headers, rows, sheet_name="DeviceList"
+        )
+        await asyncio.to_thread(report._publish_report, checkpoint)
+        stage["opcos"] = [e.opco for e in exports if not e.error]
+        stage["rows"] = len(rows)
+        stage["artifacts"] = {"report_xlsx": str(checkpoint), "published": str(report.REPORT_OUTPUT_XLSX)}
+        self.report_table.set_result((headers, rows))
+
+    def _restore_report(self) -> None:
+        """Feed later stages from a checkpoint instead of a fresh export."""
+        checkpoint = self.run_dir / REPORT_CHECKPOINT
+        source = checkpoint if checkpoint.exists() else report.REPORT_OUTPUT_XLSX
+        headers, rows = _load_report_table(source)
+        print(f"[INFO] Using report rows from {source} ({len(rows)} rows)")
+        self.manifest.stage("report").setdefault("artifacts", {"report_xlsx": str(source)})
+        self.report_table.set_result((headers, rows))
+        self.batches.put_nowait(("", headers, rows))
+        self.batches.put_nowait(None)
+
+    # ---- ast ----
+    async def run_ast(self, stage: Dict[str, Any]) -> None:
+        headers, rows = await self.report_table
+        stage["waited_s"] = round(self._offset() - stage["start_s"], 3)
+        ast_args = ast.parse_args(shlex.split(self.args.ast_args))
+        inputs = ast.input_rows_from_values(rows, headers)
+        stage["rows"] = len(inputs)
+        report_xlsx = Path(self.manifest.stage("report")["artifacts"]["report_xlsx"])
+        stage["written"] = await ast.run_ast(inputs, ast_args, input_path=report_xlsx)
+        stage["artifacts"] = {"ast_csv": str(ast.AST_OUTPUT_CSV)}
+
+    # ---- firmware ----
+    async def _firmware_items(
+        self,
+        stage: Dict[str, Any],
+        checkpoint: Path,
+        eligible: Optional[eligibility.EligibilityFilter] = None,
+        rules: Optional[eligibility.Rules] = None,
+    ) -> AsyncIterator[dict]:
+        with checkpoint.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=FIRMWARE_FIELDS)
+            writer.writeheader()
+            while True:
+                batch = await self.batches.get()
+                if batch is None:
+                    break
+                opco, headers, rows = batch
+                if eligible is not None and rules is not None:
+                    # Predict from this table before its rows reach run_schedule's filter.
+                    prediction = eligibility.predict_table(headers, rows, rules, opco)
+                    eligible.add(prediction)
+                    print(f"[ELIGIBILITY] {prediction.summary()} from {opco or 'report'}")
+                items = firmware_rows(headers, rows, opco)
+                stage.setdefault("first_batch_s", self._offset())
+                stage["rows"] = stage.get("rows", 0) + len(items)
+                writer.writerows(items)
+                handle.flush()
+                print(f"[INFO] firmware: queued {len(items)} row(s) from {opco or 'report'}")
+                for item in items:
+                    yield item
+
+    async def run_firmware(self, stage: Dict[str, Any]) -> None:
+        checkpoint = self.run_dir / FIRMWARE_CHECKPOINT
+        rules = eligibility.load_rules()
+        eligible = eligibility.EligibilityFilter() if rules is not None else None
+        await firmware.run_schedule(
+            self._firmware_items(stage, checkpoint, eligible, rules),
+            out_path=firmware.OUTPUT_PATH,
+            input_path=None,
+            index=load_index(firmware.OUTPUT_PATH),
+            eligible=eligible,
+        )
+        stage["artifacts"] = {"work_csv": str(checkpoint), "schedule_csv": str(firmware.OUTPUT_PATH)}
+
+    async def _report_then_release(self) -> None:
+        await self._stage("report", self.run_report)
+        if not self.report_table.done():
+            # Fail the AST stage instead of leaving it waiting forever.
+            self.report_table.set_exception(RuntimeError("report stage failed"))
+
+    async def run(self, stages: Sequence[str]) -> None:
+        jobs: List[Awaitable[None]] = []
+        for name, body in (("ast", self.run_ast), ("firmware", self.run_firmware)):
+            if self.manifest.done(name):
+                print(f"[INFO] Stage {name} already done; skipping")
+            elif name in stages:
+                jobs.append(self._stage(name, body))
+        if "report" in stages and not self.manifest.done("report"):
+            jobs.insert(0, self._report_then_release())
+        elif jobs:
+            self._restore_report()
+        await asyncio.gather(*jobs)
+        if self.report_table.done():
+            self.report_table.exception()  # mark retrieved when AST was not selected
+
+
+def print_timings(manifest: Manifest, wall_seconds: float) -> None:
+    print(f"{'stage':<10} {'start':>8} {'end':>8} {'duration':>9}  status")
+    for name in STAGES:
+        stage = manifest.data["stages"].get(name)
+        if not stage:
+            continue
+        if "start_s" not in stage:
+            print(f"{name:<10} {'':>8} {'':>8} {'':>9}  {stage.get('status', '')}")
+            continue
+        status = stage["status"] + (f": {stage['error']}" if stage.get("error") else "")
+        print(
+            f"{name:<10} {stage['start_s']:>7.1f}s {stage['end_s']:>7.1f}s "
+            f"{stage['seconds']:>8.1f}s  {status}"
+        )
+    print(f"[OK] Pipeline wall clock {wall_seconds:.1f}s; manifest: {manifest.path}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Fetch the report, then run AST lookups and firmware scheduling from it."
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help=f"Comma-separated stages to run (default: {','.join(STAGES)}).",
+    )
+    parser.add_argument(
+        "--opco",
+        action="append",
+        help="OpCo(s) for the report stage (as fetch_and_clean.py --opco).",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=report.PARALLELISM,
+        help=f"Concurrent OpCo exports (default: {report.PARALLELISM}).",
+    )
+    parser.add_argument(
+        "--ast-args",
+        default="",
+        help='Extra fetch_ast_toner.py options, e.g. --ast-args "--engine http".',
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        help="Resume a run (token under PIPELINE_DIR, or the latest), skipping finished stages.",
+    )
+    args = parser.parse_args(argv)
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    if "ast" in args.stages:
+        ast.parse_args(shlex.split(args.ast_args))  # reject bad AST options before the report runs
+    return args
+
+
+async def main() -> int:
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    if args.resume:
+        run_dir = _latest_run_dir() if args.resume == "latest" else PIPELINE_DIR / args.resume
+        manifest = Manifest.load(run_dir)
+        print(f"[INFO] Resuming pipeline run {run_dir.name}")
+    else:
+        run_dir = PIPELINE_DIR / datetime.now().strftime("%Y%m%d-%H%M%S")
+        manifest = Manifest(run_dir)
+    manifest.data["stages_requested"] = args.stages
+    manifest.save()
+
+    started = time.perf_counter()
+    pipeline = Pipeline(args, manifest)
+    await pipeline.run(args.stages)
+    wall_seconds = time.perf_counter() - started
+    manifest.data["wall_seconds"] = round(wall_seconds, 3)
+    manifest.save()
+    print_timings(manifest, wall_seconds)
+
+    failed = [n for n, s in manifest.data["stages"].items() if s.get("status") == "failed"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
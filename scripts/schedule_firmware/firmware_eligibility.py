@@ -0,0 +1,392 @@
+"""Predict firmware eligibility from the cleaned EP report before the portal is asked.
+
+    python scripts\\schedule_firmware\\firmware_eligibility.py build [--report PATH] [--output PATH]
+    python scripts\\schedule_firmware\\firmware_eligibility.py compare [--predictions PATH]
+
+``build`` reads ``REPORT_OUTPUT_XLSX`` and applies the rules in
+``FIRMWARE_ELIGIBILITY_RULES`` (JSON)::
+
+    {
+      "columns": {"serial": "Serial Number", "product_code": "Product Code",
+                  "state": "State", "opco": "OpCo", "firmware": "Firmware Version"},
+      "opco": ["FXAU"],
+      "state": ["VIC", "NSW"],
+      "product_codes": ["TC*"],
+      "target_firmware": {"TC101307": "2.14.0", "TC1016*": "3.1"},
+      "require_target": false
+    }
+
+Columns are header names or letters. A device is eligible when it passes the
+OpCo/state/product-code filters and its firmware is below the target of the
+first matching ``target_firmware`` pattern; devices with no target (or an
+unreadable version) are kept unless ``require_target`` is true. Eligible rows
+are written as scheduler input (serial, product_code, state, opco) and every
+row, with its reason, goes to ``<output>_predictions.csv``.
+
+With the rules set, ``run_schedule`` (the replay script and the pipeline's
+firmware stage) also drops rows the report predicts ineligible; the pipeline
+predicts from each OpCo's cleaned table as it arrives. An ``opco`` or
+``state`` filter needs its column, or every row would be filtered out.
+``compare`` joins the predictions with the scheduler's output CSVs and prints
+the predicted versus actual eligibility rate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import fnmatch
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from xlsx_reader import Cell, XlsxSheet, resolve_columns  # noqa: E402
+
+load_dotenv()
+
+
+def _env_path(var_name: str, default: str) -> Optional[Path]:
+    raw_value = os.getenv(var_name, default).strip()
+    if not raw_value:
+        return None
+    return Path(raw_value.replace("\\", "/")).expanduser()
+
+
+RULES_PATH = _env_path("FIRMWARE_ELIGIBILITY_RULES", "")
+REPORT_PATH = _env_path("REPORT_OUTPUT_XLSX", "data/EPFirmwareReport.xlsx")
+ELIGIBLE_OUTPUT = _env_path("FIRMWARE_ELIGIBLE_CSV", "data/ep_firmware/firmware_eligible.csv")
+DEFAULT_COLUMNS = {"serial": "Serial Number", "product_code": "Product Code"}
+WORK_FIELDS = ["serial", "product_code", "state", "opco"]
+PREDICTION_FIELDS = [*WORK_FIELDS, "firmware", "target", "eligible", "reason"]
+INELIGIBLE_PHRASE = "does not meet the firmware upgrade criteria"
+PENDING_PHRASE = "pending fwud request exists"
+
+
+def version_key(text: str) -> Optional[Tuple[int, ...]]:
+    """Numeric parts of a firmware version ("2.14.0" -> (2, 14, 0)), or None."""
+    parts = re.findall(r"\d+", text or "")
+    return tuple(int(p) for p in parts) if parts else None
+
+
+@dataclass
+class Rules:
+    columns: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_COLUMNS))
+    opco: List[str] = field(default_factory=list)
+    state: List[str] = field(default_factory=list)
+    product_codes: List[str] = field(default_factory=list)
+    target_firmware: Dict[str, str] = field(default_factory=dict)
+    require_target: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "Rules":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        rules = cls(
+            columns={**DEFAULT_COLUMNS, **data.get("columns", {})},
+            opco=[v.upper() for v in data.get("opco", [])],
+            state=[v.upper() for v in data.get("state", [])],
+            product_codes=[v.upper() for v in data.get("product_codes", [])],
+            target_firmware={k.upper(): str(v) for k, v in data.get("target_firmware", {}).items()},
+            require_target=bool(data.get("require_target", False)),
+        )
+        if rules.target_firmware and "firmware" not in rules.columns:
+            raise ValueError(f"{path}: target_firmware needs a 'firmware' entry in columns")
+        for name in ("opco", "state"):
+            if getattr(rules, name) and name not in rules.columns:
+                raise ValueError(f"{path}: the {name} filter needs a '{name}' entry in columns")
+        return rules
+
+    def target_for(self, product_code: str) -> str:
+        code = product_code.upper()
+        if code in self.target_firmware:
+            return self.target_firmware[code]
+        for pattern, target in self.target_firmware.items():
+            if fnmatch.fnmatchcase(code, pattern):
+                return target
+        return ""
+
+    def predict(self, row: Dict[str, str]) -> Tuple[bool, str, str]:
+        """``(eligible, target, reason)`` for one report row."""
+        if not row["serial"] or not row["product_code"]:
+            return False, "", "missing serial/product"
+        if self.opco and row["opco"].upper() not in self.opco:
+            return False, "", "opco filtered"
+        if self.state and row["state"].upper() not in self.state:
+            return False, "", "state filtered"
+        code = row["product_code"].upper()
+        if self.product_codes and not any(fnmatch.fnmatchcase(code, p) for p in self.product_codes):
+            return False, "", "product code filtered"
+        target = self.target_for(code)
+        if not target:
+            if self.require_target:
+                return False, "", "no target firmware"
+            return True, "", "no target firmware"
+        current = version_key(row.get("firmware", ""))
+        wanted = version_key(target)
+        if current is None or wanted is None:
+            return True, target, "unknown version"
+        if current < wanted:
+            return True, target, "below target"
+        return False, target, "at or above target"
+
+
+@dataclass
+class Prediction:
+    rows: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def eligible(self) -> List[Dict[str, str]]:
+        return [row for row in self.rows if row["eligible"] == "yes"]
+
+    def by_serial(self) -> Dict[str, Dict[str, str]]:
+        return {row["serial"].upper(): row for row in self.rows}
+
+    def summary(self) -> str:
+        total = len(self.rows)
+        eligible = len(self.eligible)
+        rate = eligible / total if total else 0.0
+        return f"report_rows={total} predicted_eligible={eligible} ({rate:.1%})"
+
+
+def _predict_values(
+    rules: Rules, fields: Sequence[str], values: Sequence[Cell], opco: str = ""
+) -> Dict[str, str]:
+    row = {name: "" for name in ("state", "opco", "firmware")}
+    row["opco"] = opco
+    row.update(
+        (name, "" if value is None else str(value).strip()) for name, value in zip(fields, values)
+    )
+    row["state"] = row["state"].upper()
+    eligible, target, reason = rules.predict(row)
+    row.update(target=target, eligible="yes" if eligible else "no", reason=reason)
+    return row
+
+
+def _resolve_fields(rules: Rules, fields: Sequence[str], headers: Sequence[str]) -> List[int]:
+    """0-based columns for ``fields``; a filtered field's column must be in ``headers``."""
+    positions = resolve_columns(headers, [rules.columns[f] for f in fields])
+    for name, position in zip(fields, positions):
+        if name in ("opco", "state") and getattr(rules, name) and position >= len(headers):
+            raise ValueError(
+                f"The {name} filter's column {rules.columns[name]!r} is not in the report"
+            )
+    return positions
+
+
+def predict_report(path: Path, rules: Rules) -> Prediction:
+    """Apply ``rules`` to every data row of the cleaned report workbook."""
+    fields = list(rules.columns)
+    prediction = Prediction()
+    with XlsxSheet(path) as sheet:
+        positions = _resolve_fields(rules, fields, sheet.headers)
+        for values in sheet.iter_rows([p + 1 for p in positions], min_row=2):
+            prediction.rows.append(_predict_values(rules, fields, values))
+    return prediction
+
+
+def predict_table(
+    headers: Sequence[str], rows: Iterable[Sequence[str]], rules: Rules, opco: str = ""
+) -> Prediction:
+    """``predict_report`` for an in-memory cleaned table; ``opco`` replaces the OpCo column."""
+    fields = [name for name in rules.columns if not (opco and name == "opco")]
+    positions = _resolve_fields(rules, fields, headers)
+    prediction = Prediction()
+    for cells in rows:
+        values = [cells[p] if p < len(cells) else None for p in positions]
+        prediction.rows.append(_predict_values(rules, fields, values, opco))
+    return prediction
+
+
+def predictions_path(output: Path) -> Path:
+    return output.with_name(f"{output.stem}_predictions.csv")
+
+
+def write_prediction(prediction: Prediction, output: Path) -> Path:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=WORK_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(prediction.eligible)
+    details = predictions_path(output)
+    with details.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=PREDICTION_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(prediction.rows)
+    return details
+
+
+class EligibilityFilter:
+    """Row-at-a-time input filter; rows absent from the predictions are kept.
+
+    Predictions can be added while rows stream in (the pipeline adds each
+    OpCo's table before its rows reach the scheduler).
+    """
+
+    def __init__(self, prediction: Optional[Prediction] = None) -> None:
+        self.known: Dict[str, Dict[str, str]] = {}
+        self.dropped = 0
+        self.unknown = 0
+        if prediction is not None:
+            self.add(prediction)
+
+    def add(self, prediction: Prediction) -> None:
+        self.known.update(prediction.by_serial())
+
+    def check(self, row: dict) -> bool:
+        """True unless the report predicts ``row`` ineligible."""
+        hit = self.known.get(row.get("serial", "").upper())
+        if hit is None:
+            self.unknown += 1
+        elif hit["eligible"] != "yes":
+            self.dropped += 1
+            return False
+        return True
+
+    def summary(self) -> str:
+        return (
+            f"Dropped {self.dropped} row(s) predicted ineligible; "
+            f"{self.unknown} row(s) not in the report kept"
+        )
+
+
+def load_rules() -> Optional[Rules]:
+    """``FIRMWARE_ELIGIBILITY_RULES``, or None when it is not set."""
+    return Rules.load(RULES_PATH) if RULES_PATH is not None else None
+
+
+def load_filter() -> Optional[EligibilityFilter]:
+    """Input filter from ``REPORT_OUTPUT_XLSX``, or None without rules/report."""
+    rules = load_rules()
+    if rules is None:
+        return None
+    if REPORT_PATH is None or not REPORT_PATH.exists():
+        print(f"[WARN] Eligibility rules set but report not found: {REPORT_PATH}")
+        return None
+    prediction = predict_report(REPORT_PATH, rules)
+    print(f"[ELIGIBILITY] {prediction.summary()} from {REPORT_PATH}")
+    return EligibilityFilter(prediction)
+
+
+def filter_rows(rows: Iterable[dict], prediction: Prediction) -> Tuple[List[dict], int, int]:
+    """``(kept, dropped, unknown)``; rows absent from the report are kept."""
+    checker = EligibilityFilter(prediction)
+    kept = [row for row in rows if checker.check(row)]
+    return kept, checker.dropped, checker.unknown
+
+
+def actual_outcome(row: dict) -> str:
+    """"eligible", "ineligible" or "" (unknown) from one scheduler output row."""
+    search = (row.get("status_text_search") or "").lower()
+    if INELIGIBLE_PHRASE in search:
+        return "ineligible"
+    if (row.get("scheduled_date") or "").strip() or PENDING_PHRASE in search:
+        return "eligible"
+    return ""
+
+
+def compare(predictions: Path, outputs: Iterable[Path]) -> Dict[str, int]:
+    """Count predicted vs actual outcomes; the latest output row per serial wins."""
+    with predictions.open(newline="", encoding="utf-8") as handle:
+        predicted = {row["serial"].upper(): row["eligible"] for row in csv.DictReader(handle)}
+    actual: Dict[str, str] = {}
+    for path in sorted(outputs, key=lambda p: p.stat().st_mtime):
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            for row in csv.DictReader(handle):
+                outcome = actual_outcome(row)
+                if outcome:
+                    actual[(row.get("serial") or "").upper()] = outcome
+    counts = {
+        "predicted": len(predicted),
+        "predicted_eligible": sum(1 for v in predicted.values() if v == "yes"),
+        "checked": 0,
+        "actual_eligible": 0,
+        "true_eligible": 0,
+        "false_eligible": 0,
+        "missed_eligible": 0,
+    }
+    for serial, outcome in actual.items():
+        guess = predicted.get(serial)
+        if guess is None:
+            continue
+        counts["checked"] += 1
+        if outcome == "eligible":
+            counts["actual_eligible"] += 1
+            counts["true_eligible" if guess == "yes" else "missed_eligible"] += 1
+        elif guess == "yes":
+            counts["false_eligible"] += 1
+    return counts
+
+
+def print_comparison(counts: Dict[str, int]) -> None:
+    def rate(part: int, whole: int) -> str:
+        return f"{part / whole:.1%}" if whole else "-"
+
+    checked = counts["checked"]
+    predicted = counts["predicted_eligible"]
+    print(f"Predicted eligible: {predicted}/{counts['predicted']} ({rate(predicted, counts['predicted'])})")
+    print(f"Checked by the portal: {checked}")
+    print(f"Actual eligible: {counts['actual_eligible']}/{checked} ({rate(counts['actual_eligible'], checked)})")
+    print(f"Predicted eligible and confirmed: {counts['true_eligible']}")
+    print(f"Predicted eligible but rejected: {counts['false_eligible']}")
+    print(f"Predicted ineligible but eligible: {counts['missed_eligible']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Firmware eligibility from the cleaned EP report.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write scheduler input for the devices predicted eligible.")
+    build.add_argument("--report", type=Path, default=REPORT_PATH, help="Cleaned report (REPORT_OUTPUT_XLSX).")
+    build.add_argument("--rules", type=Path, default=RULES_PATH, help="Rules JSON (FIRMWARE_ELIGIBILITY_RULES).")
+    build.add_argument("--output", type=Path, default=ELIGIBLE_OUTPUT, help="Scheduler input CSV to write.")
+    check = sub.add_parser("compare", help="Predicted vs actual eligibility from scheduler outputs.")
+    check.add_argument(
+        "--predictions",
+        type=Path,
+        default=predictions_path(ELIGIBLE_OUTPUT) if ELIGIBLE_OUTPUT else None,
+        help="Predictions CSV written by build.",
+    )
+    check.add_argument(
+        "--outputs",
+        type=Path,
+        nargs="*",
+        help="Scheduler output CSVs (default: FIRMWARE_OUTPUT_CSV and its timestamped copies).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.command == "build":
+        if args.rules is None or args.report is None or args.output is None:
+            print("[ERROR] --rules, --report and --output (or their env vars) are required")
+            return 2
+        prediction = predict_report(args.report, Rules.load(args.rules))
+        details = write_prediction(prediction, args.output)
+        print(f"[ELIGIBILITY] {prediction.summary()}")
+        print(f"[OK] Scheduler input: {args.output}")
+        print(f"[OK] Predictions: {details}")
+        return 0
+
+    if args.predictions is None or not args.predictions.exists():
+        print(f"[ERROR] Predictions not found: {args.predictions}")
+        return 2
+    outputs = args.outputs
+    if not outputs:
+        out_path = _env_path("FIRMWARE_OUTPUT_CSV", "data/firmware_schedule_out.csv")
+        assert out_path is not None
+        outputs = sorted(out_path.parent.glob(f"{out_path.stem}*.csv"))
+    print_comparison(compare(args.predictions, outputs))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""Pre-flight check of the firmware scheduler input, run before any browser starts.
+
+    python scripts\\schedule_firmware\\firmware_preflight.py [--input PATH] [--keep-duplicates] [--drop-invalid]
+
+Rows missing a serial or product code are dropped (the portal cannot search
+them). Repeated OpCo/serial/product rows are reported and, by default,
+dropped. States without a timezone mapping (they would silently fall back to
+``+11:00``) and product codes that do not match
+``FIRMWARE_PRODUCT_CODE_PATTERN`` are flagged and only dropped with
+``--drop-invalid``. Kept rows are sorted by OpCo, state, product code and
+serial, written to ``FIRMWARE_PREFLIGHT_OUTPUT``, and every flagged row goes
+to ``FIRMWARE_PREFLIGHT_ISSUES`` with its issue. The replay script runs the
+same check on its input unless ``FIRMWARE_PREFLIGHT=false`` and removes the
+dropped rows from a CSV input, so later runs do not pick them up again;
+``run_schedule`` checks streamed rows (the pipeline) one by one with
+``RowChecker``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Collection, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+
+load_dotenv()
+
+
+def _env_path(var_name: str, default: str) -> Optional[Path]:
+    raw_value = os.getenv(var_name, default).strip()
+    if not raw_value:
+        return None
+    return Path(raw_value.replace("\\", "/")).expanduser()
+
+
+def _env_flag(var_name: str, default: str) -> bool:
+    return os.getenv(var_name, default).lower() in {"1", "true", "yes"}
+
+
+PREFLIGHT_ENABLED = _env_flag("FIRMWARE_PREFLIGHT", "true")
+DROP_DUPLICATES = _env_flag("FIRMWARE_DROP_DUPLICATES", "true")
+DROP_INVALID = _env_flag("FIRMWARE_DROP_INVALID", "false")
+PRODUCT_CODE_PATTERN = os.getenv("FIRMWARE_PRODUCT_CODE_PATTERN", r"[A-Z]{2}\d{6}")
+PREFLIGHT_OUTPUT = _env_path("FIRMWARE_PREFLIGHT_OUTPUT", "")
+PREFLIGHT_ISSUES = _env_path("FIRMWARE_PREFLIGHT_ISSUES", "")
+
+WORK_FIELDS = ["serial", "product_code", "state", "opco"]
+
+
+@dataclass
+class Preflight:
+    """Outcome of ``check_rows``: the rows to run plus every flagged row."""
+
+    total: int = 0
+    rows: List[dict] = field(default_factory=list)
+    issues: List[Tuple[str, dict]] = field(default_factory=list)
+    dropped_rows: List[dict] = field(default_factory=list)
+    missing: int = 0
+    duplicates: int = 0
+    unknown_state: int = 0
+    bad_product: int = 0
+    dropped: int = 0
+    elapsed_ms: float = 0.0
+
+    def summary(self) -> str:
+        timing = f" ({self.elapsed_ms:.0f} ms)" if self.elapsed_ms else ""
+        return (
+            f"total={self.total} kept={len(self.rows)} dropped={self.dropped} "
+            f"missing={self.missing} duplicates={self.duplicates} "
+            f"unknown_state={self.unknown_state} bad_product_code={self.bad_product}"
+            f"{timing}"
+        )
+
+
+def _sort_key(row: dict) -> str:
+    # One NUL-joined string sorts like the tuple but compares far faster.
+    return f"{row['opco']}\0{row['state']}\0{row['product_code']}\0{row['serial']}"
+
+
+class RowChecker:
+    """Row-at-a-time form of ``check_rows`` for streamed input (kept rows are not sorted).
+
+    A row can carry several issues; it is listed once per issue but counted as
+    dropped only once.
+    """
+
+    def __init__(
+        self,
+        known_states: Collection[str],
+        *,
+        product_pattern: str = PRODUCT_CODE_PATTERN,
+        drop_duplicates: bool = DROP_DUPLICATES,
+        drop_invalid: bool = DROP_INVALID,
+    ) -> None:
+        self.result = Preflight()
+        self.states = {state.upper() for state in known_states}
+        self.valid_code = re.compile(product_pattern).fullmatch
+        self.drop_duplicates = drop_duplicates
+        self.drop_invalid = drop_invalid
+        self.seen: set = set()
+
+    def _drop(self, row: dict) -> bool:
+        self.result.dropped += 1
+        self.result.dropped_rows.append(row)
+        return False
+
+    def check(self, row: dict) -> bool:
+        """Record ``row``'s issues; True when it should be run."""
+        result = self.result
+        issues = result.issues
+        result.total += 1
+        serial = row["serial"]
+        product = row["product_code"]
+        if not serial or not product:
+            result.missing += 1
+            issues.append(("missing serial/product", row))
+            return self._drop(row)
+        key = (row["opco"].upper(), serial.upper(), product.upper())
+        if key in self.seen:
+            result.duplicates += 1
+            issues.append(("duplicate", row))
+            if self.drop_duplicates:
+                return self._drop(row)
+        self.seen.add(key)
+        invalid = False
+        if row["state"] not in self.states:
+            result.unknown_state += 1
+            issues.append(("unknown state", row))
+            invalid = True
+        if not self.valid_code(product):
+            result.bad_product += 1
+            issues.append(("malformed product code", row))
+            invalid = True
+        if invalid and self.drop_invalid:
+            return self._drop(row)
+        result.rows.append(row)
+        return True
+
+
+def check_rows(
+    rows: Iterable[dict],
+    known_states: Collection[str],
+    *,
+    product_pattern: str = PRODUCT_CODE_PATTERN,
+    drop_duplicates: bool = DROP_DUPLICATES,
+    drop_invalid: bool = DROP_INVALID,
+) -> Preflight:
+    """Validate normalised work rows (``normalize_row`` output) and sort the keepers."""
+    started = time.perf_counter()
+    checker = RowChecker(
+        known_states,
+        product_pattern=product_pattern,
+        drop_duplicates=drop_duplicates,
+        drop_invalid=drop_invalid,
+    )
+    check = checker.check
+    for row in rows:
+        check(row)
+    result = checker.result
+    result.rows.sort(key=_sort_key)
+    result.elapsed_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+def default_paths(input_path: Path) -> Tuple[Path, Path]:
+    """Work file and issue report paths, next to the input unless set in the env."""
+    output = PREFLIGHT_OUTPUT or input_path.with_name(f"{input_path.stem}_preflight.csv")
+    report = PREFLIGHT_ISSUES or input_path.with_name(f"{input_path.stem}_preflight_issues.csv")
+    return output, report
+
+
+def write_issues(result: Preflight, report: Path) -> None:
+    report.parent.mkdir(parents=True, exist_ok=True)
+    with report.open("w", newline="", encoding="utf-8") as handle:
+        issue_writer = csv.writer(handle)
+        issue_writer.writerow(["issue", *WORK_FIELDS])
+        for issue, row in result.issues:
+            issue_writer.writerow([issue, *(row.get(name, "") for name in WORK_FIELDS)])
+
+
+def write_results(result: Preflight, output: Path, report: Path) -> None:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", newline="", encoding="utf-8") as handle:
+        work_writer = csv.DictWriter(handle, fieldnames=WORK_FIELDS, extrasaction="ignore")
+        work_writer.writeheader()
+        work_writer.writerows(result.rows)
+    write_issues(result, report)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate and de-duplicate firmware scheduler input.")
+    parser.add_argument("--input", type=Path, help="Input CSV/XLSX (default: FIRMWARE_INPUT_XLSX).")
+    parser.add_argument("--output", type=Path, help="Cleaned work file (default: <input>_preflight.csv).")
+    parser.add_argument("--issues", type=Path, help="Issue report (default: <input>_preflight_issues.csv).")
+    parser.add_argument(
+        "--keep-duplicates",
+        action="store_true",
+        help="Report repeated rows but keep them (default: drop; FIRMWARE_DROP_DUPLICATES).",
+    )
+    parser.add_argument(
+        "--drop-invalid",
+        action="store_true",
+        help="Also drop unknown states and malformed product codes (FIRMWARE_DROP_INVALID).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import firmware_webforms_replay_playwright as replay
+
+    args = parse_args(argv)
+    input_path = args.input or replay.INPUT_PATH
+    result = check_rows(
+        replay.read_rows(input_path),
+        replay.STATE_TZ,
+        drop_duplicates=DROP_DUPLICATES and not args.keep_duplicates,
+        drop_invalid=DROP_INVALID or args.drop_invalid,
+    )
+    output, report = default_paths(input_path)
+    output = args.output or output
+    report = args.issues or report
+    write_results(result, output, report)
+    print(f"[PREFLIGHT] {result.summary()}")
+    print(f"[OK] Work file: {output}")
+    print(f"[OK] Issues: {report}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,14 +6,29 @@ import csv
 import os
 import random
 import shutil
+import sys
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Union
 
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv  # type: ignore[import-untyped]
 from playwright.async_api import async_playwright, Error as PWError  # type: ignore
 
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from playwright_launch import connect_or_launch  # noqa: E402
+from tracing import get_tracer, percentile  # noqa: E402
+from diagnostics import Diagnostics  # noqa: E402
+from xlsx_reader import XlsxSheet  # noqa: E402
+import firmware_preflight as preflight  # noqa: E402
+from schedule_index import ScheduleIndex, load_index  # noqa: E402
+import firmware_eligibility as eligibility  # noqa: E402
+
 load_dotenv()
 
 # ---------- Constants & Env ----------
@@ -28,6 +43,8 @@ BROWSER_CHANNEL = os.getenv("FIRMWARE_BROWSER_CHANNEL", "msedge") or None
 ALLOWLIST = os.getenv("FIRMWARE_AUTH_ALLOWLIST", "*.fujixerox.net,*.xerox.com")
 HEADLESS = os.getenv("FIRMWARE_HEADLESS", "true").lower() in {"1", "true", "yes"}
 DEBUG_TZ = os.getenv("FIRMWARE_DEBUG_TZ", "0").lower() in {"1", "true", "yes"}
+WARMUP = os.getenv("FIRMWARE_WARMUP", "true").lower() in {"1", "true", "yes"}
+WARMUP_URL = os.getenv("FIRMWARE_WARMUP_URL", "").strip() or URL
 
 
 def _time_choices() -> List[str]:
@@ -45,6 +62,8 @@ TIME_VALUE_CHOICES = _time_choices()
 DAYS_MIN = int(os.getenv("FIRMWARE_DAYS_MIN", "3"))
 DAYS_MAX = int(os.getenv("FIRMWARE_DAYS_MAX", "6"))
 CONCURRENCY = max(1, int(os.getenv("FIRMWARE_CONCURRENCY", "10")))
+TRACER = get_tracer("firmware")
+DIAGNOSTICS = Diagnostics("firmware")
 
 
 # ---------- Helpers for bookkeeping ----------
@@ -58,48 +77,62 @@ def _rows_match(candidate: dict, target: dict) -> bool:
 
 
 def _remove_row_from_csv_sync(path: Path, item: dict) -> bool:
+    return _remove_rows_from_csv_sync(path, [item]) > 0
+
+
+def _remove_rows_from_csv_sync(path: Path, items: Iterable[dict]) -> int:
+    """Drop one input row per item (matched on the normalised work fields); returns rows removed."""
     if not path.exists():
-        return False
+        return 0
     with path.open("r", newline="", encoding="utf-8-sig") as handle:
         reader = csv.DictReader(handle)
         fieldnames = reader.fieldnames or []
         rows = list(reader)
 
     if not fieldnames:
-        return False
-
-    target = {
-        "serial": item.get("serial", ""),
-        "product_code": item.get("product_code", ""),
-        "state": item.get("state", ""),
-        "opco": item.get("opco", "") or DEFAULT_OPCO,
-    }
+        return 0
+
+    pending = Counter(
+        (
+            item.get("serial", ""),
+            item.get("product_code", ""),
+            item.get("state", ""),
+            item.get("opco", "") or DEFAULT_OPCO,
+        )
+        for item in items
+    )
 
+    # Match from the end so the first copy of a duplicate, the one that runs, stays.
     remaining: list[dict] = []
-    removed = False
-    for row in rows:
+    removed = 0
+    for row in reversed(rows):
         norm = normalize_row(row)
-        if not removed and _rows_match(norm, target):
-            removed = True
+        key = (norm["serial"], norm["product_code"], norm["state"], norm["opco"])
+        if pending[key] > 0:
+            pending[key] -= 1
+            removed += 1
             continue
         remaining.append(row)
+    remaining.reverse()
 
     if not removed:
-        return False
+        return 0
 
     with path.open("w", newline="", encoding="utf-8") as handle:
         writer = csv.DictWriter(handle, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(remaining)
 
-    return True
+    return removed
 
 
-async def remove_row_from_input_csv(item: dict, lock: asyncio.Lock) -> None:
-    if INPUT_PATH.suffix.lower() != ".csv":
+async def remove_row_from_input_csv(
+    item: dict, lock: asyncio.Lock, input_path: Optional[Path] = INPUT_PATH
+) -> None:
+    if input_path is None or input_path.suffix.lower() != ".csv":
         return
     async with lock:
-        await asyncio.to_thread(_remove_row_from_csv_sync, INPUT_PATH, item)
+        await asyncio.to_thread(_remove_row_from_csv_sync, input_path, item)
 
 
 def _apply_run_completion_sync(
@@ -144,6 +177,15 @@ SKIP_PHRASES = [
 
 
 # ---------- CSV input ----------
+# Accepted (lower-case) input headers for each work-row field.
+FIELD_ALIASES = {
+    "serial": ("serial", "serialnumber", "serial_number"),
+    "product_code": ("product_code", "product", "productcode"),
+    "state": ("state", "region"),
+    "opco": ("opco", "opcoid", "opco_id"),
+}
+
+
 def normalize_row(raw: dict) -> dict:
     lower = {
         (k or "").strip().lower(): "" if v is None else str(v).strip()
@@ -157,10 +199,10 @@ def normalize_row(raw: dict) -> dict:
         return ""
 
     return {
-        "serial": get("serial", "serialnumber", "serial_number"),
-        "product_code": get("product_code", "product", "productcode"),
-        "state": get("state", "region").upper(),
-        "opco": get("opco", "opcoid", "opco_id") or DEFAULT_OPCO,
+        "serial": get(*FIELD_ALIASES["serial"]),
+        "product_code": get(*FIELD_ALIASES["product_code"]),
+        "state": get(*FIELD_ALIASES["state"]).upper(),
+        "opco": get(*FIELD_ALIASES["opco"]) or DEFAULT_OPCO,
     }
 
 
@@ -175,33 +217,82 @@ def read_rows(path: Path) -> Iterable[dict]:
         return
 
     if path.suffix.lower() in {".xlsx", ".xlsm"}:
-        try:
-            from openpyxl import load_workbook  # type: ignore
-        except Exception as exc:
-            raise RuntimeError("openpyxl is required for .xlsx files") from exc
-
-        wb = load_workbook(path, read_only=True)
-        try:
-            ws = wb.active
-            if ws is None:
-                raise RuntimeError(f"No active worksheet in workbook: {path}")
-            header_cells = next(ws.iter_rows(min_row=1, max_row=1))
-            headers = [
-                "" if c.value is None else str(c.value).strip() for c in header_cells
+        known = {alias for aliases in FIELD_ALIASES.values() for alias in aliases}
+        with XlsxSheet(path) as sheet:
+            # Only the columns normalize_row can use are read from each row.
+            wanted = [
+                (i + 1, header)
+                for i, header in enumerate(sheet.headers)
+                if header.lower() in known
             ]
-            for cells in ws.iter_rows(min_row=2, values_only=True):
-                row = {
-                    (headers[i] or f"col{i}"): ("" if v is None else str(v).strip())
-                    for i, v in enumerate(cells)
-                }
-                yield normalize_row(row)
-        finally:
-            wb.close()
+            names = [header for _, header in wanted]
+            for cells in sheet.iter_rows([col for col, _ in wanted], min_row=2):
+                yield normalize_row(dict(zip(names, cells)))
         return
 
     raise ValueError(f"Unsupported input type: {path.suffix}")
 
 
+class FirstRequestStats:
+    """First portal navigation of each fresh worker context.
+
+    Compare a run with ``FIRMWARE_WARMUP=false`` against one with it on; the
+    warm-up navigation itself is the cold-handshake sample.
+    """
+
+    def __init__(self) -> None:
+        self.samples: List[float] = []
+        self.warmup_ms: Optional[float] = None
+
+    def add(self, ms: float) -> None:
+        self.samples.append(ms)
+
+    def summary(self) -> str:
+        values = sorted(self.samples)
+        warm = "off" if self.warmup_ms is None else f"{self.warmup_ms:.0f} ms"
+        if not values:
+            return f"warm-up={warm} first_requests=0"
+        return (
+            f"warm-up={warm} first_requests={len(values)} "
+            f"p50={percentile(values, 50):.0f} ms p95={percentile(values, 95):.0f} ms "
+            f"max={values[-1]:.0f} ms"
+        )
+
+
+FIRST_REQUESTS = FirstRequestStats()
+
+
+async def warm_up_auth(browser, storage_state_path: Optional[Path]) -> Optional[Dict[str, Any]]:
+    """Authenticate once and return the session as an in-memory storage state.
+
+    One context completes the integrated-auth (NTLM/Negotiate) handshake on
+    ``FIRMWARE_WARMUP_URL``; its cookies then seed every worker context. On
+    failure the workers fall back to ``storage_state_path``.
+    """
+    context_kwargs: Dict[str, Any] = {}
+    if storage_state_path is not None:
+        context_kwargs["storage_state"] = str(storage_state_path)
+    context = await browser.new_context(**context_kwargs)
+    try:
+        page = await context.new_page()
+        started = time.perf_counter()
+        with TRACER.span("warmup", url=WARMUP_URL):
+            await page.goto(WARMUP_URL, wait_until="domcontentloaded", timeout=45_000)
+        FIRST_REQUESTS.warmup_ms = (time.perf_counter() - started) * 1000
+        state = await context.storage_state()
+    except Exception as exc:  # noqa: BLE001 - warm-up is an optimisation only
+        print(f"[WARN] Warm-up navigation to {WARMUP_URL} failed ({exc}); using stored state")
+        return None
+    finally:
+        with contextlib.suppress(Exception):
+            await context.close()
+    print(
+        f"[INFO] Warm-up authenticated in {FIRST_REQUESTS.warmup_ms:.0f} ms; "
+        f"seeding workers with {len(state.get('cookies', []))} cookie(s)"
+    )
+    return state
+
+
 # ---------- Helpers ----------
 def pick_schedule_date() -> str:
     start = datetime.now().date() + timedelta(days=DAYS_MIN)
@@ -286,8 +377,11 @@ async def _race_and_cancel(*aws, timeout: float | None = None):
 
 
 # ---------- DOM actions ----------
-async def fill_search_fields(page, opco: str, product_code: str, serial: str) -> None:
+async def fill_search_fields(page, opco: str, product_code: str, serial: str) -> float:
+    """Open the form and fill the search fields; returns the navigation time in ms."""
+    started = time.perf_counter()
     await page.goto(URL, wait_until="domcontentloaded")
+    goto_ms = (time.perf_counter() - started) * 1000
     await page.evaluate(
         """
         ({opco, product, serial}) => {
@@ -305,6 +399,7 @@ async def fill_search_fields(page, opco: str, product_code: str, serial: str) ->
         """,
         {"opco": opco, "product": product_code, "serial": serial},
     )
+    return goto_ms
 
 
 async def click_search(page) -> None:
@@ -459,14 +554,16 @@ async def wait_after_schedule(page) -> str:
 async def process_one_device(
     browser,
     item: dict,
-    storage_state_path: Path | None,
+    storage_state: Union[Path, Dict[str, Any], None],
     writer,
     writer_lock: asyncio.Lock,
     input_lock: asyncio.Lock,
     run_started_at: str,
     *,
     retries: int = 2,
-):
+    input_path: Optional[Path] = INPUT_PATH,
+) -> str:
+    """Search and schedule one device; returns the outcome recorded on its trace span."""
     opco = item.get("opco") or DEFAULT_OPCO
     serial = item.get("serial", "")
     product = item.get("product_code", "")
@@ -490,25 +587,34 @@ async def process_one_device(
                     "run_completed_at": "",
                 }
             )
-        await remove_row_from_input_csv(item, input_lock)
-        return
+        await remove_row_from_input_csv(item, input_lock, input_path)
+        return "missing"
 
     context_kwargs: Dict[str, Any] = {}
-    if storage_state_path and storage_state_path.exists():
-        context_kwargs["storage_state"] = str(storage_state_path)
+    if isinstance(storage_state, dict):
+        context_kwargs["storage_state"] = storage_state
+    elif storage_state and storage_state.exists():
+        context_kwargs["storage_state"] = str(storage_state)
 
+    outcome = "failed"
     for attempt in range(retries + 1):
         context = await browser.new_context(**context_kwargs)
         page = await context.new_page()
         page.set_default_navigation_timeout(45_000)
         page.set_default_timeout(45_000)
+        recorder = DIAGNOSTICS.recorder(page, f"{serial}#{attempt}")
+        recorder.begin(serial)
+        trace = await DIAGNOSTICS.trace(context, f"firmware_{serial}", chunk_rows=1)
+        failure: Exception | None = None
 
         try:
             # SEARCH (DOM click flow)
-            await fill_search_fields(page, opco, product, serial)
-            await click_search(page)
-            status_s = await wait_after_search(page)
+            with TRACER.span("search", row=serial, attempt=attempt):
+                FIRST_REQUESTS.add(await fill_search_fields(page, opco, product, serial))
+                await click_search(page)
+                status_s = await wait_after_search(page)
             code_s = 200
+            await recorder.step("searched")
 
             # Skip conditions
             if any(p in (status_s or "").lower() for p in SKIP_PHRASES):
@@ -531,6 +637,7 @@ async def process_one_device(
                         }
                     )
                 print(f"[SKIP] {serial}/{product} -> {status_s}")
+                outcome = "skipped"
                 break  # done
 
             # Check if controls exist; if not, record and finish
@@ -569,10 +676,12 @@ async def process_one_device(
                 print(
                     f"[SEARCH] {serial}/{product} -> {status_s or '(no message)'} (no schedule controls)"
                 )
+                outcome = "no-controls"
                 break  # done
 
             # SCHEDULE
             await wait_for_schedule_controls(page)
+            await recorder.step("schedule-controls")
 
             date_iso = pick_schedule_date()
             time_val = random.choice(TIME_VALUE_CHOICES)
@@ -619,10 +728,12 @@ async def process_one_device(
             if DEBUG_TZ:
                 await debug_dump_timezone(page)
 
-            await fill_schedule_fields(page, date_iso, time_val, actual_tz_val)
-            await click_schedule(page)
-            status_c = await wait_after_schedule(page)
+            with TRACER.span("schedule", row=serial, attempt=attempt):
+                await fill_schedule_fields(page, date_iso, time_val, actual_tz_val)
+                await click_schedule(page)
+                status_c = await wait_after_schedule(page)
             code_c = 200
+            await recorder.step("scheduled")
 
             async with writer_lock:
                 writer.writerow(
@@ -645,9 +756,14 @@ async def process_one_device(
             print(
                 f"[DONE] {serial}/{product} -> {status_s or '(no search msg)'} | {status_c or '(no sched msg)'}"
             )
+            outcome = "scheduled"
             break  # success; no retry
 
         except Exception as e:
+            # Capture diagnostics while the failing page is still open.
+            failure = e
+            saved = await recorder.finish(e)
+            await trace.row_done(serial, saved is not None)
             if attempt < retries:
                 print(f"[RETRY {attempt + 1}] {serial}/{product}: {e}")
                 with contextlib.suppress(Exception):
@@ -678,21 +794,63 @@ async def process_one_device(
                     )
                 break
         finally:
+            if failure is None:
+                saved = await recorder.finish()
+                await trace.row_done(serial, saved is not None)
+            await trace.stop()
             with contextlib.suppress(Exception):
                 await page.close()
             with contextlib.suppress(Exception):
                 await context.close()
 
-    await remove_row_from_input_csv(item, input_lock)
+    await remove_row_from_input_csv(item, input_lock, input_path)
+    return outcome
 
 
 # ---------- Main (concurrent) ----------
-async def main() -> None:
+FIELDNAMES = [
+    "serial",
+    "product_code",
+    "state",
+    "opco",
+    "http_status_search",
+    "status_text_search",
+    "http_status_schedule",
+    "status_text_schedule",
+    "scheduled_date",
+    "scheduled_time",
+    "timezone_value",
+    "run_started_at",
+    "run_completed_at",
+]
+
+
+async def run_schedule(
+    rows: Union[Iterable[dict], AsyncIterable[dict]],
+    *,
+    out_path: Path = OUTPUT_PATH,
+    input_path: Optional[Path] = INPUT_PATH,
+    index: Optional[ScheduleIndex] = None,
+    check_input: bool = preflight.PREFLIGHT_ENABLED,
+    eligible: Optional[eligibility.EligibilityFilter] = None,
+) -> int:
+    """Schedule every row and return how many were processed.
+
+    ``rows`` may be an async iterable, in which case devices start as soon as
+    they arrive (the pipeline streams them per OpCo while the report is still
+    downloading). ``input_path=None`` leaves the source file untouched. With
+    ``check_input`` each row passes the pre-flight checks as it arrives; rows
+    they drop are removed from the input without a portal request. Rows the
+    report predicts ineligible are skipped (``eligible``, by default loaded
+    from ``REPORT_OUTPUT_XLSX`` when ``FIRMWARE_ELIGIBILITY_RULES`` is set). Devices
+    with a recent or pending request in ``index`` are recorded as skipped
+    without opening a page and leave the input like processed rows; the index
+    is updated from this run's output.
+    """
     run_started_dt = datetime.now().astimezone()
     run_started_at = run_started_dt.isoformat(timespec="seconds")
     run_token = run_started_dt.strftime("%Y%m%d-%H%M%S")
 
-    out_path = OUTPUT_PATH
     timestamped_out_path = out_path.with_name(f"{out_path.stem}_{run_token}.csv")
     out_path.parent.mkdir(parents=True, exist_ok=True)
     browser_args = [
@@ -700,34 +858,24 @@ async def main() -> None:
         f"--auth-negotiate-delegate-allowlist={ALLOWLIST}",
     ]
 
-    rows = list(read_rows(INPUT_PATH))
-    if not rows:
-        print(f"No rows found in {INPUT_PATH}")
-        return
-
     print(f"Running with concurrency={CONCURRENCY}")
 
     writer_lock = asyncio.Lock()
     input_lock = asyncio.Lock()
-    fieldnames = [
-        "serial",
-        "product_code",
-        "state",
-        "opco",
-        "http_status_search",
-        "status_text_search",
-        "http_status_schedule",
-        "status_text_schedule",
-        "scheduled_date",
-        "scheduled_time",
-        "timezone_value",
-        "run_started_at",
-        "run_completed_at",
-    ]
+    fieldnames = list(FIELDNAMES)
+    tasks: List[asyncio.Task] = []
+    cleanup: List[asyncio.Task] = []
+    checker = preflight.RowChecker(STATE_TZ) if check_input else None
+    if eligible is None:
+        eligible = await asyncio.to_thread(eligibility.load_filter)
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=HEADLESS, channel=BROWSER_CHANNEL, args=browser_args
+        browser = await connect_or_launch(
+            p,
+            headless=HEADLESS,
+            channel=BROWSER_CHANNEL,
+            args=browser_args,
+            label="firmware_replay",
         )
 
         # open the CSV once; write rows as they finish
@@ -736,21 +884,67 @@ async def main() -> None:
             writer.writeheader()
 
             sem = asyncio.Semaphore(CONCURRENCY)
-            storage_state = STORAGE_STATE_PATH if STORAGE_STATE_PATH.exists() else None
+            stored_state = STORAGE_STATE_PATH if STORAGE_STATE_PATH.exists() else None
+            storage_state: Union[Path, Dict[str, Any], None] = stored_state
+            if WARMUP:
+                storage_state = await warm_up_auth(browser, stored_state) or stored_state
 
             async def runner(item: dict):
+                if index is not None and (entry := index.recent(item)) is not None:
+                    index.avoided += 1
+                    seen = entry.get("scheduled_date") or entry.get("recorded_at", "")[:10]
+                    async with writer_lock:
+                        writer.writerow(
+                            {
+                                "serial": item.get("serial", ""),
+                                "product_code": item.get("product_code", ""),
+                                "state": item.get("state", ""),
+                                "opco": item.get("opco") or DEFAULT_OPCO,
+                                "http_status_search": 0,
+                                "status_text_search": f"SKIPPED: {entry['kind']} request on {seen} (schedule index)",
+                                "http_status_schedule": 0,
+                                "status_text_schedule": "",
+                                "scheduled_date": "",
+                                "scheduled_time": "",
+                                "timezone_value": "",
+                                "run_started_at": run_started_at,
+                                "run_completed_at": "",
+                            }
+                        )
+                    # Handled like any finished row, so the next run does not meet it again.
+                    await remove_row_from_input_csv(item, input_lock, input_path)
+                    return
                 async with sem:
-                    await process_one_device(
-                        browser,
-                        item,
-                        storage_state,
-                        writer,
-                        writer_lock,
-                        input_lock,
-                        run_started_at,
+                    with TRACER.span(
+                        "row", row=item.get("serial", ""), opco=item.get("opco", "")
+                    ) as span:
+                        span.outcome = await process_one_device(
+                            browser,
+                            item,
+                            storage_state,
+                            writer,
+                            writer_lock,
+                            input_lock,
+                            run_started_at,
+                            input_path=input_path,
+                        )
+
+            def admitted(item: dict) -> bool:
+                if checker is not None and not checker.check(item):
+                    cleanup.append(
+                        asyncio.create_task(remove_row_from_input_csv(item, input_lock, input_path))
                     )
-
-            await asyncio.gather(*(runner(item) for item in rows))
+                    return False
+                # Predicted-ineligible rows stay in the input: the next report may differ.
+                return eligible is None or eligible.check(item)
+
+            if isinstance(rows, AsyncIterable):
+                async for item in rows:
+                    if admitted(item):
+                        tasks.append(asyncio.create_task(runner(item)))
+            else:
+                tasks.extend(asyncio.create_task(runner(item)) for item in rows if admitted(item))
+            await asyncio.gather(*tasks, *cleanup)
 
         with contextlib.suppress(Exception):
             await browser.close()
@@ -760,9 +954,58 @@ async def main() -> None:
         _apply_run_completion_sync, out_path, fieldnames, run_finished_at
     )
     shutil.copy2(out_path, timestamped_out_path)
+    if index is not None:
+        added = await asyncio.to_thread(index.ingest, timestamped_out_path)
+        await asyncio.to_thread(index.save)
+        print(
+            f"[INDEX] Avoided {index.avoided} search(es) for recently requested devices; "
+            f"indexed {added} new request(s)"
+        )
 
+    if checker is not None:
+        print(f"[PREFLIGHT] {checker.result.summary()}")
+        if checker.result.issues:
+            # Not named <out_path.stem>*.csv, which the schedule index reads as outputs.
+            report = preflight.PREFLIGHT_ISSUES or out_path.with_name(
+                f"preflight_issues_{out_path.stem}.csv"
+            )
+            await asyncio.to_thread(preflight.write_issues, checker.result, report)
+            print(f"[PREFLIGHT] {len(checker.result.issues)} issue(s) listed in {report}")
+    if eligible is not None:
+        print(f"[ELIGIBILITY] {eligible.summary()}")
+    print(f"[INFO] First-request latency: {FIRST_REQUESTS.summary()}")
     print(f"Done. Wrote: {out_path}")
     print(f"Archived copy: {timestamped_out_path}")
+    return len(tasks)
+
+
+async def main() -> None:
+    rows = list(read_rows(INPUT_PATH))
+    if not rows:
+        print(f"No rows found in {INPUT_PATH}")
+        return
+    if preflight.PREFLIGHT_ENABLED:
+        checked = preflight.check_rows(rows, STATE_TZ)
+        work_path, issues_path = preflight.default_paths(INPUT_PATH)
+        await asyncio.to_thread(preflight.write_results, checked, work_path, issues_path)
+        print(f"[PREFLIGHT] {checked.summary()}")
+        if checked.issues:
+            print(f"[PREFLIGHT] {len(checked.issues)} issue(s) listed in {issues_path}")
+        if checked.dropped_rows and INPUT_PATH.suffix.lower() == ".csv":
+            # Processed rows leave the input one by one; dropped ones must go too
+            # or the next run would schedule them again.
+            removed = await asyncio.to_thread(
+                _remove_rows_from_csv_sync, INPUT_PATH, checked.dropped_rows
+            )
+            print(f"[PREFLIGHT] Removed {removed} dropped row(s) from {INPUT_PATH}")
+        rows = checked.rows
+        if not rows:
+            print("No rows left to schedule after pre-flight checks")
+            return
+    index = load_index(OUTPUT_PATH)
+    await run_schedule(
+        rows, out_path=OUTPUT_PATH, input_path=INPUT_PATH, index=index, check_input=False
+    )
 
 
 if __name__ == "__main__":
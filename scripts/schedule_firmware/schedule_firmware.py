@@ -4,6 +4,7 @@ import asyncio
 import csv
 import os
 import random
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, Iterable, Tuple, List
@@ -12,6 +13,13 @@ from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright, Error as PWError  # type: ignore
 from dotenv import load_dotenv  # type: ignore[import-untyped]
 
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from playwright_launch import connect_or_launch  # noqa: E402
+from xlsx_reader import XlsxSheet  # noqa: E402
+
 load_dotenv()
 
 # ---------- Constants ----------
@@ -61,6 +69,15 @@ STATE_TZ = {
 
 
 # ---------- Input helpers ----------
+# Accepted (lower-case) input headers for each work-row field.
+FIELD_ALIASES = {
+    "serial": ("serial", "serialnumber", "serial_number"),
+    "product_code": ("product_code", "product", "productcode"),
+    "state": ("state", "region"),
+    "opco": ("opco", "opcoid", "opco_id"),
+}
+
+
 def normalize_row(raw: dict) -> dict:
     lower = {
         (k or "").strip().lower(): "" if v is None else str(v).strip()
@@ -74,10 +91,10 @@ def normalize_row(raw: dict) -> dict:
         return ""
 
     return {
-        "serial": get("serial", "serialnumber", "serial_number"),
-        "product_code": get("product_code", "product", "productcode"),
-        "state": get("state", "region").upper(),
-        "opco": get("opco", "opcoid", "opco_id") or DEFAULT_OPCO,
+        "serial": get(*FIELD_ALIASES["serial"]),
+        "product_code": get(*FIELD_ALIASES["product_code"]),
+        "state": get(*FIELD_ALIASES["state"]).upper(),
+        "opco": get(*FIELD_ALIASES["opco"]) or DEFAULT_OPCO,
     }
 
 
@@ -92,28 +109,17 @@ def read_rows(path: Path) -> Iterable[dict]:
         return
 
     if path.suffix.lower() in {".xlsx", ".xlsm"}:
-        try:
-            from openpyxl import load_workbook  # type: ignore
-        except Exception as exc:
-            raise RuntimeError("openpyxl is required for .xlsx files") from exc
-
-        wb = load_workbook(path, read_only=True)
-        try:
-            ws = wb.active
-            if ws is None:
-                raise RuntimeError(f"No active worksheet in workbook: {path}")
-            header_cells = next(ws.iter_rows(min_row=1, max_row=1))
-            headers = [
-                "" if c.value is None else str(c.value).strip() for c in header_cells
+        known = {alias for aliases in FIELD_ALIASES.values() for alias in aliases}
+        with XlsxSheet(path) as sheet:
+            # Only the columns normalize_row can use are read from each row.
+            wanted = [
+                (i + 1, header)
+                for i, header in enumerate(sheet.headers)
+                if header.lower() in known
             ]
-            for cells in ws.iter_rows(min_row=2, values_only=True):
-                row = {
-                    (headers[i] or f"col{i}"): ("" if v is None else str(v).strip())
-                    for i, v in enumerate(cells)
-                }
-                yield normalize_row(row)
-        finally:
-            wb.close()
+            names = [header for _, header in wanted]
+            for cells in sheet.iter_rows([col for col, _ in wanted], min_row=2):
+                yield normalize_row(dict(zip(names, cells)))
         return
 
     raise ValueError(f"Unsupported input type: {path.suffix}")
@@ -402,8 +408,12 @@ async def main() -> None:
     ]
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=HEADLESS, channel=BROWSER_CHANNEL, args=browser_args
+        browser = await connect_or_launch(
+            p,
+            headless=HEADLESS,
+            channel=BROWSER_CHANNEL,
+            args=browser_args,
+            label="schedule_firmware",
         )
         context_kwargs: Dict[str, Any] = {}
         if STORAGE_STATE_PATH.exists():
@@ -0,0 +1,164 @@
+"""Cross-run index of devices that already have a firmware request.
+
+Built from the scheduler's output CSVs (``firmware_schedule_out*.csv`` next to
+``FIRMWARE_OUTPUT_CSV``) and kept in ``FIRMWARE_SCHEDULE_INDEX``. A device is
+recorded when the portal confirmed a schedule (the schedule status matches
+``FIRMWARE_SCHEDULED_PATTERN``), or when it answered that a pending FWUD
+request exists. The replay script skips a device before any portal
+traffic while its scheduled date has not passed, or while its last record is
+younger than ``FIRMWARE_RESCHEDULE_DAYS``.
+
+Output files are re-read only when their size or modification time changes.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from dotenv import load_dotenv  # type: ignore[import-untyped]
+
+load_dotenv()
+
+
+def _env_path(var_name: str, default: str) -> Optional[Path]:
+    raw_value = os.getenv(var_name, default).strip()
+    if not raw_value:
+        return None
+    return Path(raw_value.replace("\\", "/")).expanduser()
+
+
+INDEX_PATH = _env_path("FIRMWARE_SCHEDULE_INDEX", "data/ep_firmware/schedule_index.json")
+RESCHEDULE_DAYS = float(os.getenv("FIRMWARE_RESCHEDULE_DAYS", "14"))
+PENDING_PHRASE = "pending fwud request exists"
+# The portal's confirmation after a schedule; "unsuccessful" does not match.
+SCHEDULED_PATTERN = re.compile(
+    os.getenv("FIRMWARE_SCHEDULED_PATTERN") or r"\bsuccess(?:ful(?:ly)?)?\b", re.IGNORECASE
+)
+
+
+def device_key(row: dict) -> str:
+    return "|".join(
+        (row.get(name, "") or "").strip().upper() for name in ("opco", "serial", "product_code")
+    )
+
+
+def _parse_time(text: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def _record_from_output(row: dict, fallback: datetime) -> Optional[dict]:
+    """Index record for one output row, or None if it shows no firmware request."""
+    search = (row.get("status_text_search") or "").lower()
+    scheduled_date = (row.get("scheduled_date") or "").strip()
+    schedule_status = row.get("status_text_schedule") or ""
+    if scheduled_date and SCHEDULED_PATTERN.search(schedule_status):
+        kind = "scheduled"
+    elif PENDING_PHRASE in search:
+        kind = "pending"
+    else:
+        return None
+    recorded = _parse_time(row.get("run_started_at") or "") or fallback
+    return {
+        "kind": kind,
+        "serial": row.get("serial", ""),
+        "product_code": row.get("product_code", ""),
+        "opco": row.get("opco", ""),
+        "scheduled_date": scheduled_date,
+        "scheduled_time": row.get("scheduled_time", ""),
+        "timezone_value": row.get("timezone_value", ""),
+        "recorded_at": recorded.isoformat(timespec="seconds"),
+    }
+
+
+class ScheduleIndex:
+    """Latest firmware request per OpCo/serial/product, persisted as JSON."""
+
+    def __init__(self, path: Path, *, reschedule_days: float = RESCHEDULE_DAYS) -> None:
+        self.path = path
+        self.reschedule_days = reschedule_days
+        self.entries: Dict[str, dict] = {}
+        self.files: Dict[str, list] = {}
+        self.avoided = 0
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                self.entries = data.get("entries", {})
+                self.files = data.get("files", {})
+            except (ValueError, AttributeError):
+                print(f"[WARN] Ignoring unreadable schedule index {path}")
+
+    def ingest(self, path: Path) -> int:
+        """Add the requests recorded in one output CSV; returns rows indexed."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return 0
+        stamp = [stat.st_size, stat.st_mtime]
+        if self.files.get(str(path)) == stamp:
+            return 0
+        fallback = datetime.fromtimestamp(stat.st_mtime).astimezone()
+        added = 0
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            for row in csv.DictReader(handle):
+                record = _record_from_output(row, fallback)
+                if record is None:
+                    continue
+                key = device_key(row)
+                current = self.entries.get(key)
+                previous = _parse_time(current["recorded_at"]) if current else None
+                recorded = _parse_time(record["recorded_at"])
+                if previous is None or (recorded is not None and previous <= recorded):
+                    self.entries[key] = record
+                    added += 1
+        self.files[str(path)] = stamp
+        return added
+
+    def ingest_outputs(self, out_path: Path) -> int:
+        """Ingest ``out_path`` and its timestamped copies."""
+        paths = sorted(out_path.parent.glob(f"{out_path.stem}*.csv"))
+        return sum(self.ingest(path) for path in paths)
+
+    def recent(self, row: dict, now: Optional[datetime] = None) -> Optional[dict]:
+        """The device's record if it should not be requested again yet."""
+        entry = self.entries.get(device_key(row))
+        if entry is None:
+            return None
+        now = now or datetime.now().astimezone()
+        if entry.get("scheduled_date"):
+            try:
+                if date.fromisoformat(entry["scheduled_date"]) >= now.date():
+                    return entry
+            except ValueError:
+                pass
+        recorded = _parse_time(entry.get("recorded_at", ""))
+        if recorded is not None and now - recorded < timedelta(days=self.reschedule_days):
+            return entry
+        return None
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"entries": self.entries, "files": self.files}), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def load_index(out_path: Path) -> Optional[ScheduleIndex]:
+    """Index refreshed from the output CSVs, or None when FIRMWARE_SCHEDULE_INDEX is empty."""
+    if INDEX_PATH is None:
+        return None
+    index = ScheduleIndex(INDEX_PATH)
+    added = index.ingest_outputs(out_path)
+    if added:
+        index.save()
+    print(f"[INDEX] {len(index.entries)} device(s) with a recent or pending request ({added} new)")
+    return index
@@ -0,0 +1,15 @@
+"""Make the root helpers and the script modules importable the way the scripts import them."""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+for path in (
+    ROOT_DIR,
+    ROOT_DIR / "benchmarks",
+    ROOT_DIR / "scripts" / "ast_toner",
+    ROOT_DIR / "scripts" / "ep_report",
+    ROOT_DIR / "scripts" / "schedule_firmware",
+):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,368 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+import fetch_ast_toner as ast
+import rdhc_http
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+GRID_PANEL = """
+<div>
+  <table>
+    <tr><th>Toner (Black)</th><th>Toner Cyan</th><th>Drum (K)</th><th>Waste Toner</th>
+        <th>Last Updated</th><th>Status</th></tr>
+    <tr><td>45 %</td><td>12%</td><td>80%</td><td>90%</td>
+        <td>2025-01-30 10:00</td><td>Online</td></tr>
+  </table>
+</div>
+"""
+
+LABEL_PANEL = """
+<table>
+  <tr><td>Black Toner Level:</td><td>5%</td></tr>
+  <tr><td>Magenta toner</td><td><span>33</span><span>%</span></td></tr>
+  <tr><td>Yellow Drum</td><td>70%</td></tr>
+  <tr><td>K</td><td>99%</td></tr>
+  <tr><td>Details</td><td><table><tr><td>Toner Yellow</td><td>50%</td></tr></table></td></tr>
+</table>
+"""
+
+
+def test_extract_panel_reads_grid_tables():
+    out = rdhc_http.extract_panel(GRID_PANEL, "<span>Done</span>")
+
+    assert out["toner"] == {"black": 45.0, "cyan": 12.0}
+    assert out["timestamp"] == "2025-01-30 10:00"
+    assert out["status"] == "Done"
+
+
+def test_extract_panel_ignores_drum_waste_and_bare_letters():
+    out = rdhc_http.extract_panel(LABEL_PANEL)
+
+    # The nested table is read on its own; its rows are not folded into the outer one.
+    assert out["toner"] == {"black": 5.0, "magenta": 33.0, "yellow": 50.0}
+
+
+def test_extract_panel_without_panel_is_empty():
+    out = rdhc_http.extract_panel("")
+
+    assert out == {"text": "", "status": "", "toner": {}, "timestamp": ""}
+
+
+def test_panel_fields_types_levels_and_flags():
+    fields = ast.panel_fields(
+        {
+            "text": "Toner Black 5%",
+            "status": "Invalid serial",
+            "toner": {"black": 5, "cyan": None, "yellow": 60.5},
+            "timestamp": "2025-01-30",
+        }
+    )
+
+    assert fields["TonerBlackPct"] == "5"
+    assert fields["TonerCyanPct"] == ""
+    assert fields["TonerYellowPct"] == "60.5"
+    assert fields["LowToner"] == "true"
+    assert fields["HasError"] == "true"
+    assert fields["NoData"] == "false"
+    assert fields["ReadingTimestamp"] == "2025-01-30"
+
+
+def test_panel_fields_no_data():
+    fields = ast.panel_fields({"text": "No record found", "toner": {}})
+
+    assert fields["NoData"] == "true"
+    assert fields["LowToner"] == "false"
+    assert fields["TonerBlackPct"] == ""
+
+
+def _session(body):
+    import httpx
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+    client = httpx.AsyncClient(transport=transport)
+    return client, rdhc_http.RdhcFormSession(client, "https://rdhc.example/RDHC.aspx")
+
+
+def test_form_session_loads_the_saved_rdhc_page():
+    client, session = _session((ROOT_DIR / "RDHC.html").read_text(encoding="utf-8"))
+
+    asyncio.run(session.load())
+    asyncio.run(client.aclose())
+
+    assert session.names["submit"] == "ctl00$MainContent$btnSubmit"
+    assert session.submit_panel == "ctl00$MainContent$searchForm"
+    assert "__VIEWSTATE" in session.fields
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        ("<html><body>Sign in</body></html>", "No form"),
+        ('<form action="x"><input type="hidden" name="__VIEWSTATE" value="1"></form>', "__EVENTVALIDATION"),
+    ],
+)
+def test_form_session_rejects_unusable_pages(body, message):
+    client, session = _session(body)
+
+    with pytest.raises(rdhc_http.RdhcHttpError, match=message):
+        asyncio.run(session.load())
+    asyncio.run(client.aclose())
+
+
+def _family_index(**kwargs):
+    from family_index import FamilyIndex, load_product_family_map
+
+    return FamilyIndex(load_product_family_map(ROOT_DIR / "RDHC.html"), **kwargs)
+
+
+@pytest.mark.parametrize("family", ["Gyokusan4", "Herakles4", "Monolith4", "Marble5", "Luffy3", "Botan3"])
+def test_family_index_does_not_map_other_generations(family):
+    index = _family_index()
+
+    assert index.resolve(family) is None
+    assert index.suggestions(family) == []
+
+
+def test_family_index_suggests_near_misses_and_aliases_pin_them(tmp_path):
+    index = _family_index(aliases={"Gyokusan 4": "Gyokusan3"})
+
+    assert index.resolve("gyokusan-3") == "Gyokusan3"
+    assert index.resolve("Gyokusn3") is None
+    assert index.suggestions("Gyokusn3") == ["Gyokusan3"]
+    assert index.resolve("Gyokusan 4") == "Gyokusan3"
+
+    index.note_unresolved("Gyokusn3", "SN1")
+    report = tmp_path / "unresolved.csv"
+    index.write_unresolved_report(report)
+    assert report.read_text(encoding="utf-8").splitlines()[1] == "Gyokusn3,1,SN1,Gyokusan3"
+
+
+def test_family_index_never_resolves_the_placeholder():
+    index = _family_index(aliases={"Unknown": "Select"})
+
+    assert index.resolve("Select") is None
+    assert index.resolve("Unknown") is None
+
+
+NOW = datetime(2025, 1, 30, 12, 0, tzinfo=timezone.utc)
+ROW = ast.InputRow(serial_number="SN1", product_code="TC101307", product_family="Gyokusan3")
+
+
+def _reading(serial="SN1", hours_ago=0.0, **panel):
+    fetched = NOW - timedelta(hours=hours_ago)
+    return {
+        "SerialNumber": serial,
+        **ast.panel_fields(panel),
+        "Source": "fresh",
+        "FetchedAt": fetched.isoformat(timespec="seconds"),
+        "LookupMs": "900",
+    }
+
+
+def _cache(tmp_path):
+    return ast.TonerCache(
+        tmp_path / "cache.json", max_age_hours=168, low_max_age_hours=24, low_threshold_pct=20
+    )
+
+
+def test_toner_cache_serves_fresh_readings_and_retries_low_ones_sooner(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store(_reading(hours_ago=100, text="Toner", toner={"black": 60}))
+    cache.store(_reading("SN2", hours_ago=30, text="Toner", toner={"black": 60, "cyan": 15}))
+    cache.store(_reading("SN3", hours_ago=200, text="Toner", toner={"black": 60}))
+
+    hit = cache.lookup(ROW, NOW)
+    assert hit is not None
+    assert (hit["Source"], hit["ReadingAgeHours"], hit["TonerBlackPct"]) == ("cached", "100.0", "60")
+    assert hit["LookupMs"] == ""
+    assert cache.lookup(ast.InputRow("SN2", "", ""), NOW) is None  # low toner: 24 h
+    assert cache.lookup(ast.InputRow("SN3", "", ""), NOW) is None  # older than 168 h
+
+    cache.save()
+    assert _cache(tmp_path).lookup(ROW, NOW) is not None
+
+
+@pytest.mark.parametrize(
+    "panel",
+    [
+        {"text": "No record found", "toner": {}},
+        {"text": "Search", "status": "Invalid serial", "toner": {}},
+        {"text": "Toner Black 40%", "status": "Error reading device", "toner": {"black": 40}},
+    ],
+)
+def test_toner_cache_skips_results_without_a_reading(tmp_path, panel):
+    cache = _cache(tmp_path)
+
+    cache.store(_reading(**panel))
+    cache.store(ast._error_result(ROW, RuntimeError("timeout")))
+
+    assert cache.entries == {}
+
+
+def test_toner_cache_retries_entries_stored_without_a_level(tmp_path):
+    cache = _cache(tmp_path)
+    cache.entries["SN1"] = {"fetched_at": NOW.isoformat(), "lowest_pct": None, "result": {}}
+
+    assert cache.lookup(ROW, NOW) is None
+
+
+def _families():
+    from family_index import FamilyIndex
+
+    return FamilyIndex({"gyokusan3": "Gyokusan3", "monolith": "Monolith", "select": "Select"})
+
+
+def test_plan_rows_counts_each_reason_a_row_is_not_fetched(tmp_path):
+    rows = [
+        ast.InputRow("SN1", "TC101307", "Gyokusan3", state="VIC"),
+        ast.InputRow("SN1", "TC101307", "Gyokusan3", state="VIC"),  # duplicate
+        ast.InputRow("SN2", "TC101307", "Gyokusan4", state="VIC"),  # unknown family
+        ast.InputRow("SN3", "TC101307", "Monolith", state="NSW"),  # filtered by state
+        ast.InputRow("SN4", "DC200000", "Monolith", state="vic"),  # filtered by code
+        ast.InputRow("SN5", "TC101307", "Monolith", state="VIC"),  # resumed
+        ast.InputRow("SN6", "TC101307", "Monolith", state="VIC"),  # cached
+        ast.InputRow("SN7", "TC101399", "Monolith", state="VIC"),
+    ]
+    cache = _cache(tmp_path)
+    cache.store(_reading("SN6", hours_ago=1, text="Toner", toner={"black": 70}))
+    families = _families()
+
+    plan = ast.plan_rows(
+        rows,
+        families,
+        code_filter=["tc*"],
+        state_filter=["vic"],
+        done={"SN5"},
+        cache=cache,
+        now=NOW,
+    )
+
+    assert (plan.total, plan.duplicates, plan.unresolved, plan.filtered, plan.resumed) == (8, 1, 1, 2, 1)
+    assert [row.serial_number for row in plan.rows] == ["SN1", "SN6", "SN7"]
+    assert list(plan.cached) == [1] and plan.live == [0, 2]
+    assert families.unresolved == {"Gyokusan4": 1}
+    assert "to_fetch=2" in plan.summary()
+
+
+def test_plan_rows_family_filter_uses_resolved_names():
+    rows = [ast.InputRow("SN1", "TC1", "gyokusan-3"), ast.InputRow("SN2", "TC1", "Monolith")]
+
+    plan = ast.plan_rows(rows, _families(), family_filter=["Gyokusan 3"])
+
+    assert [row.serial_number for row in plan.rows] == ["SN1"]
+    assert plan.filtered == 1
+
+
+def test_state_filter_needs_a_state_column(monkeypatch, capsys):
+    monkeypatch.setattr(ast, "STATE_COLUMN", "")
+    with pytest.raises(SystemExit):
+        ast.parse_args(["--state", "VIC"])
+    assert "--state needs STATE_COLUMN" in capsys.readouterr().err
+
+    monkeypatch.setattr(ast, "STATE_COLUMN", "State")
+    assert ast.parse_args(["--state", "VIC"]).state == ["VIC"]
+
+
+def _read_serials(path):
+    import csv
+
+    with path.open(newline="", encoding="utf-8") as handle:
+        return [row["SerialNumber"] for row in csv.DictReader(handle)]
+
+
+def test_result_writer_writes_on_arrival_and_sorts_on_close(tmp_path):
+    path = tmp_path / "out.csv"
+    writer = ast.OrderedResultWriter(path, ["SerialNumber"], flush_every=1)
+
+    writer.submit(2, {"SerialNumber": "C"})
+    writer.submit(1, None)  # deferred or skipped row: no output, no gap to wait on
+    writer.submit(0, {"SerialNumber": "A"})
+    assert _read_serials(path) == ["C", "A"]  # already on disk before close
+
+    writer.close()
+    assert _read_serials(path) == ["A", "C"]
+    assert writer.written == 2
+    assert not path.with_name("out.csv.tmp").exists()
+
+
+def test_result_writer_keeps_resumed_rows_first(tmp_path):
+    path = tmp_path / "out.csv"
+    path.write_text("SerialNumber\nOLD\n", encoding="utf-8")
+    writer = ast.OrderedResultWriter(path, ["SerialNumber"], append=True)
+
+    writer.submit(1, {"SerialNumber": "B"})
+    writer.submit(0, {"SerialNumber": "A"})
+    writer.close()
+
+    assert _read_serials(path) == ["OLD", "A", "B"]
+
+
+def test_family_order_results_come_back_in_input_order(tmp_path):
+    rows = [
+        ast.InputRow("SN1", "TC1", "Gyokusan3"),
+        ast.InputRow("SN2", "TC1", "Monolith"),
+        ast.InputRow("SN3", "TC1", "Unknown"),
+        ast.InputRow("SN4", "TC1", "gyokusan 3"),
+        ast.InputRow("SN5", "TC1", "Monolith"),
+    ]
+
+    order = ast.order_by_family(rows, _families())
+    assert [rows[i].serial_number for i in order] == ["SN1", "SN4", "SN2", "SN5", "SN3"]
+
+    path = tmp_path / "out.csv"
+    writer = ast.OrderedResultWriter(path, ["SerialNumber"])
+    for i in order:
+        writer.submit(i, {"SerialNumber": rows[i].serial_number})
+    writer.close()
+    assert _read_serials(path) == ["SN1", "SN2", "SN3", "SN4", "SN5"]
+
+
+def _partial_run(tmp_path, **marker):
+    input_path = tmp_path / "input.xlsx"
+    input_path.write_bytes(b"report")
+    output = tmp_path / "out.csv"
+    writer = ast.OrderedResultWriter(output, ast.RESULT_FIELDS)
+    writer.submit(0, {"SerialNumber": "SN1"})
+    writer.submit(1, {"SerialNumber": "SN2"})
+    writer.close()
+    ast._write_run_marker(output, {"fingerprint": ast._input_fingerprint(input_path), **marker})
+    return input_path, output
+
+
+def test_resume_reads_serials_and_drops_a_torn_last_line(tmp_path):
+    input_path, output = _partial_run(tmp_path)
+    with output.open("a", encoding="utf-8") as handle:
+        handle.write("SN3,TC1")  # crash mid-row
+
+    assert ast.load_resume_serials(output, input_path) == {"SN1", "SN2"}
+    assert output.read_text(encoding="utf-8").endswith("\n")
+
+    writer = ast.OrderedResultWriter(output, ast.RESULT_FIELDS, append=True)
+    writer.submit(0, {"SerialNumber": "SN3"})
+    writer.close()
+    assert _read_serials(output) == ["SN1", "SN2", "SN3"]
+
+
+def test_resume_starts_fresh_after_a_completed_run(tmp_path):
+    input_path, output = _partial_run(tmp_path, completed_at="2025-01-30T12:00:00+00:00")
+
+    assert ast.load_resume_serials(output, input_path) == set()
+
+
+def test_resume_starts_fresh_for_another_input(tmp_path):
+    input_path, output = _partial_run(tmp_path)
+    input_path.write_bytes(b"a newer report")
+
+    assert ast.load_resume_serials(output, input_path) == set()
+
+
+def test_resume_needs_a_marker(tmp_path):
+    input_path, output = _partial_run(tmp_path)
+    ast._run_marker_path(output).unlink()
+
+    assert ast.load_resume_serials(output, input_path) == set()
@@ -0,0 +1,44 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import browser_service
+
+
+@pytest.mark.parametrize(
+    "host, expected",
+    [("127.0.0.1", True), ("::1", True), ("localhost", True), ("0.0.0.0", False), ("10.1.2.3", False)],
+)
+def test_is_loopback(host, expected):
+    assert browser_service._is_loopback(host) is expected
+
+
+def _get(url, token=None):
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_state_requires_the_token_when_set(monkeypatch):
+    monkeypatch.setattr(browser_service, "TOKEN", "s3cret")
+    service = browser_service.BrowserService()
+    service.storage_state = {"cookies": [], "origins": []}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), browser_service._make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/state"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as denied:
+            _get(url)
+        assert denied.value.code == 401
+        with pytest.raises(urllib.error.HTTPError):
+            _get(url, token="wrong")
+        assert _get(url, token="s3cret") == {"cookies": [], "origins": []}
+    finally:
+        server.shutdown()
+        server.server_close()
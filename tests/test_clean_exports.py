@@ -0,0 +1,26 @@
+import gzip
+
+import pytest
+
+import clean_exports
+
+
+def test_uncompressed_size_reads_gzip_trailer(tmp_path):
+    payload = b"<table><tr><td>x</td></tr></table>" * 100
+    plain = tmp_path / "a.xls"
+    plain.write_bytes(payload)
+    packed = tmp_path / "a.xls.gz"
+    packed.write_bytes(gzip.compress(payload))
+
+    assert clean_exports._uncompressed_size(plain) == len(payload)
+    assert clean_exports._uncompressed_size(packed) == len(payload)
+
+
+def test_write_table_removes_temp_file_on_error(tmp_path):
+    dest = tmp_path / "out.jsonl"
+    rows = [["1", object()]]  # not JSON-serialisable
+
+    with pytest.raises(TypeError):
+        clean_exports._write_table(dest, "jsonl", ["a", "b"], rows, "Data")
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+import fetch_and_clean as fc
+
+
+def _touch(path, age_days=0.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    if age_days:
+        stamp = path.stat().st_mtime - age_days * 86400
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_prune_cache_only_removes_recognised_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(fc, "RAW_ARCHIVE_DIR", tmp_path / "raw")
+    monkeypatch.setattr(fc, "CLEAN_CACHE_DIR", tmp_path / "clean")
+    kept, pruned = "a" * 64, "b" * 64
+    _touch(tmp_path / "raw" / f"{kept}.xls.gz")
+    _touch(tmp_path / "raw" / f"{pruned}.xls.gz", age_days=200)
+    current = _touch(fc._cache_path(kept, ".xlsx"))
+    orphan = _touch(fc._cache_path(pruned, ".json.gz"))
+    stale = _touch(tmp_path / "clean" / f"{kept}-v0.xlsx")
+    in_flight = _touch(tmp_path / "clean" / f".{kept}-v{fc.CLEANER_VERSION}.xlsx.123.tmp")
+    stray = _touch(tmp_path / "clean" / "notes.txt")
+
+    removed = fc.prune_cache(keep=0, max_age_days=90)
+
+    assert removed == 3  # one raw export plus the orphan and stale outputs
+    assert current.exists() and in_flight.exists() and stray.exists()
+    assert not orphan.exists() and not stale.exists()
+
+
+SAMPLE_EXPORT = """<?xml version="1.0"?>
+<html xmlns:o="urn:schemas-microsoft-com:office:office">
+<head><xml><x:ExcelWorkbook><x:Name>DeviceList</x:Name></x:ExcelWorkbook></xml>
+<style>td { color: red }</style></head>
+<body>
+<table id="Layout"><tr><td>Menu</td></tr></table>
+<table id="MainContent_gvDeviceList" border="1">
+  <tr><td>Export</td><td>generated</td></tr>
+  <tr><th>Serial&nbsp;Number</th><th> Product <b>Code</b> </th><th>Notes</th></tr>
+  <tr><td>100001</td><td>TC101307</td><td>Site access &amp; dock<br/>rear</td></tr>
+  <tr><td> 100002 </td><td><span>TC</span><span>101308</span></td></tr>
+  <!-- a comment row --><tr></tr>
+  <tr><td>100003</td><td>TC101309</td><td>a</td><td>extra</td></tr>
+</table>
+</body></html>
+"""
+
+
+def _chunks(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_stream_parser_matches_dom_parser_on_sample(chunk_size):
+    expected = fc._extract_table(SAMPLE_EXPORT)
+
+    assert fc.extract_table_stream(_chunks(SAMPLE_EXPORT, chunk_size)) == expected
+    assert expected[0] == ["Serial Number", "Product Code", "Notes"]
+    assert expected[1][1] == ["100002", "TC 101308", ""]
+
+
+def test_stream_parser_matches_dom_parser_on_benchmark_export():
+    from fixtures import export_html
+
+    text = export_html(300)
+    assert fc.extract_table_stream(_chunks(text, 4096)) == fc._extract_table(text)
+
+
+def test_merge_opco_tables_unions_headers_and_prefixes_opco():
+    headers, rows = fc.merge_opco_tables(
+        [
+            ("FXAU", ["Serial", "Note", "Note"], [["1", "a", "b"]]),
+            ("FXNZ", ["Serial", "State", "Note"], [["2", "AKL", "c"], ["3"]]),
+        ]
+    )
+
+    # Repeated headers line up by occurrence; columns only one OpCo has stay blank elsewhere.
+    assert headers == ["OpCo", "Serial", "Note", "Note", "State"]
+    assert rows == [
+        ["FXAU", "1", "a", "b", ""],
+        ["FXNZ", "2", "c", "", "AKL"],
+        ["FXNZ", "3", "", "", ""],
+    ]
+
+
+def test_opco_summary_is_printed_when_every_export_fails(monkeypatch, capsys):
+    import asyncio
+    import contextlib
+
+    class Context:
+        async def close(self):
+            pass
+
+    @contextlib.asynccontextmanager
+    async def fake_playwright():
+        yield None
+
+    async def launch(_p):
+        return Context()
+
+    async def fail(_context, opco):
+        raise RuntimeError(f"{opco} search timed out")
+
+    monkeypatch.setattr(fc, "async_playwright", fake_playwright)
+    monkeypatch.setattr(fc, "_launch_report_context", launch)
+    monkeypatch.setattr(fc, "_export_device_list", fail)
+
+    with pytest.raises(RuntimeError, match="No OpCo exports succeeded"):
+        asyncio.run(fc.download_and_clean_opcos(["FXAU", "FXNZ"], 2))
+
+    out = capsys.readouterr().out
+    assert "ERROR: FXAU search timed out" in out
+    assert "ERROR: FXNZ search timed out" in out
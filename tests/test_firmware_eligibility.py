@@ -0,0 +1,136 @@
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+import firmware_eligibility as eligibility
+from firmware_eligibility import EligibilityFilter, Prediction, Rules
+
+RULES = Rules(
+    columns={
+        "serial": "Serial Number",
+        "product_code": "Product Code",
+        "state": "State",
+        "opco": "OpCo",
+        "firmware": "Firmware Version",
+    },
+    opco=["FXAU"],
+    state=["VIC", "NSW"],
+    product_codes=["TC*"],
+    target_firmware={"TC101307": "2.14.0", "TC1016*": "3.1"},
+)
+
+
+def _report_row(serial="1", product="TC101307", state="VIC", opco="FXAU", firmware="2.13.9"):
+    return {"serial": serial, "product_code": product, "state": state, "opco": opco, "firmware": firmware}
+
+
+def test_version_key_compares_numerically():
+    assert eligibility.version_key("2.14.0") == (2, 14, 0)
+    assert eligibility.version_key("v3.1 build 7") == (3, 1, 7)
+    assert eligibility.version_key("unknown") is None
+    assert eligibility.version_key("2.9") < eligibility.version_key("2.14")
+
+
+def test_predict_applies_filters_then_the_target():
+    def reason(**values):
+        return RULES.predict(_report_row(**values))
+
+    assert reason() == (True, "2.14.0", "below target")
+    assert reason(firmware="2.14.0") == (False, "2.14.0", "at or above target")
+    assert reason(product="TC101699", firmware="3.0.5") == (True, "3.1", "below target")
+    assert reason(firmware="") == (True, "2.14.0", "unknown version")
+    assert reason(serial="") == (False, "", "missing serial/product")
+    assert reason(opco="FXNZ") == (False, "", "opco filtered")
+    assert reason(state="QLD") == (False, "", "state filtered")
+    assert reason(product="XX101307") == (False, "", "product code filtered")
+    assert reason(product="TC999999") == (True, "", "no target firmware")
+    strict = Rules(columns=RULES.columns, target_firmware=RULES.target_firmware, require_target=True)
+    assert strict.predict(_report_row(product="TC999999")) == (False, "", "no target firmware")
+
+
+def test_rules_load_requires_a_firmware_column(tmp_path: Path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"target_firmware": {"TC1": "1.0"}}', encoding="utf-8")
+    try:
+        Rules.load(path)
+    except ValueError as exc:
+        assert "firmware" in str(exc)
+    else:
+        raise AssertionError("Rules.load accepted target_firmware without a firmware column")
+
+
+def test_predict_table_uses_the_given_opco():
+    headers = ["Serial Number", "Product Code", "State", "Firmware Version"]
+    rows = [["1", "TC101307", "vic", "2.0"], ["2", "TC101307", "VIC", "2.14.1"]]
+
+    prediction = eligibility.predict_table(headers, rows, RULES, opco="FXAU")
+
+    assert [(r["serial"], r["opco"], r["state"], r["eligible"]) for r in prediction.rows] == [
+        ("1", "FXAU", "VIC", "yes"),
+        ("2", "FXAU", "VIC", "no"),
+    ]
+
+
+def test_filter_keeps_rows_missing_from_the_report():
+    prediction = Prediction(
+        rows=[{"serial": "A1", "eligible": "yes"}, {"serial": "B2", "eligible": "no"}]
+    )
+    rows = [{"serial": "a1"}, {"serial": "b2"}, {"serial": "c3"}]
+
+    kept, dropped, unknown = eligibility.filter_rows(rows, prediction)
+
+    assert kept == [{"serial": "a1"}, {"serial": "c3"}]
+    assert (dropped, unknown) == (1, 1)
+
+
+def test_filter_uses_predictions_added_later():
+    checker = EligibilityFilter()
+    assert checker.check({"serial": "B2"})
+    checker.add(Prediction(rows=[{"serial": "B2", "eligible": "no"}]))
+    assert not checker.check({"serial": "B2"})
+    assert (checker.dropped, checker.unknown) == (1, 1)
+
+
+def test_actual_outcome_from_scheduler_output():
+    assert eligibility.actual_outcome(
+        {"status_text_search": "Device does not meet the firmware upgrade criteria"}
+    ) == "ineligible"
+    assert eligibility.actual_outcome({"scheduled_date": "2025-11-10"}) == "eligible"
+    assert eligibility.actual_outcome({"status_text_search": "A pending FWUD request exists."}) == "eligible"
+    assert eligibility.actual_outcome({"status_text_search": "Device not found"}) == ""
+
+
+def test_rules_load_requires_columns_for_opco_and_state_filters(tmp_path: Path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"state": ["VIC"]}', encoding="utf-8")
+
+    with pytest.raises(ValueError, match="state filter"):
+        Rules.load(path)
+
+
+@pytest.mark.parametrize("state_column", ["State", "Z"])
+def test_predict_table_rejects_a_missing_filter_column(state_column):
+    rules = Rules(columns={**RULES.columns, "state": state_column}, state=["VIC"])
+    headers = ["Serial Number", "Product Code", "OpCo", "Firmware Version"]
+
+    with pytest.raises(ValueError, match="State|state filter"):
+        eligibility.predict_table(headers, [["1", "TC101307", "FXAU", "2.0"]], rules)
+
+
+def test_predict_report_reads_the_configured_columns(tmp_path: Path):
+    workbook = Workbook()
+    sheet = workbook.active
+    assert sheet is not None
+    sheet.append(["Firmware Version", "OpCo", "Serial Number", "State", "Product Code"])
+    sheet.append(["2.0", "FXAU", "1", "vic", "TC101307"])
+    sheet.append(["2.0", "FXAU", "2", "QLD", "TC101307"])
+    path = tmp_path / "report.xlsx"
+    workbook.save(path)
+
+    prediction = eligibility.predict_report(path, RULES)
+
+    assert [(r["serial"], r["eligible"], r["reason"]) for r in prediction.rows] == [
+        ("1", "yes", "below target"),
+        ("2", "no", "state filtered"),
+    ]
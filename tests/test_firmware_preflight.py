@@ -0,0 +1,83 @@
+import csv
+
+import firmware_preflight as preflight
+import firmware_webforms_replay_playwright as replay
+
+STATES = ["VIC", "NSW", "QLD"]
+
+
+def _row(serial, product="TC101307", state="VIC", opco="FXAU"):
+    return {"serial": serial, "product_code": product, "state": state, "opco": opco}
+
+
+def test_check_rows_drops_missing_and_duplicates_and_sorts():
+    rows = [
+        _row("200", state="NSW"),
+        _row("100"),
+        _row(""),
+        _row("100", state="QLD"),  # same OpCo/serial/product, different state
+        _row("100", opco="fxau"),  # OpCo compared case-insensitively
+        _row("300", opco="FXNZ"),
+    ]
+
+    result = preflight.check_rows(rows, STATES)
+
+    assert [(r["opco"], r["serial"]) for r in result.rows] == [
+        ("FXAU", "200"),  # NSW sorts before VIC
+        ("FXAU", "100"),
+        ("FXNZ", "300"),
+    ]
+    assert (result.total, result.missing, result.duplicates, result.dropped) == (6, 1, 2, 3)
+    assert result.dropped_rows == [rows[2], rows[3], rows[4]]
+
+
+def test_check_rows_flags_invalid_rows_and_drops_them_only_when_asked():
+    rows = [_row("1", state="WA"), _row("2", product="TC1"), _row("3", product="X", state="")]
+
+    kept = preflight.check_rows(rows, STATES)
+    dropped = preflight.check_rows(rows, STATES, drop_invalid=True)
+
+    assert len(kept.rows) == 3
+    assert (kept.unknown_state, kept.bad_product) == (2, 2)
+    # Row 3 has two issues: listed twice, dropped once.
+    assert [issue for issue, row in kept.issues if row is rows[2]] == [
+        "unknown state",
+        "malformed product code",
+    ]
+    assert dropped.rows == [] and dropped.dropped == 3
+
+
+def test_keep_duplicates_reports_but_keeps():
+    result = preflight.check_rows([_row("1"), _row("1")], STATES, drop_duplicates=False)
+
+    assert len(result.rows) == 2
+    assert result.duplicates == 1 and result.dropped == 0
+
+
+def test_row_checker_keeps_arrival_order():
+    checker = preflight.RowChecker(STATES)
+
+    admitted = [checker.check(row) for row in (_row("2"), _row("1"), _row("2"))]
+
+    assert admitted == [True, True, False]
+    assert [r["serial"] for r in checker.result.rows] == ["2", "1"]
+
+
+def test_remove_rows_from_csv_removes_one_row_per_item(tmp_path):
+    path = tmp_path / "input.csv"
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["Serial", "Product_Code", "State", "OpCo", "Note"])
+        writer.writerow(["1", "TC101307", "vic", "FXAU", "first"])
+        writer.writerow(["1", "TC101307", "vic", "FXAU", "repeat"])
+        writer.writerow(["", "TC101307", "vic", "FXAU", "no serial"])
+        writer.writerow(["2", "TC101307", "nsw", "FXAU", "keep"])
+
+    rows = list(replay.read_rows(path))
+    result = preflight.check_rows(rows, STATES)
+    removed = replay._remove_rows_from_csv_sync(path, result.dropped_rows)
+
+    with path.open(newline="", encoding="utf-8") as handle:
+        notes = [row["Note"] for row in csv.DictReader(handle)]
+    assert removed == 2
+    assert notes == ["first", "keep"]
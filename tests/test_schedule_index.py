@@ -0,0 +1,96 @@
+import csv
+from datetime import datetime, timedelta, timezone
+
+import schedule_index
+from schedule_index import ScheduleIndex, _record_from_output
+
+FIELDS = [
+    "serial",
+    "product_code",
+    "opco",
+    "status_text_search",
+    "status_text_schedule",
+    "scheduled_date",
+    "run_started_at",
+]
+NOW = datetime(2025, 11, 3, 9, 0, tzinfo=timezone.utc)
+
+
+def _output_row(**values):
+    row = dict.fromkeys(FIELDS, "")
+    row.update(serial="123", product_code="TC101307", opco="FXAU")
+    row.update(values)
+    return row
+
+
+def test_record_needs_the_success_status_for_a_schedule():
+    def kind(**values):
+        record = _record_from_output(_output_row(**values), NOW)
+        return record and record["kind"]
+
+    assert kind(scheduled_date="2025-11-10", status_text_schedule="Firmware update scheduled successfully") == "scheduled"
+    assert kind(scheduled_date="2025-11-10", status_text_schedule="Schedule unsuccessful") is None
+    assert kind(scheduled_date="2025-11-10", status_text_schedule="") is None
+    assert kind(status_text_search="A pending FWUD request exists.") == "pending"
+    assert kind(status_text_search="Device not found") is None
+
+
+def test_record_time_falls_back_when_run_start_is_missing():
+    record = _record_from_output(_output_row(status_text_search="pending fwud request exists"), NOW)
+
+    assert record is not None
+    assert record["recorded_at"] == NOW.isoformat(timespec="seconds")
+
+
+def test_recent_keeps_future_schedules_and_young_records(tmp_path):
+    index = ScheduleIndex(tmp_path / "index.json", reschedule_days=14)
+    key = schedule_index.device_key(_output_row())
+    row = _output_row()
+
+    index.entries[key] = {"scheduled_date": "2025-11-03", "recorded_at": "2025-09-01T00:00:00+00:00"}
+    assert index.recent(row, NOW) is not None  # scheduled for today
+    index.entries[key] = {"scheduled_date": "2025-11-02", "recorded_at": "2025-09-01T00:00:00+00:00"}
+    assert index.recent(row, NOW) is None  # date passed, record old
+    index.entries[key] = {"scheduled_date": "", "recorded_at": (NOW - timedelta(days=13)).isoformat()}
+    assert index.recent(row, NOW) is not None
+    index.entries[key] = {"scheduled_date": "", "recorded_at": (NOW - timedelta(days=15)).isoformat()}
+    assert index.recent(row, NOW) is None
+    assert index.recent(_output_row(serial="other"), NOW) is None
+
+
+def _write_output(path, rows):
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_ingest_keeps_the_latest_record_and_skips_unchanged_files(tmp_path):
+    newer = tmp_path / "out_2.csv"
+    older = tmp_path / "out_1.csv"
+    _write_output(
+        newer,
+        [_output_row(status_text_search="pending fwud request exists", run_started_at="2025-11-02T08:00:00+00:00")],
+    )
+    _write_output(
+        older,
+        [
+            _output_row(
+                scheduled_date="2025-11-20",
+                status_text_schedule="Success",
+                run_started_at="2025-11-01T08:00:00+00:00",
+            )
+        ],
+    )
+    index = ScheduleIndex(tmp_path / "index.json")
+
+    assert index.ingest(newer) == 1
+    assert index.ingest(older) == 0  # older record does not replace the newer one
+    assert index.ingest(newer) == 0  # unchanged file is not re-read
+    (entry,) = index.entries.values()
+    assert entry["kind"] == "pending"
+
+    index.save()
+    reloaded = ScheduleIndex(tmp_path / "index.json")
+    assert reloaded.entries == index.entries
+    assert reloaded.ingest(newer) == 0
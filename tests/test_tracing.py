@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_writer", None)
+    yield tmp_path / "traces"
+    if tracing._writer is not None:
+        tracing._writer.close()
+
+
+def _records(trace_dir):
+    tracing._writer.close()
+    (path,) = trace_dir.glob("trace_*.jsonl")
+    return tracing.load_spans([path])
+
+
+def test_get_tracer_starts_no_writer_until_a_span_finishes(trace_dir, monkeypatch):
+    monkeypatch.setenv("TRACE_DIR", str(trace_dir))
+
+    tracer = tracing.get_tracer("report")
+
+    assert tracer.enabled
+    assert tracing._writer is None and not trace_dir.exists()
+    with tracer.span("row", row="FXAU"):
+        pass
+    assert tracing._writer is not None
+
+
+def test_disabled_tracer_writes_nothing(trace_dir, monkeypatch):
+    monkeypatch.setenv("TRACE_DIR", "")
+
+    with tracing.get_tracer("report").span("row", row="FXAU") as span:
+        span.outcome = "skipped"
+
+    assert tracing._writer is None
+
+
+def test_spans_round_trip_with_parents_outcomes_and_attrs(trace_dir):
+    tracer = tracing.Tracer("firmware", trace_dir)
+
+    with tracer.span("row", row=123, opco="FXAU") as row:
+        with tracer.span("search", row=123) as search:
+            search.outcome = "skipped"
+        with pytest.raises(ValueError):
+            with tracer.span("schedule", row=123):
+                raise ValueError("no controls")
+
+    async def task(name):
+        with tracer.span("row", row=name):
+            await asyncio.sleep(0)
+
+    async def both():
+        await asyncio.gather(task("a"), task("b"))
+
+    asyncio.run(both())
+
+    records = {(r["phase"], r["row"]): r for r in _records(trace_dir)}
+    outer = records[("row", "123")]
+    assert outer["service"] == "firmware" and outer["opco"] == "FXAU" and outer["parent"] is None
+    assert records[("search", "123")]["parent"] == row.id
+    assert records[("search", "123")]["outcome"] == "skipped"
+    schedule = records[("schedule", "123")]
+    assert (schedule["outcome"], schedule["error"], schedule["parent"]) == ("error", "no controls", row.id)
+    # Concurrent tasks do not nest under each other.
+    assert records[("row", "a")]["parent"] is None and records[("row", "b")]["parent"] is None
+    assert outer["start"] <= records[("search", "123")]["start"] <= outer["end"]
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert tracing.percentile(values, 50) == 50.0
+    assert tracing.percentile(values, 95) == 95.0
+    assert tracing.percentile(values, 100) == 100.0
+    assert tracing.percentile([7.0], 99) == 7.0
+    assert tracing.percentile([], 50) == 0.0
+
+
+def test_summarize_cli(tmp_path, capsys):
+    path = tmp_path / "trace.jsonl"
+    lines = [
+        {"service": "ast", "phase": "row", "row": "SN1", "start": 0.0, "end": 2.0, "ms": 2000, "outcome": "ok"},
+        {"service": "ast", "phase": "row", "row": "SN2", "start": 1.0, "end": 1.5, "ms": 500, "outcome": "error"},
+        {"service": "ast", "phase": "submit", "row": "SN1", "start": 0.5, "end": 1.0, "ms": 500, "parent": 1},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n", encoding="utf-8")
+
+    assert tracing.main(["summarize", str(path), "--bucket", "1"]) == 0
+
+    out = capsys.readouterr().out
+    assert "3 span(s) over 2.0s" in out
+    row_line = next(line for line in out.splitlines() if line.startswith("ast:row"))
+    assert row_line.split()[1:3] == ["2", "1"]  # count, errors
+    assert out.index("ast:SN1") < out.index("ast:SN2")  # slowest first
+    assert "peak 2" in out
@@ -0,0 +1,104 @@
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from xlsx_reader import XlsxSheet, column_index, iter_xlsx_rows, resolve_columns
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_REL_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def _write_raw_xlsx(path, sheet_data, shared=()):
+    """Minimal workbook with hand-written sheet XML (cells openpyxl would not produce)."""
+    strings = "".join(f"<si><t>{s}</t></si>" for s in shared)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "xl/workbook.xml",
+            f'<workbook {_NS} {_REL_NS}><sheets><sheet name="Data" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>',
+        )
+        archive.writestr("xl/sharedStrings.xml", f"<sst {_NS}>{strings}</sst>")
+        archive.writestr("xl/worksheets/sheet1.xml", f"<worksheet {_NS}><sheetData>{sheet_data}</sheetData></worksheet>")
+    return path
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["Serial", "ID", "Product Family", "Count", "Ratio", "Active"])
+    ws.append(["100001", "x1", "ApeosPort", 3, 0.5, True])
+    ws.append([None, None, None, None, None, None])
+    ws.append(["100002", None, "DocuCentre", 7, None, False])
+    ws["H5"] = "far"
+    other = wb.create_sheet("Other")
+    other.append(["only"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_column_index():
+    assert [column_index(c) for c in ("A", "z", "AA", "XFD")] == [1, 26, 27, 16384]
+
+
+def test_resolve_columns_prefers_headers_over_letters():
+    headers = ["Serial", "ID", "AB"]
+
+    assert resolve_columns(headers, ["id", "AB", "C", 1, "  serial "]) == [1, 2, 2, 0, 0]
+    with pytest.raises(ValueError):
+        resolve_columns(headers, ["Not A Column"])
+
+
+def test_iter_rows_values_match_openpyxl_types(workbook):
+    with XlsxSheet(workbook) as sheet:
+        assert sheet.headers == ["Serial", "ID", "Product Family", "Count", "Ratio", "Active"]
+        rows = list(sheet.iter_rows(min_row=2))
+
+    # The blank row 3 is skipped by default; row 5 runs to its last cell (H).
+    assert rows == [
+        ("100001", "x1", "ApeosPort", 3, 0.5, True),
+        ("100002", None, "DocuCentre", 7, None, False),
+        (None,) * 7 + ("far",),
+    ]
+
+
+def test_iter_rows_projects_columns_by_header_letter_and_number(workbook):
+    with XlsxSheet(workbook) as sheet:
+        rows = list(sheet.iter_rows(["Product Family", "A", 4, "ID"], min_row=2))
+
+    assert rows == [("ApeosPort", "100001", 3, "x1"), ("DocuCentre", "100002", 7, None)]
+
+
+def test_iter_rows_keeps_empty_rows_when_asked(workbook):
+    rows = list(iter_xlsx_rows(workbook, ["Serial"], min_row=2, skip_empty=False))
+
+    assert rows == [("100001",), (None,), ("100002",), (None,)]
+
+
+def test_sheet_selection(workbook):
+    assert list(iter_xlsx_rows(workbook, sheet="Other")) == [("only",)]
+    assert list(iter_xlsx_rows(workbook, sheet=1)) == [("only",)]
+    with pytest.raises(ValueError):
+        XlsxSheet(workbook, sheet="Missing")
+
+
+def test_raw_cells_without_refs_inline_strings_and_errors(tmp_path):
+    path = _write_raw_xlsx(
+        tmp_path / "raw.xlsx",
+        '<row r="1"><c t="s"><v>0</v></c><c t="inlineStr"><is><t>inline</t></is></c>'
+        '<c t="e"><v>#N/A</v></c><c><v>1E3</v></c></row>'
+        '<row r="3"><c r="B3" t="s"><v>1</v></c><c t="b"><v>0</v></c></row>',
+        shared=("first", "second"),
+    )
+
+    rows = list(iter_xlsx_rows(path))
+
+    # Cells without an r attribute follow the previous cell; missing rows are not yielded.
+    assert rows == [("first", "inline", "#N/A", 1000.0), (None, "second", False)]
@@ -0,0 +1,292 @@
+"""Span tracing for the automation scripts, plus a trace summariser.
+
+Set ``TRACE_DIR`` to enable tracing. Each process then appends one JSON line
+per finished span to ``TRACE_DIR/trace_<timestamp>_<pid>.jsonl``; records are
+queued and written by a background thread so the event loop never waits on
+disk. The file and thread start with a process's first finished span, so
+process-pool workers that only import a script start neither. Usage in a
+script::
+
+    TRACER = get_tracer("firmware")
+    with TRACER.span("search", row=serial) as span:
+        ...
+        span.outcome = "skipped"
+
+Spans nest per asyncio task (``parent`` holds the enclosing span's id). A span
+that exits with an exception gets ``outcome="error"`` and the message.
+
+Summarise a trace (percentiles per phase, slowest rows, concurrency timeline)::
+
+    python tracing.py summarize downloads/traces/trace_20250130-103000_1234.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+def _env_path(var_name: str, default: str) -> Optional[Path]:
+    raw_value = os.getenv(var_name, default).strip()
+    if not raw_value:
+        return None
+    return Path(raw_value.replace("\\", "/")).expanduser()
+
+
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "trace_current_span", default=None
+)
+_span_ids = itertools.count(1)
+
+
+class _TraceWriter:
+    """Background thread appending queued records to one JSONL file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.pid = os.getpid()
+        self.queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                handle.write(json.dumps(record, default=str) + "\n")
+                if self.queue.empty():
+                    handle.flush()
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.queue.put(record)
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+
+
+class Span:
+    __slots__ = ("id", "parent", "phase", "row", "attrs", "start", "outcome", "error")
+
+    def __init__(self, phase: str, row: str, attrs: Dict[str, Any]) -> None:
+        self.id = next(_span_ids)
+        self.parent = _current_span.get()
+        self.phase = phase
+        self.row = row
+        self.attrs = attrs
+        self.start = time.time()
+        self.outcome = "ok"
+        self.error = ""
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Creates spans for one script (``service``); a no-op without ``trace_dir``."""
+
+    def __init__(self, service: str, trace_dir: Optional[Path]) -> None:
+        self.service = service
+        self.trace_dir = trace_dir
+
+    @property
+    def enabled(self) -> bool:
+        return self.trace_dir is not None
+
+    @contextlib.contextmanager
+    def span(self, phase: str, row: object = "", **attrs: Any) -> Iterator[Span]:
+        span = Span(phase, "" if row is None else str(row), attrs)
+        token = _current_span.set(span.id)
+        try:
+            yield span
+        except asyncio.CancelledError:
+            span.outcome = "cancelled"
+            raise
+        except BaseException as exc:
+            span.outcome = "error"
+            span.error = str(exc) or exc.__class__.__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            if self.trace_dir is not None:
+                end = time.time()
+                record: Dict[str, Any] = {
+                    "service": self.service,
+                    "phase": span.phase,
+                    "row": span.row,
+                    "start": round(span.start, 6),
+                    "end": round(end, 6),
+                    "ms": round((end - span.start) * 1000, 3),
+                    "outcome": span.outcome,
+                    "id": span.id,
+                    "parent": span.parent,
+                }
+                if span.error:
+                    record["error"] = span.error
+                record.update(span.attrs)
+                _shared_writer(self.trace_dir).put(record)
+
+
+_writer: Optional[_TraceWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _shared_writer(trace_dir: Path) -> _TraceWriter:
+    """The process's trace writer, started on first use (a forked child gets its own)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            _writer = _TraceWriter(trace_dir / f"trace_{stamp}_{os.getpid()}.jsonl")
+            atexit.register(_writer.close)
+            print(f"[INFO] Tracing spans to {_writer.path}")
+        return _writer
+
+
+def get_tracer(service: str) -> Tracer:
+    """Tracer for ``service``; all tracers in a process share one trace file."""
+    return Tracer(service, _env_path("TRACE_DIR", ""))
+
+
+# ---------- Summariser ----------
+def load_spans(paths: Iterable[Path]) -> List[Dict[str, Any]]:
+    """Span records from trace files; other JSON lines (old step logs) are ignored."""
+    spans: List[Dict[str, Any]] = []
+    for path in paths:
+        with path.open(encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and {"phase", "start", "end"} <= record.keys():
+                    spans.append(record)
+    return spans
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _row_spans(spans: List[Dict[str, Any]], row_phase: str) -> List[Dict[str, Any]]:
+    chosen = [s for s in spans if s["phase"] == row_phase]
+    # Traces without per-row spans fall back to every top-level span.
+    return chosen or [s for s in spans if not s.get("parent")]
+
+
+def print_phase_table(spans: List[Dict[str, Any]]) -> None:
+    by_phase: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        key = f"{span.get('service', '')}:{span['phase']}"
+        by_phase[key].append(float(span["ms"]))
+        if span.get("outcome") == "error":
+            errors[key] += 1
+    print(f"{'phase':<28} {'count':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for key in sorted(by_phase):
+        values = sorted(by_phase[key])
+        print(
+            f"{key:<28} {len(values):>7} {errors[key]:>6} {percentile(values, 50):>9.0f} "
+            f"{percentile(values, 95):>9.0f} {percentile(values, 99):>9.0f} {values[-1]:>9.0f}"
+        )
+
+
+def print_slowest_rows(spans: List[Dict[str, Any]], row_phase: str, top: int) -> None:
+    totals: Dict[str, float] = defaultdict(float)
+    outcomes: Dict[str, str] = {}
+    for span in _row_spans(spans, row_phase):
+        if not span.get("row"):
+            continue
+        key = f"{span.get('service', '')}:{span['row']}"
+        totals[key] += float(span["ms"])
+        outcomes[key] = span.get("outcome", "")
+    if not totals:
+        return
+    print(f"\nSlowest {min(top, len(totals))} row(s):")
+    for key, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {key:<40} {ms:>10.0f} ms  {outcomes[key]}")
+
+
+def print_timeline(spans: List[Dict[str, Any]], row_phase: str, bucket: float, width: int = 50) -> None:
+    """Peak number of concurrently open row spans per time bucket."""
+    rows = _row_spans(spans, row_phase)
+    if not rows:
+        return
+    origin = min(float(s["start"]) for s in rows)
+    finish = max(float(s["end"]) for s in rows)
+    if bucket <= 0:
+        bucket = max(1.0, round((finish - origin) / 30, 1))
+    events = sorted(
+        [(float(s["start"]) - origin, 1) for s in rows]
+        + [(float(s["end"]) - origin, -1) for s in rows],
+        key=lambda event: (event[0], event[1]),
+    )
+    buckets = int((finish - origin) // bucket) + 1
+    peaks = [0] * buckets
+    level = 0
+    idx = 0
+    for b in range(buckets):
+        edge = (b + 1) * bucket
+        peak = level
+        while idx < len(events) and events[idx][0] < edge:
+            level += events[idx][1]
+            peak = max(peak, level)
+            idx += 1
+        peaks[b] = peak
+    top = max(peaks) or 1
+    print(f"\nConcurrency ({bucket:g}s buckets, peak {top}):")
+    for b, peak in enumerate(peaks):
+        bar = "#" * max(1 if peak else 0, round(peak / top * width))
+        print(f"  {b * bucket:>8.1f}s {peak:>4} {bar}")
+
+
+def summarize(paths: List[Path], *, row_phase: str = "row", top: int = 10, bucket: float = 0.0) -> int:
+    spans = load_spans(paths)
+    if not spans:
+        print("No spans found.")
+        return 1
+    wall = max(float(s["end"]) for s in spans) - min(float(s["start"]) for s in spans)
+    print(f"{len(spans)} span(s) over {wall:.1f}s from {', '.join(str(p) for p in paths)}\n")
+    print_phase_table(spans)
+    print_slowest_rows(spans, row_phase, top)
+    print_timeline(spans, row_phase, bucket)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise span traces written with TRACE_DIR.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summarize", help="Percentiles per phase, slowest rows, concurrency.")
+    summary.add_argument("traces", nargs="+", type=Path, help="Trace JSONL file(s).")
+    summary.add_argument("--row-phase", default="row", help="Phase that spans one device/row (default: row).")
+    summary.add_argument("--top", type=int, default=10, help="Slowest rows to list (default: 10).")
+    summary.add_argument(
+        "--bucket", type=float, default=0.0, help="Timeline bucket in seconds (default: ~30 buckets)."
+    )
+    args = parser.parse_args(argv)
+    return summarize(args.traces, row_phase=args.row_phase, top=args.top, bucket=args.bucket)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
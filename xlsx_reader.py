@@ -0,0 +1,280 @@
+"""Streaming ``.xlsx`` row reader shared by the input loaders.
+
+Reads the worksheet XML straight out of the zip with ``iterparse`` instead of
+building openpyxl cell objects. Shared strings are resolved once per
+workbook, rows are yielded as tuples, and ``columns=`` projects each row to
+the requested columns (letters such as ``"G"``, 1-based numbers, or header
+names from the first row). Values match openpyxl's
+``load_workbook(read_only=True, data_only=True)`` for text, numbers and
+booleans (formulas give their cached value); date-formatted cells come back as
+their serial number because styles are not read. Rows absent from the sheet
+XML are not yielded, even with ``skip_empty=False``.
+"""
+
+from __future__ import annotations
+
+import re
+import posixpath
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from xml.etree.ElementTree import iterparse
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_ROW = f"{_MAIN}row"
+_CELL = f"{_MAIN}c"
+_VALUE = f"{_MAIN}v"
+_TEXT = f"{_MAIN}t"
+_RUN = f"{_MAIN}r"
+_INLINE = f"{_MAIN}is"
+_SHEET_DATA = f"{_MAIN}sheetData"
+_LETTERS_RE = re.compile(r"^[A-Za-z]{1,3}$")
+
+# Column letters -> 0-based position, filled as cell references are seen.
+_POSITIONS: Dict[str, int] = {}
+
+Cell = Union[str, int, float, bool, None]
+ColumnRef = Union[str, int]
+
+
+def column_index(letters: str) -> int:
+    """1-based index of a column letter reference ("A" -> 1, "AA" -> 27)."""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def _header_key(text: object) -> str:
+    return " ".join(str(text or "").split()).lower()
+
+
+def resolve_columns(headers: Sequence[object], refs: Sequence[ColumnRef]) -> List[int]:
+    """0-based positions for ``refs``: header names first, then column letters/numbers."""
+    by_header: Dict[str, int] = {}
+    for position, header in enumerate(headers):
+        by_header.setdefault(_header_key(header), position)
+    positions: List[int] = []
+    for ref in refs:
+        if isinstance(ref, int):
+            positions.append(ref - 1)
+            continue
+        key = _header_key(ref)
+        if key and key in by_header:
+            positions.append(by_header[key])
+        elif _LETTERS_RE.match(ref.strip()):
+            positions.append(column_index(ref.strip()) - 1)
+        else:
+            raise ValueError(f"Column {ref!r} is neither a column letter nor a header in the sheet")
+    return positions
+
+
+def _number(text: str) -> Union[int, float]:
+    # Same rule as openpyxl: a decimal point or exponent means float.
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _rich_text(node) -> str:
+    """Text of an ``<si>``/``<is>`` node: plain ``<t>`` plus rich-text runs, no phonetics."""
+    parts: List[str] = []
+    for child in node:
+        if child.tag == _TEXT:
+            parts.append(child.text or "")
+        elif child.tag == _RUN:
+            text = child.find(_TEXT)
+            if text is not None:
+                parts.append(text.text or "")
+    return "".join(parts)
+
+
+class XlsxSheet:
+    """One worksheet of an ``.xlsx``; the active sheet unless ``sheet`` names one.
+
+    Use as a context manager (or call ``close``)::
+
+        with XlsxSheet(path) as sheet:
+            for serial, family in sheet.iter_rows(columns=["A", "Product Family"], min_row=2):
+                ...
+    """
+
+    def __init__(self, path: Union[str, Path], sheet: Union[str, int, None] = None) -> None:
+        self.path = Path(path)
+        self.zip = zipfile.ZipFile(self.path)
+        try:
+            self.part = self._sheet_part(sheet)
+            self.shared = self._shared_strings()
+        except Exception:
+            self.zip.close()
+            raise
+        self._headers: Optional[List[str]] = None
+
+    def __enter__(self) -> "XlsxSheet":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def _sheet_part(self, sheet: Union[str, int, None]) -> str:
+        targets: Dict[str, str] = {}
+        with self.zip.open("xl/_rels/workbook.xml.rels") as stream:
+            for _, node in iterparse(stream):
+                if node.tag == f"{_PKG_REL}Relationship":
+                    target = node.get("Target", "")
+                    targets[node.get("Id", "")] = (
+                        target.lstrip("/") if target.startswith("/") else posixpath.normpath(f"xl/{target}")
+                    )
+        sheets: List[Tuple[str, str]] = []
+        active = 0
+        with self.zip.open("xl/workbook.xml") as stream:
+            for _, node in iterparse(stream):
+                if node.tag == f"{_MAIN}sheet":
+                    sheets.append((node.get("name", ""), node.get(f"{_REL}id", "")))
+                elif node.tag == f"{_MAIN}workbookView":
+                    active = int(node.get("activeTab", "0") or 0)
+        if not sheets:
+            raise ValueError(f"No worksheets in workbook: {self.path}")
+        if sheet is None:
+            _, rel_id = sheets[active if active < len(sheets) else 0]
+        elif isinstance(sheet, int):
+            _, rel_id = sheets[sheet]
+        else:
+            matches = [rid for name, rid in sheets if name == sheet]
+            if not matches:
+                raise ValueError(f"Worksheet {sheet!r} not found in {self.path}")
+            rel_id = matches[0]
+        return targets[rel_id]
+
+    def _shared_strings(self) -> List[str]:
+        try:
+            stream = self.zip.open("xl/sharedStrings.xml")
+        except KeyError:
+            return []
+        strings: List[str] = []
+        with stream:
+            for _, node in iterparse(stream):
+                if node.tag == f"{_MAIN}si":
+                    strings.append(_rich_text(node))
+                    node.clear()
+        return strings
+
+    def _rows(self) -> Iterator[Tuple[int, object]]:
+        """``(row number, <row> element)`` pairs; each element is valid until the next."""
+        row_number = 0
+        with self.zip.open(self.part) as stream:
+            sheet_data = None
+            for event, node in iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if node.tag == _SHEET_DATA:
+                        sheet_data = node
+                    continue
+                if node.tag != _ROW:
+                    continue
+                ref = node.get("r")
+                row_number = int(ref) if ref else row_number + 1
+                yield row_number, node
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+    def _cells(self, row, wanted: Optional[frozenset] = None) -> Dict[int, Cell]:
+        """Values of one ``<row>`` by 0-based column, limited to ``wanted`` if given."""
+        cells: Dict[int, Cell] = {}
+        shared = self.shared
+        positions = _POSITIONS
+        position = -1
+        for cell in row:
+            if cell.tag != _CELL:
+                continue
+            ref = cell.get("r")
+            if ref:
+                letters = ref.rstrip("0123456789")
+                position = positions.get(letters, -1)
+                if position < 0:
+                    position = positions[letters] = column_index(letters) - 1
+            else:
+                position += 1
+            if wanted is not None and position not in wanted:
+                continue
+            kind = cell.get("t", "n")
+            if kind == "inlineStr":
+                inline = cell.find(_INLINE)
+                cells[position] = _rich_text(inline) if inline is not None else None
+                continue
+            value_node = cell.find(_VALUE)
+            text = value_node.text if value_node is not None else None
+            if text is None:
+                continue
+            if kind == "s":
+                cells[position] = shared[int(text)]
+            elif kind == "n":
+                cells[position] = _number(text)
+            elif kind == "b":
+                cells[position] = text == "1"
+            else:  # "str" (formula text), "e" (error), "d" (ISO date)
+                cells[position] = text
+        return cells
+
+    @property
+    def headers(self) -> List[str]:
+        """First-row values as stripped strings."""
+        if self._headers is None:
+            self._headers = []
+            for _, row in self._rows():
+                cells = self._cells(row)
+                width = max(cells) + 1 if cells else 0
+                self._headers = [
+                    "" if cells.get(i) is None else str(cells[i]).strip() for i in range(width)
+                ]
+                break
+        return self._headers
+
+    def iter_rows(
+        self,
+        columns: Optional[Sequence[ColumnRef]] = None,
+        *,
+        min_row: int = 1,
+        skip_empty: bool = True,
+    ) -> Iterator[Tuple[Cell, ...]]:
+        """Yield row tuples from ``min_row`` on.
+
+        With ``columns`` each tuple holds exactly those columns in that order;
+        otherwise it runs from column A to the row's last cell. Rows with no
+        value in the projected columns are skipped unless ``skip_empty=False``.
+        """
+        positions: Optional[List[int]] = None
+        if columns is not None:
+            # Any text ref may be a header name (even letter-shaped ones like "ID").
+            by_name = any(isinstance(c, str) for c in columns)
+            positions = resolve_columns(self.headers if by_name else (), columns)
+        wanted = frozenset(positions) if positions is not None else None
+        for number, row in self._rows():
+            if number < min_row:
+                continue
+            cells = self._cells(row, wanted)
+            if positions is not None:
+                values = tuple(cells.get(p) for p in positions)
+            else:
+                width = max(cells) + 1 if cells else 0
+                values = tuple(cells.get(i) for i in range(width))
+            if skip_empty and all(v is None or v == "" for v in values):
+                continue
+            yield values
+
+
+def iter_xlsx_rows(
+    path: Union[str, Path],
+    columns: Optional[Sequence[ColumnRef]] = None,
+    *,
+    sheet: Union[str, int, None] = None,
+    min_row: int = 1,
+    skip_empty: bool = True,
+) -> Iterator[Tuple[Cell, ...]]:
+    """Convenience wrapper: open ``path``, yield ``XlsxSheet.iter_rows``, close."""
+    with XlsxSheet(path, sheet) as reader:
+        yield from reader.iter_rows(columns, min_row=min_row, skip_empty=skip_empty)